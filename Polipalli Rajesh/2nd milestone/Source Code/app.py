@@ -1,7 +1,7 @@
 import streamlit as st
 from PyPDF2 import PdfReader
 import pdfplumber
-from pdf2image import convert_from_path
+import fitz
 import pytesseract
 from PIL import Image
 import json
@@ -75,11 +75,12 @@ def extract_text_from_pdf(uploaded_file, use_ocr=False):
         if use_ocr:
             st.info("Using OCR for text extraction...")
             try:
-                images = convert_from_path(tmp_path)
-                
-                for page_num, image in enumerate(images, start=1):
-                    text = pytesseract.image_to_string(image)
-                    text_by_page[f"Page {page_num}"] = text
+                with fitz.open(tmp_path) as doc:
+                    for page_num, page in enumerate(doc, start=1):
+                        pix = page.get_pixmap(dpi=200, colorspace=fitz.csGRAY, alpha=False)
+                        image = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+                        text = pytesseract.image_to_string(image)
+                        text_by_page[f"Page {page_num}"] = text
             except Exception as e:
                 st.error(f"OCR failed: {e}")
                 return None
@@ -303,7 +304,7 @@ def generate_response(prompt, extracted_text):
 with st.expander("Installation Requirements (for developers)"):
     st.code("""
 # Required packages:
-pip install streamlit PyPDF2 pdfplumber pdf2image pytesseract pillow
+pip install streamlit PyPDF2 pdfplumber PyMuPDF pytesseract pillow
 
 # For OCR, you might also need to install Tesseract:
 # On Ubuntu/Debian: sudo apt install tesseract-ocr
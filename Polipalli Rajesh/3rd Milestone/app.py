@@ -11,13 +11,29 @@ from datetime import datetime
 import time
 from collections import deque
 import re
+import sys
+from pathlib import Path
+
+# The process-wide pooled Ollama client lives in "Vinay Kumar Mahto/backend"
+BACKEND_ROOT = Path(__file__).resolve().parents[2] / "Vinay Kumar Mahto"
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+from backend.ollama_client import get_ollama_client
+from backend.model_registry import get_model_registry
+from backend.scheduler import get_scheduler, GenerationCancelled
+from backend.ollama_stream import OllamaStream, OllamaStreamError
+from backend.stream_render import render_stream
+from backend.context_packer import pack_context, context_budget, fit_to_budget, num_ctx_options
+from backend.chunker import TextChunker
+from backend.session_manager import SessionManager as SharedSessionManager
+from backend.document_store import get_document_store
+from backend.ingest_cache import get_ingest_cache, ingest_key, config_key
 
 # ---------------------------
 # Configuration
 # ---------------------------
 OLLAMA_BASE_URL = "http://localhost:11434"
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
-MAX_CONTEXT_LENGTH = 4000
 RATE_LIMIT_REQUESTS = 15
 RATE_LIMIT_WINDOW = 60  # seconds
 
@@ -138,54 +154,21 @@ class RateLimiter:
 # ---------------------------
 class OllamaPDFChatbot:
     def __init__(self, base_url: str = OLLAMA_BASE_URL):
-        self.base_url = base_url
-        self.session = requests.Session()
-        self.session.timeout = (10, 180)  # (connect, read) timeout
-
-    def check_connection(self) -> bool:
-        """Check if Ollama is running"""
-        try:
-            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
+        # Shared keep-alive session: reruns and users reuse the same connections
+        self.client = get_ollama_client(base_url)
+        self.base_url = self.client.base_url
+        self.session = self.client.session
+
+    def check_connection(self, force: bool = False) -> bool:
+        """Check if Ollama is running (cached; refreshed in the background)"""
+        registry = get_model_registry(self.base_url)
+        if force:
+            registry.refresh()
+        return registry.is_connected()
 
     def get_available_models(self) -> List[str]:
-        """Get available Ollama models with enhanced error handling"""
-        endpoints = ["/api/tags", "/api/models", "/api/list"]
-        
-        for ep in endpoints:
-            try:
-                response = self.session.get(f"{self.base_url}{ep}", timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    return self._parse_models(data)
-            except Exception as e:
-                continue
-        
-        return []
-
-    def _parse_models(self, data) -> List[str]:
-        """Parse models from different response formats"""
-        if isinstance(data, list):
-            return [str(m) for m in data if m]
-        
-        if isinstance(data, dict):
-            if "models" in data:
-                models = data["models"]
-                if isinstance(models, list):
-                    model_names = []
-                    for model in models:
-                        if isinstance(model, dict):
-                            name = model.get("name") or model.get("model")
-                            if name:
-                                model_names.append(name)
-                        else:
-                            model_names.append(str(model))
-                    return model_names
-            return list(data.keys())
-        
-        return []
+        """Get available Ollama models (cached /api/tags; never blocks a rerun)"""
+        return get_model_registry(self.base_url).models()
 
     def stream_response(self, prompt: str, context: str = "", system_prompt: str = "") -> Generator[str, None, None]:
         """Stream response from Ollama with enhanced error handling and rate limiting"""
@@ -217,15 +200,20 @@ class OllamaPDFChatbot:
                 "top_p": st.session_state.top_p,
                 "top_k": st.session_state.top_k,
                 "num_predict": st.session_state.max_tokens,
+                **num_ctx_options(),
             }
         }
         
         if system_prompt:
             payload["system"] = system_prompt
 
+        # Cancellable handle: the Stop button and the dead-session reaper close the stream through it
+        handle = self.client.generation()
         try:
-            with self.session.post(
-                f"{self.base_url}/api/generate",
+            # Process-wide slot so concurrent users queue fairly instead of overloading Ollama
+            with handle, get_scheduler().slot(session_id=handle.session_id, cancelled=handle.cancelled), self.client.post(
+                "/api/generate",
+                handle=handle,
                 json=payload,
                 stream=True,
                 timeout=180,
@@ -236,29 +224,12 @@ class OllamaPDFChatbot:
                     yield f"❌ Error {response.status_code}: {error_msg}"
                     return
 
-                full_response = ""
-                for raw_line in response.iter_lines(decode_unicode=True):
-                    if not raw_line:
-                        continue
-                    
-                    try:
-                        json_line = json.loads(raw_line.strip())
-                        if "response" in json_line:
-                            token = json_line["response"]
-                            full_response += token
-                            yield token
-                            
-                        # Check for errors in the stream
-                        if "error" in json_line:
-                            yield f"\n❌ Error: {json_line['error']}"
-                            break
-                            
-                    except json.JSONDecodeError:
-                        continue
-                    except Exception as e:
-                        yield f"\n❌ Streaming error: {str(e)}"
-                        break
-                        
+                yield from OllamaStream(response, handle)
+
+        except GenerationCancelled:
+            yield "\n\n⏹️ Generation stopped."
+        except OllamaStreamError as e:
+            yield f"\n❌ Error: {e}"
         except requests.exceptions.ConnectionError:
             yield "❌ Could not connect to Ollama. Please ensure it's running with: `ollama serve`"
         except requests.exceptions.Timeout:
@@ -266,6 +237,10 @@ class OllamaPDFChatbot:
         except Exception as e:
             yield f"❌ Unexpected error: {str(e)}"
 
+    def cancel_generation(self) -> int:
+        """Stop this browser session's in-flight generations"""
+        return self.client.cancel_session()
+
     def _build_enhanced_prompt(self, prompt: str, context: str = "", system_prompt: str = "") -> str:
         """Build enhanced prompt with context and instructions"""
         if not context:
@@ -280,7 +255,7 @@ class OllamaPDFChatbot:
         5. If the question is unclear or cannot be answered with the document, explain why"""
         
         enhanced_prompt = f"""DOCUMENT CONTEXT:
-{context[:10000]}  # Limit context length
+{fit_to_budget(context, context_budget(st.session_state.max_tokens))}
 
 QUESTION: {prompt}
 
@@ -288,6 +263,11 @@ INSTRUCTIONS: {base_system_prompt}
 """
         return enhanced_prompt
 
+@st.cache_resource
+def get_chatbot() -> OllamaPDFChatbot:
+    """One chatbot per process instead of one per rerun"""
+    return OllamaPDFChatbot()
+
 # ---------------------------
 # PDF Handling Class
 # ---------------------------
@@ -370,50 +350,55 @@ class PDFProcessor:
         return cleaned
 
     @staticmethod
-    def get_relevant_context(prompt: str, pdf_text: Dict[str, str], max_chars: int = MAX_CONTEXT_LENGTH) -> str:
-        """Extract relevant context based on prompt keywords"""
+    def get_relevant_context(prompt: str, pdf_text: Dict[str, str], budget_tokens: int) -> str:
+        """Pack the most relevant page chunks that fit ``budget_tokens``, marked with their page"""
         if not pdf_text:
             return ""
         
         prompt_keywords = set(word.lower() for word in re.findall(r'\w+', prompt) if len(word) > 3)
+
+        def chunk_pages() -> Dict:
+            chunker = TextChunker(chunk_size=1000, overlap=100)
+            chunks, locations = [], []
+            for page_key, text in pdf_text.items():
+                if "No text" in text:
+                    continue
+                suffix = page_key.rsplit("_", 1)[-1]
+                page_num = int(suffix) if suffix.isdigit() else page_key
+                for chunk in chunker.chunk_text(text):
+                    chunks.append(chunk)
+                    locations.append({"page": page_num})
+            return {"chunks": chunks, "lowered": [c.lower() for c in chunks], "locations": locations}
+
+        # A shared document is chunked once, not on every question
+        doc_id = getattr(pdf_text, "doc_id", None)
+        if doc_id:
+            pages = get_ingest_cache().open(
+                config_key(doc_id, stage="page_chunks", chunk_size=1000, overlap=100), chunk_pages
+            ).value
+        else:
+            pages = chunk_pages()
+        locations = pages["locations"]
+
+        # Score page chunks by relevance
+        candidates = [
+            (sum(1 for keyword in prompt_keywords if keyword in lowered), i, chunk)
+            for i, (chunk, lowered) in enumerate(zip(pages["chunks"], pages["lowered"]))
+        ]
         
-        # Score pages by relevance
-        page_scores = []
-        for page_num, text in pdf_text.items():
-            if "No text" in text:
-                continue
-                
-            text_lower = text.lower()
-            score = sum(1 for keyword in prompt_keywords if keyword in text_lower)
-            if score > 0:
-                page_scores.append((page_num, text, score))
-        
-        # Sort by relevance and build context
-        page_scores.sort(key=lambda x: x[2], reverse=True)
-        
-        context_parts = []
-        total_chars = 0
-        
-        # Add most relevant pages first
-        for page_num, text, score in page_scores:
-            if total_chars + len(text) <= max_chars:
-                context_parts.append(f"--- {page_num} (Relevance: {score}) ---\n{text}")
-                total_chars += len(text)
-        
-        # If no relevant pages or need more context, add first pages
-        if not context_parts or total_chars < max_chars // 2:
-            for page_num, text in list(pdf_text.items())[:2]:
-                if page_num not in [p[0] for p in page_scores[:3]]:  # Avoid duplicates
-                    if total_chars + len(text) <= max_chars:
-                        context_parts.append(f"--- {page_num} ---\n{text}")
-                        total_chars += len(text)
+        # Nothing matched: fall back to the opening pages
+        if not any(score > 0 for score, _, _ in candidates):
+            opening = list(dict.fromkeys(loc["page"] for loc in locations))[:2]
+            candidates = [(1, i, chunk) for _, i, chunk in candidates if locations[i]["page"] in opening]
         
-        return "\n\n".join(context_parts) if context_parts else "\n".join(list(pdf_text.values())[:3])
+        return pack_context(candidates, budget_tokens, locations)["text"]
 
 # ---------------------------
 # Session Management
 # ---------------------------
-class SessionManager:
+class SessionManager(SharedSessionManager):
+    """The shared, persistent session manager with this app's defaults."""
+
     @staticmethod
     def initialize_session_state():
         """Initialize all session state variables"""
@@ -437,42 +422,7 @@ class SessionManager:
             if key not in st.session_state:
                 st.session_state[key] = value
 
-    @staticmethod
-    def create_chat_session(name: str = None):
-        """Create a new chat session"""
-        if not name:
-            name = f"session_{len(st.session_state.chat_sessions) + 1}"
-        
-        st.session_state.chat_sessions[name] = {
-            "messages": [],
-            "timestamp": datetime.now().isoformat(),
-            "pdf_name": st.session_state.pdf_name,
-            "pdf_text": st.session_state.pdf_text.copy()
-        }
-        st.session_state.current_session = name
-        return name
-
-    @staticmethod
-    def switch_chat_session(session_name: str):
-        """Switch to a different chat session"""
-        if session_name in st.session_state.chat_sessions:
-            session = st.session_state.chat_sessions[session_name]
-            st.session_state.current_session = session_name
-            st.session_state.messages = session["messages"]
-            st.session_state.pdf_name = session["pdf_name"]
-            st.session_state.pdf_text = session.get("pdf_text", {})
-            return True
-        return False
-
-    @staticmethod
-    def save_current_session():
-        """Save current session state"""
-        if st.session_state.current_session in st.session_state.chat_sessions:
-            st.session_state.chat_sessions[st.session_state.current_session].update({
-                "messages": st.session_state.messages.copy(),
-                "pdf_name": st.session_state.pdf_name,
-                "pdf_text": st.session_state.pdf_text.copy()
-            })
+        SessionManager.restore_sessions()
 
 # ---------------------------
 # Utility Functions
@@ -489,19 +439,27 @@ def format_for_json(extracted_text: Dict) -> Dict:
         "content": extracted_text
     }
 
-def save_chat_history(messages: List, pdf_data: Dict) -> Dict:
-    """Prepare chat history for export"""
+def chat_export_settings() -> Dict:
+    """Session details recorded in the chat export"""
+    return {
+        "timestamp": st.session_state.session_timestamp,
+        "model_used": st.session_state.selected_model,
+        "parameters": {
+            "temperature": st.session_state.temperature,
+            "top_p": st.session_state.top_p,
+            "top_k": st.session_state.top_k
+        }
+    }
+
+def save_chat_history(messages: List, pdf_data: Dict, settings: Dict) -> Dict:
+    """Prepare chat history for export (no session_state access, so it can run at download time)"""
     return {
         "chat_session": {
-            "timestamp": st.session_state.session_timestamp,
+            "timestamp": settings["timestamp"],
             "total_messages": len(messages),
             "messages": messages,
-            "model_used": st.session_state.selected_model,
-            "parameters": {
-                "temperature": st.session_state.temperature,
-                "top_p": st.session_state.top_p,
-                "top_k": st.session_state.top_k
-            }
+            "model_used": settings["model_used"],
+            "parameters": settings["parameters"]
         },
         "pdf_data": pdf_data
     }
@@ -529,7 +487,7 @@ def display_file_info():
 def main():
     # Initialize session state
     SessionManager.initialize_session_state()
-    chatbot = OllamaPDFChatbot()
+    chatbot = get_chatbot()
     pdf_processor = PDFProcessor()
 
     # Main header
@@ -543,7 +501,7 @@ def main():
         col1, col2 = st.columns([2, 1])
         with col1:
             if st.button("🔍 Check Ollama Connection"):
-                if chatbot.check_connection():
+                if chatbot.check_connection(force=True):
                     st.success("✅ Ollama is running!")
                     st.session_state.model_loaded = True
                 else:
@@ -608,7 +566,7 @@ def main():
             st.write("**Active Sessions:**")
             for session_name in list(st.session_state.chat_sessions.keys())[-5:]:  # Show last 5
                 if st.button(
-                    f"💬 {session_name} ({len(st.session_state.chat_sessions[session_name]['messages'])} messages)",
+                    f"💬 {session_name} ({st.session_state.chat_sessions[session_name]['message_count']} messages)",
                     key=f"btn_{session_name}"
                 ):
                     SessionManager.switch_chat_session(session_name)
@@ -618,7 +576,7 @@ def main():
         st.subheader("🛠️ Actions")
         
         if st.button("🗑️ Clear Current Chat"):
-            st.session_state.messages = []
+            SessionManager.clear_messages()
             st.success("Chat cleared!")
             st.rerun()
             
@@ -659,12 +617,17 @@ def main():
             if st.session_state.pdf_name != uploaded_file.name:
                 with st.spinner("🔄 Extracting text from PDF..."):
                     try:
-                        extracted_text = pdf_processor.extract_text_from_pdf(uploaded_file)
+                        # Shared across sessions: the same PDF is extracted only once
+                        lease = get_ingest_cache().open(
+                            ingest_key(uploaded_file.getvalue(), stage="pages", extractor="pdfplumber"),
+                            lambda: get_document_store().intern(pdf_processor.extract_text_from_pdf(uploaded_file))
+                        )
+                        st.session_state.pdf_lease = lease
+                        extracted_text = lease.value
                         if extracted_text:
                             st.session_state.pdf_text = extracted_text
                             st.session_state.pdf_name = uploaded_file.name
-                            st.session_state.messages = []
-                            SessionManager.save_current_session()
+                            SessionManager.clear_messages()
                             
                             st.success(f"✅ Successfully processed {uploaded_file.name}")
                             
@@ -687,21 +650,28 @@ def main():
         if st.session_state.pdf_text:
             st.markdown('<div class="sub-header">💾 Export Options</div>', unsafe_allow_html=True)
             
-            pdf_data = format_for_json(st.session_state.pdf_text)
-            chat_data = save_chat_history(st.session_state.messages, pdf_data)
+            # Built only when a download is clicked, from the full stored history,
+            # instead of serializing the document and chat on every rerun
+            pdf_text = st.session_state.pdf_text
+            load_history = SessionManager.full_history()
+            settings = chat_export_settings()
+
+            def export_json() -> str:
+                chat_data = save_chat_history(load_history(), format_for_json(pdf_text), settings)
+                return json.dumps(chat_data, indent=2, ensure_ascii=False)
             
             col_exp1, col_exp2 = st.columns(2)
             with col_exp1:
                 st.download_button(
                     "📥 Download JSON",
-                    json.dumps(chat_data, indent=2, ensure_ascii=False),
+                    export_json,
                     file_name=f"chat_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
                     help="Complete chat history with PDF content"
                 )
             with col_exp2:
                 st.download_button(
                     "📄 Download Text",
-                    "\n\n".join(st.session_state.pdf_text.values()),
+                    lambda: "\n\n".join(pdf_text.values()),
                     file_name=f"pdf_text_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
                     help="Extracted PDF text only"
                 )
@@ -723,6 +693,12 @@ def main():
             </div>
             """, unsafe_allow_html=True)
         else:
+            # Older messages stay in the session store until asked for
+            if SessionManager.has_earlier_messages():
+                if st.button(f"⬆️ Load earlier messages ({st.session_state.history_start} more)"):
+                    SessionManager.load_earlier_messages()
+                    st.rerun()
+
             # Display chat messages
             for i, msg in enumerate(st.session_state.messages):
                 role_class = "user-message" if msg["role"] == "user" else "assistant-message"
@@ -732,6 +708,18 @@ def main():
                     unsafe_allow_html=True
                 )
 
+            # Stop clicked during a stream: the click reruns the script, which interrupts
+            # the streaming loop; close the HTTP stream and keep what was generated so far
+            if st.session_state.get("stop_generating"):
+                chatbot.cancel_generation()
+                partial = st.session_state.pop("partial_response", None)
+                if partial:
+                    st.session_state.messages.append(
+                        {"role": "assistant", "content": partial + "\n\n⏹️ *Generation stopped.*"}
+                    )
+                    SessionManager.save_current_session()
+                    st.rerun()
+
             # Chat input
             if prompt := st.chat_input("Ask a question about the PDF..."):
                 # Add user message
@@ -745,42 +733,47 @@ def main():
                 pdf_context = pdf_processor.get_relevant_context(
                     prompt, 
                     st.session_state.pdf_text,
-                    MAX_CONTEXT_LENGTH
+                    context_budget(st.session_state.max_tokens)
                 )
 
                 # Prepare for assistant response
                 with st.spinner("🤖 Processing your question..."):
+                    stop_placeholder = st.empty()
+                    stop_placeholder.button("⏹️ Stop Generating", key="stop_generating", use_container_width=True)
                     placeholder = st.empty()
-                    full_response = ""
-                    
-                    # Stream the response
-                    for token in chatbot.stream_response(
-                        prompt, 
-                        context=pdf_context,
-                        system_prompt="Answer based strictly on the provided document content. Be precise and factual."
-                    ):
-                        full_response += token
+
+                    def show_answer(text: str, cursor: str = "▌"):
                         placeholder.markdown(
-                            f'<div class="chat-message assistant-message"><strong>🤖 Assistant:</strong><br>{full_response}▌</div>', 
+                            f'<div class="chat-message assistant-message"><strong>🤖 Assistant:</strong><br>{text}{cursor}</div>', 
                             unsafe_allow_html=True
                         )
 
-                    # Final message without cursor
-                    placeholder.markdown(
-                        f'<div class="chat-message assistant-message"><strong>🤖 Assistant:</strong><br>{full_response}</div>', 
-                        unsafe_allow_html=True
+                    def show_partial(text: str):
+                        st.session_state.partial_response = text
+                        show_answer(text)
+
+                    # Stream the response, re-rendering on a time/size cadence rather than per token;
+                    # the final render drops the cursor
+                    full_response = render_stream(
+                        chatbot.stream_response(
+                            prompt, 
+                            context=pdf_context,
+                            system_prompt="Answer based strictly on the provided document content. Be precise and factual."
+                        ),
+                        show_partial,
+                        final_render=lambda text: show_answer(text, cursor=""),
                     )
                     
+                    stop_placeholder.empty()
+                    st.session_state.pop("partial_response", None)
+
                     # Save assistant response
                     st.session_state.messages.append({"role": "assistant", "content": full_response})
                     SessionManager.save_current_session()
 
             # Chat controls
             if st.session_state.messages:
-                col_ctl1, col_ctl2 = st.columns(2)
-                with col_ctl1:
-                    if st.button("⏹️ Stop Generating", use_container_width=True):
-                        st.warning("Stop functionality requires Streamlit update")
+                _, col_ctl2 = st.columns(2)
                 with col_ctl2:
                     if st.button("📋 Copy Last Response", use_container_width=True):
                         if st.session_state.messages and st.session_state.messages[-1]["role"] == "assistant":
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import sys
 import time
 import secrets
 from pathlib import Path
@@ -7,11 +8,19 @@ import pandas as pd
 import streamlit as st
 import logging
 
+# The shared backend package lives in "Vinay Kumar Mahto/backend"
+BACKEND_ROOT = Path(__file__).resolve().parents[1] / "Vinay Kumar Mahto"
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
 from ocr import process_docx, process_pdf, detect_kind, save_chunks_to_json
-from ollama_client import query_ollama
+from ollama_client import query_ollama, OLLAMA_MODEL, ERROR_PREFIX
 
-# Retrieval
-from sentence_transformers import SentenceTransformer
+# Retrieval; the embedding backend (SentenceTransformer or Ollama /api/embed)
+# is chosen with EMBED_BACKEND and shared by every session
+from backend.embeddings import get_embedding_backend
+from backend.ingest_cache import get_ingest_cache, ingest_key
+from backend.conversation_memory import ConversationMemory, HISTORY_LIMIT
 import faiss
 import numpy as np
 
@@ -26,11 +35,14 @@ if "files" not in st.session_state:
     st.session_state.files: List[Dict] = []
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
-if "embed_model" not in st.session_state:
-    st.session_state.embed_model = SentenceTransformer("all-MiniLM-L6-v2")
+# Follow-ups see a rolling summary plus the last few turns, not the whole chat
+if "chat_memory" not in st.session_state:
+    st.session_state.chat_memory = ConversationMemory(model=OLLAMA_MODEL)
 if "index" not in st.session_state:
     st.session_state.index = None
     st.session_state.chunk_texts = []
+if "ingest_leases" not in st.session_state:
+    st.session_state.ingest_leases = {}
 
 SESSION_ID = st.session_state.session_id
 DEFAULT_UPLOAD_ROOT = Path("uploads") / SESSION_ID
@@ -47,14 +59,18 @@ with st.sidebar:
     max_mb = st.number_input("Max file size (MB)", min_value=1, max_value=2048, value=200)
     chunk_size = st.slider("Chunk size (words)", 400, 1200, 800, 100)
     persist = st.checkbox("Save uploads to disk", value=True)
+    use_cache = st.checkbox("Reuse cached answers", value=False,
+                            help="Answer repeated identical questions from the local response cache.")
     upload_root = st.text_input("Upload directory (per session)", value=str(DEFAULT_UPLOAD_ROOT))
     cleanup = st.button("Clear session & delete saved files")
 
 if cleanup:
     st.session_state.files = []
     st.session_state.chat_history = []
+    st.session_state.chat_memory.clear()
     st.session_state.index = None
     st.session_state.chunk_texts = []
+    st.session_state.ingest_leases = {}
     st.success("Session cleared.")
 
 st.title("📂 Virtual File Space")
@@ -91,21 +107,33 @@ if uploads:
         st.session_state.files.append(meta)
         st.success(f"Uploaded: {up.name}")
 
-        # Process immediately if docx/pdf
-        if kind == "docx" and saved_path:
-            chunks = process_docx(Path(saved_path), mode="words", chunk_size=chunk_size)
-        elif kind == "pdf" and saved_path:
-            chunks = process_pdf(Path(saved_path), chunk_size=chunk_size)
-        else:
-            chunks = []
+        # Process immediately if docx/pdf; chunks and index are shared by every
+        # session (and rerun) that uploads the same file with the same settings
+        chunks, index = [], None
+        if kind in ("docx", "pdf") and saved_path:
+            embedder = get_embedding_backend()
+
+            def ingest() -> Dict:
+                if kind == "docx":
+                    doc_chunks = process_docx(Path(saved_path), mode="words", chunk_size=chunk_size)
+                else:
+                    doc_chunks = process_pdf(Path(saved_path), chunk_size=chunk_size)
+                if not doc_chunks:
+                    return {"chunks": [], "index": None}
+                embeddings = embedder.embed([c["text"] for c in doc_chunks])
+                doc_index = faiss.IndexFlatL2(embeddings.shape[1])
+                doc_index.add(np.array(embeddings))
+                return {"chunks": doc_chunks, "index": doc_index}
+
+            lease = get_ingest_cache().open(
+                ingest_key(data, kind=kind, chunk_size=chunk_size, embedder=f"{embedder.name}:{embedder.model}"),
+                ingest
+            )
+            st.session_state.ingest_leases[up.name] = lease
+            chunks, index = lease.value["chunks"], lease.value["index"]
 
         if chunks:
             texts = [c["text"] for c in chunks]
-            embed_model = st.session_state.embed_model
-            embeddings = embed_model.encode(texts)
-            dim = embeddings.shape[1]
-            index = faiss.IndexFlatL2(dim)
-            index.add(np.array(embeddings))
             st.session_state.index = index
             st.session_state.chunk_texts = texts
             st.info(f"Indexed {len(texts)} chunks for retrieval.")
@@ -135,8 +163,11 @@ else:
 # --- Chat ---
 st.subheader("Chat")
 
-# Display history
-for msg in st.session_state.chat_history:
+# Display history; the memory below only shapes what the model is sent
+memory = st.session_state.chat_memory
+if len(st.session_state.chat_history) > HISTORY_LIMIT:
+    st.caption(f"Showing the last {HISTORY_LIMIT} of {len(st.session_state.chat_history)} messages.")
+for msg in st.session_state.chat_history[-HISTORY_LIMIT:]:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
 
@@ -146,6 +177,7 @@ prompt = st.chat_input("Ask a question about your documents...")
 if prompt:
     # Immediately show user message in chat
     st.session_state.chat_history.append({"role": "user", "content": prompt})
+    history = memory.messages()
     with st.chat_message("user"):
         st.markdown(prompt)
 
@@ -153,9 +185,8 @@ if prompt:
     with st.chat_message("assistant"):
         with st.spinner("🤔 Processing your question..."):
             if st.session_state.index:
-                embed_model = st.session_state.embed_model
-                q_emb = embed_model.encode([prompt])
-                D, I = st.session_state.index.search(np.array(q_emb), k=4)
+                q_emb = get_embedding_backend().embed([prompt])
+                D, I = st.session_state.index.search(q_emb, k=4)
                 retrieved_chunks = [st.session_state.chunk_texts[i] for i in I[0]]
                 context = "\n\n".join(retrieved_chunks)
 
@@ -170,15 +201,20 @@ User's Question:
 
 Answer clearly, naturally, and conversationally — like ChatGPT.
 """
-                reply = query_ollama(full_prompt)
+                reply = query_ollama(full_prompt, use_cache=use_cache, history=history)
             else:
-                reply = query_ollama(prompt)
+                reply = query_ollama(prompt, use_cache=use_cache, history=history)
 
         st.markdown(reply)
 
     # Save assistant reply in history
     st.session_state.chat_history.append({"role": "assistant", "content": reply})
 
+    # Remember the question (without the retrieved context) and the reply; a
+    # failed call is shown but not sent back to the model as an answer
+    if not reply.startswith(ERROR_PREFIX):
+        memory.extend([{"role": "user", "content": prompt}, {"role": "assistant", "content": reply}])
+
 
 
 # --- Footer ---
@@ -1,17 +1,39 @@
 # ollama_client.py
 import os
+import sys
 import logging
-import ollama
+from pathlib import Path
+
+# The process-wide pooled Ollama client lives in "Vinay Kumar Mahto/backend"
+BACKEND_ROOT = Path(__file__).resolve().parents[1] / "Vinay Kumar Mahto"
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+from backend.ollama_client import get_ollama_client
+from backend.response_cache import get_response_cache, make_cache_key
+from backend.scheduler import get_scheduler
+from backend.ollama_stream import parse_response
+from backend.context_packer import num_ctx_options
 
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+# query_ollama replies starting with this are failures, not answers
+ERROR_PREFIX = "⚠️ Ollama error:"
+
+def query_ollama(prompt: str, model: str | None = None, use_cache: bool = False,
+                 history: list | None = None) -> str:
+    """Send a prompt to Ollama and return only the assistant's reply text.
 
-def query_ollama(prompt: str, model: str | None = None) -> str:
-    """Send a prompt to Ollama and return only the assistant's reply text."""
+    ``history`` (earlier chat messages, e.g. from ConversationMemory.messages())
+    goes between the system message and the prompt. With ``use_cache`` an
+    identical (model, messages) request is answered from the shared SQLite
+    response cache instead of running inference again.
+    """
     model = model or OLLAMA_MODEL
     try:
-        response = ollama.chat(
-            model=model,
-            messages=[
+        payload = {
+            "model": model,
+            "stream": False,
+            "options": num_ctx_options(),
+            "messages": [
                 {
                     "role": "system",
                     "content": (
@@ -20,37 +42,27 @@ def query_ollama(prompt: str, model: str | None = None) -> str:
                         "Do not include metadata, debug info, or system output."
                     ),
                 },
+                *(history or []),
                 {"role": "user", "content": prompt},
             ],
-        )
-
-        # ✅ Case 1: direct dict with 'message'
-        if isinstance(response, dict) and "message" in response:
-            return response["message"].get("content", "").strip()
-
-        # ✅ Case 2: streaming or alt format with 'messages'
-        if isinstance(response, dict) and "messages" in response:
-            for msg in response["messages"]:
-                if msg.get("role") == "assistant":
-                    return msg.get("content", "").strip()
-
-        # ✅ Case 3: if Ollama returns object with attributes
-        if hasattr(response, "message"):
-            return getattr(response.message, "content", "").strip()
+        }
+        cache_key = make_cache_key(endpoint="chat", model=model, messages=payload["messages"]) if use_cache else None
+        if cache_key:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                return cached
 
-        # ✅ Fallback: extract only the text part if metadata leaks in
-        if isinstance(response, str):
-            # remove "model='...'" style garbage if present
-            if "message=Message" in response:
-                # crude fallback parse
-                start = response.find("content='")
-                end = response.find("', thinking")
-                if start != -1 and end != -1:
-                    return response[start+9:end].strip()
-            return response.strip()
+        # Shared keep-alive session and process-wide scheduler slot
+        with get_scheduler().slot():
+            resp = get_ollama_client().post("/api/chat", json=payload, timeout=300)
+        resp.raise_for_status()
+        text, stats = parse_response(resp.json())
+        text = text.strip()
 
-        return str(response)
+        if cache_key and stats is not None:
+            get_response_cache().put(cache_key, text, model)
+        return text
 
     except Exception as e:
         logging.exception("Error querying Ollama")
-        return f"⚠️ Ollama error: {e}"
+        return f"{ERROR_PREFIX} {e}"
@@ -7,8 +7,19 @@ import base64
 import pdfplumber
 import openpyxl
 import json
+import sys
+from pathlib import Path
 import ollama
 
+# The process-wide Ollama scheduler lives in "Vinay Kumar Mahto/backend"
+BACKEND_ROOT = Path(__file__).resolve().parents[1] / "Vinay Kumar Mahto"
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+from backend.scheduler import get_scheduler
+from backend.summarizer import MapReduceSummarizer
+from backend.batch_analysis import BatchAnalyzer
+from backend.model_registry import get_model_registry
+
 # Page settings:
 st.set_page_config(page_title="AI Policy OCR Extractor", page_icon="📄", layout="wide")
 st.title("📑 Public Policy Document Extractor with AI")
@@ -248,7 +259,9 @@ if uploaded_file:
         if question:
             messages.append({"role": "user", "content": question})
 
-        response = ollama.chat(model=model, messages=messages)
+        # Queue behind other sessions' requests instead of overloading the local server
+        with get_scheduler().slot():
+            response = ollama.chat(model=model, messages=messages)
         return response["message"]["content"]
 
 
@@ -295,6 +308,84 @@ if uploaded_file:
         st.subheader("🤖 Ollama's Response")
         st.write(response)
 
+    # Whole-document summary: every chunk is summarized in parallel, then merged
+    if st.button("📚 Summarize whole document"):
+        summarizer = MapReduceSummarizer(model="llama3.1:8b")
+        progress = st.progress(0.0, text="Summarizing sections...")
+        partials = st.expander("🧩 Partial summaries (as they arrive)", expanded=False)
+        try:
+            for event in summarizer.iter_summarize(chunks):
+                if event["stage"] == "final":
+                    progress.empty()
+                    st.subheader("🧾 Document Summary")
+                    st.write(event["summary"])
+                    st.caption(f"{event['calls']} summaries over {event['levels']} level(s), "
+                               f"{event['cached']} reused from cache")
+                    break
+                label = "Summarizing sections" if event["stage"] == "map" else f"Merging summaries (level {event['level']})"
+                progress.progress(event["done"] / event["total"], text=f"{label}: {event['done']}/{event['total']}")
+                partials.markdown(f"**{label} · part {event['index'] + 1}:** {event['summary']}")
+        except Exception as e:
+            st.error(f"❌ Summarization failed: {e}")
+
+    # Batch mode: run one instruction over every chunk, saving each answer as it arrives
+    with st.expander("🗂️ Analyze all chunks (batch mode)", expanded=False):
+        batch_instruction = st.text_area(
+            "Instruction for every chunk",
+            value="List the key policy measures, targets and responsible bodies mentioned in this chunk."
+        )
+        batch_models = get_model_registry().models() or ["llama3.1:8b"]
+        batch_model = st.selectbox(
+            "Model", batch_models,
+            index=batch_models.index("llama3.1:8b") if "llama3.1:8b" in batch_models else 0
+        )
+        batch_workers = st.slider("Parallel requests", min_value=1, max_value=8, value=2)
+        # Only reads saved progress; the checkpoint folder is created when a run starts
+        analyzer = BatchAnalyzer(chunks, batch_instruction, model=batch_model, workers=batch_workers)
+        st.caption(f"{analyzer.completed()}/{len(chunks)} chunks already analyzed — an interrupted run resumes from here.")
+
+        col_run, col_reset = st.columns(2)
+        if col_reset.button("🔄 Start over", use_container_width=True):
+            analyzer.reset()
+            st.rerun()
+        if col_run.button("▶️ Run / resume batch", use_container_width=True):
+            progress = st.progress(0.0, text="Starting...")
+            throughput = st.empty()
+            failed = 0
+            try:
+                for event in analyzer.iter_run():
+                    failed += event["error"] is not None
+                    progress.progress(event["done"] / event["total"],
+                                      text=f"Chunk {event['done']}/{event['total']}")
+                    if not event["resumed"]:
+                        eta = f"{event['eta_s'] / 60:.1f} min" if event["eta_s"] is not None else "–"
+                        throughput.caption(f"⚡ {event['per_min']:.1f} chunks/min · ETA {eta} · {failed} failed")
+                if failed:
+                    st.warning(f"{failed} chunk(s) failed; run the batch again to retry them.")
+                else:
+                    st.success("✅ All chunks analyzed.")
+            except Exception as e:
+                st.error(f"❌ Batch analysis stopped: {e}")
+
+        batch_results = pd.DataFrame(analyzer.results_table())
+        if (batch_results["status"] == "done").any():
+            st.dataframe(batch_results, use_container_width=True)
+            col_csv, col_json = st.columns(2)
+            col_csv.download_button(
+                "📥 Download results (CSV)",
+                data=batch_results.to_csv(index=False).encode("utf-8"),
+                file_name="batch_analysis.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+            col_json.download_button(
+                "📥 Download results (JSON)",
+                data=batch_results.to_json(orient="records", force_ascii=False, indent=2),
+                file_name="batch_analysis.json",
+                mime="application/json",
+                use_container_width=True
+            )
+
     # Follow-up QnA
     with st.form("followup_form"):
         user_question = st.text_input("💬 # Ask anything about this chunk:")
@@ -3,13 +3,28 @@ import streamlit as st
 import pandas as pd
 import pdfplumber
 import pytesseract
-from pdf2image import convert_from_bytes
+import fitz
+import numpy as np
 import json
 import requests
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import os
+import sys
 from io import BytesIO
+from pathlib import Path
+
+# The process-wide pooled Ollama client lives in "Vinay Kumar Mahto/backend"
+BACKEND_ROOT = Path(__file__).resolve().parents[1] / "Vinay Kumar Mahto"
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+from backend.ollama_client import get_ollama_client
+from backend.scheduler import get_scheduler
+from backend.stream_render import render_stream
+from backend.ollama_stream import OllamaStream, parse_response
+from backend.model_router import get_model_router
+from backend.context_packer import estimate_tokens, num_ctx_options
+from backend.ingest_cache import get_ingest_cache, ingest_key, config_key
 
 st.set_page_config(page_title="File Upload with OCR, Chunking & Ollama", page_icon="📂", layout="wide")
 st.title("File Upload with OCR, Chunking & Ollama")
@@ -40,9 +55,13 @@ def extract_pdf_text(file_bytes: bytes) -> str:
 
     if not text.strip():
         try:
-            images = convert_from_bytes(file_bytes)
-            for img in images:
-                text += pytesseract.image_to_string(img)
+            # Render in-process with PyMuPDF; the grayscale pixmap is viewed as a
+            # NumPy array without copying or spawning pdftoppm.
+            with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+                for page in doc:
+                    pix = page.get_pixmap(dpi=200, colorspace=fitz.csGRAY, alpha=False)
+                    img = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width)
+                    text += pytesseract.image_to_string(img)
         except Exception:
             pass
     return text
@@ -81,72 +100,40 @@ def call_ollama_stream(prompt: str, model: str = "llama3.1:8b", timeout: int = 3
     """
     Generator that yields tokens/partial text from Ollama server.
     """
-    url = "http://localhost:11434/api/generate"
     payload = {
         "model": model,
         "prompt": prompt,
         "stream": True,
+        "options": num_ctx_options(),
     }
     try:
-        with requests.post(url, json=payload, stream=True, timeout=timeout) as resp:
+        with get_scheduler().slot(), \
+                get_ollama_client().post("/api/generate", json=payload, stream=True, timeout=timeout) as resp:
             resp.raise_for_status()
-            for raw_line in resp.iter_lines():
-                if not raw_line:
-                    continue
-                # decode if it's bytes
-                if isinstance(raw_line, bytes):
-                    line = raw_line.decode("utf-8", errors="ignore")
-                else:
-                    line = str(raw_line)
-
-                line = line.strip()
-                if not line:
-                    continue
-
-                # Some Ollama servers prefix with 'data: ' for SSE
-                if line.startswith("data:"):
-                    line = line[len("data:"):].strip()
-
-                # Try to parse JSON
-                try:
-                    data = json.loads(line)
-                except Exception:
-                    yield line
-                    continue
-
-                token = None
-                if isinstance(data, dict):
-                    for k in ("response", "text", "delta", "token", "content"):
-                        if k in data and data[k]:
-                            token = data[k]
-                            break
-                    if token is None and "result" in data and isinstance(data["result"], str):
-                        token = data["result"]
-
-                if token is None:
-                    continue
-
-                if isinstance(token, dict):
-                    token = token.get("content") or str(token)
-
-                yield token
+            stream = OllamaStream(resp)
+            yield from stream
+            if stream.done:
+                get_model_router().observe(model, stream.stats)
     except requests.exceptions.ReadTimeout:
         yield f"\n\n[Ollama timeout after {timeout}s]"
     except Exception as e:
         yield f"\n\n[Ollama error: {e}]"
 
 def call_ollama_blocking(prompt: str, model: str = "llama3.1:8b", timeout: int = 300):
-    url = "http://localhost:11434/api/generate"
     payload = {
         "model": model,
         "prompt": prompt,
-        "stream": False
+        "stream": False,
+        "options": num_ctx_options(),
     }
     try:
-        resp = requests.post(url, json=payload, timeout=timeout)
+        with get_scheduler().slot():
+            resp = get_ollama_client().post("/api/generate", json=payload, timeout=timeout)
         resp.raise_for_status()
-        data = resp.json()
-        return data.get("response") or data.get("text") or str(data)
+        text, stats = parse_response(resp.json())
+        if stats is not None:
+            get_model_router().observe(model, stats)
+        return text
     except Exception as e:
         return f"[Ollama error: {e}]"
 
@@ -156,6 +143,8 @@ chunk_size = st.sidebar.number_input("Chunk size (chars)", value=1000, min_value
 overlap = st.sidebar.number_input("Overlap (chars)", value=200, min_value=0, step=50)
 top_k = st.sidebar.number_input("Top-K chunks to retrieve", value=3, min_value=1, max_value=10)
 model_choice = st.sidebar.selectbox("Ollama model", options=["llama3.1:8b", "llama3:latest", "mistral", "ggml-alpaca"], index=0)
+auto_route = st.sidebar.checkbox("Pick model per question", value=False,
+                                 help="Quick lookups go to a small installed model, synthesis questions to a larger one")
 timeout = st.sidebar.number_input("Ollama timeout (seconds)", value=300, min_value=30)
 use_streaming = st.sidebar.checkbox("Use streaming from Ollama (recommended)", value=True)
 download_json = st.sidebar.checkbox("Provide JSON download button", value=True)
@@ -186,7 +175,11 @@ if uploaded_file:
         elif uploaded_file.type == "application/pdf" or uploaded_file.name.endswith(".pdf"):
             uploaded_file.seek(0)
             file_bytes = uploaded_file.read()
-            extracted_text = extract_pdf_text(file_bytes)
+            # Shared across sessions and reruns: each PDF is extracted (and OCR'd) once
+            text_lease = get_ingest_cache().open(ingest_key(file_bytes, stage="text", ocr_dpi=200),
+                                                 lambda: extract_pdf_text(file_bytes))
+            st.session_state["text_lease"] = text_lease
+            extracted_text = text_lease.value
             st.text_area("Preview (first 2000 chars)", extracted_text[:2000], height=200)
         else:
             # fallback
@@ -200,10 +193,19 @@ if uploaded_file:
         st.error(f"Error reading file: {e}")
         extracted_text = ""
 
-    # chunking and indexing
-    chunks = chunk_text(extracted_text, chunk_size=chunk_size, overlap=overlap)
+    # chunking and indexing, shared for identical text and settings
+    def build_index():
+        index_chunks = chunk_text(extracted_text, chunk_size=chunk_size, overlap=overlap)
+        return {"chunks": index_chunks, "tfidf": build_tfidf(index_chunks)}
+
+    index_lease = get_ingest_cache().open(
+        config_key(ingest_key(extracted_text.encode("utf-8")), stage="tfidf", chunk_size=chunk_size, overlap=overlap),
+        build_index,
+    )
+    st.session_state["index_lease"] = index_lease
+    chunks = index_lease.value["chunks"]
     st.session_state["chunks"] = chunks
-    vectorizer, tfidf_matrix = build_tfidf(chunks)
+    vectorizer, tfidf_matrix = index_lease.value["tfidf"]
     st.session_state["vectorizer"] = vectorizer
     st.session_state["tfidf_matrix"] = tfidf_matrix
 
@@ -243,6 +245,14 @@ if user_q:
     )
     prompt = f"{system_prompt}\n\nCONTEXT:\n{context_text}\n\nQUESTION: {user_q}\n\nANSWER:"
 
+    answer_model = model_choice
+    if auto_route:
+        route = get_model_router().route(user_q, scores=[r["score"] for r in results],
+                                         prompt_tokens=estimate_tokens(prompt))
+        if route:
+            answer_model = route.model
+            st.caption(f"🧭 {route.model}: {route.reason}")
+
     # UI placeholder for progressive bot output
     response_placeholder = st.empty()
     response_text = ""
@@ -250,16 +260,17 @@ if user_q:
 
     if use_streaming:
         with st.spinner("Ollama is generating (streaming)..."):
-            for token in call_ollama_stream(prompt, model=model_choice, timeout=timeout):
-                # token may be partial string or an error message
-                response_text += str(token)
-                # update UI progressively
-                response_placeholder.markdown(f"**Bot:** {response_text}")
+            # token may be partial string or an error message; the UI is updated
+            # progressively but coalesced instead of re-rendered on every token
+            response_text = render_stream(
+                call_ollama_stream(prompt, model=answer_model, timeout=timeout),
+                lambda text: response_placeholder.markdown(f"**Bot:** {text}"),
+            )
         bot_role_text = response_text.strip()
     else:
         # blocking call (non-stream)
         with st.spinner("Ollama is generating..."):
-            bot_role_text = call_ollama_blocking(prompt, model=model_choice, timeout=timeout)
+            bot_role_text = call_ollama_blocking(prompt, model=answer_model, timeout=timeout)
             response_placeholder.markdown(f"**Bot:** {bot_role_text}")
 
     # append to session chat and render full chat
@@ -4,13 +4,16 @@ import os
 import json
 import tempfile
 from datetime import datetime
-from backend.ollama_chatbot import OllamaPDFChatbot, RateLimiter
-from backend.ocr import extract_text_from_scanned_pdf
+from backend.ollama_chatbot import get_pdf_chatbot, RateLimiter
 from backend.session_manager import SessionManager
 from backend.utils import format_for_json, format_for_txt
 from backend.chunker import TextChunker
-from backend.pdf_loader import extract_pdf_text, is_scanned_pdf, get_pdf_metadata
+from backend.pdf_loader import extract_pdf_text, get_pdf_metadata, OCR_LANG
 from backend.text_search import TextSearcher
+from backend.context_packer import pack_context, context_budget, estimate_tokens, chunk_locations, find_sections
+from backend.summarizer import MapReduceSummarizer
+from backend.ingest_cache import get_ingest_cache, ingest_key, config_key
+from backend.conversation_memory import ConversationMemory, HISTORY_LIMIT
 
 # Set page configuration
 st.set_page_config(
@@ -100,9 +103,29 @@ def initialize_session_state():
         st.session_state.show_preview = False
     if "pdf_metadata" not in st.session_state:
         st.session_state.pdf_metadata = {}
+    if "conversation_mode" not in st.session_state:
+        st.session_state.conversation_mode = True
+    if "conversation_memory" not in st.session_state:
+        st.session_state.conversation_memory = ConversationMemory()
+    if "pinned_chunks" not in st.session_state:
+        st.session_state.pinned_chunks = []
+    if "pdf_page_offsets" not in st.session_state:
+        st.session_state.pdf_page_offsets = []
+    if "chunk_locations" not in st.session_state:
+        st.session_state.chunk_locations = []
+    if "auto_route" not in st.session_state:
+        st.session_state.auto_route = False
+    if "conversation_model" not in st.session_state:
+        st.session_state.conversation_model = None
 
 initialize_session_state()
 
+# Forget the conversation's memory, pinned context and model (chat history stays on screen)
+def reset_conversation():
+    st.session_state.conversation_memory.clear()
+    st.session_state.pinned_chunks = []
+    st.session_state.conversation_model = None
+
 # Header
 st.markdown("""
 <div class="main-header">
@@ -112,10 +135,12 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Check Ollama connection
-pdf_chatbot = OllamaPDFChatbot()
+pdf_chatbot = get_pdf_chatbot()
 connection_status = pdf_chatbot.check_connection()
 
 if connection_status:
+    # Start loading the model now so the first question does not wait for it
+    pdf_chatbot.prepare_model(st.session_state.selected_model, routed=st.session_state.auto_route)
     st.markdown('<div class="status-box success">✅ AI is ready to chat!</div>', unsafe_allow_html=True)
 else:
     st.markdown('<div class="status-box error">❌ AI is not available. Please start Ollama first.</div>', unsafe_allow_html=True)
@@ -136,50 +161,66 @@ if uploaded_file:
             st.rerun()
     with col3:
         if st.button("🗑️ Clear"):
-            for key in ["pdf_text", "pdf_chunks", "chat_history", "show_preview", "pdf_metadata"]:
+            for key in ["pdf_text", "pdf_chunks", "chat_history", "show_preview", "pdf_metadata",
+                        "conversation_memory", "pinned_chunks", "pdf_page_offsets", "chunk_locations",
+                        "pdf_extract_lease", "pdf_chunk_lease", "pdf_searcher"]:
                 if key in st.session_state:
                     del st.session_state[key]
             st.rerun()
 
 # Step 2: Process PDF and Show Preview
 if uploaded_file and st.session_state.processing:
-    with st.spinner("🔄 Extracting text from PDF..."):
+    progress_bar = st.progress(0.0, text="🔄 Extracting text from PDF...")
+
+    def show_extraction_progress(pages_done, total_pages, stage):
+        label = "📖 Running OCR on scanned document" if stage.startswith("ocr") else "🔄 Extracting text"
+        fraction = pages_done / total_pages if total_pages else 1.0
+        progress_bar.progress(fraction, text=f"{label}: page {pages_done}/{total_pages}")
+
+    def extract() -> dict:
+        # Save uploaded file temporarily
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+            tmp_file.write(uploaded_file.getvalue())
+            pdf_path = tmp_file.name
         try:
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(uploaded_file.read())
-                pdf_path = tmp_file.name
-
-            # Get metadata
-            metadata = get_pdf_metadata(pdf_path)
-            st.session_state.pdf_metadata = metadata
-
-            # Extract text
-            text = extract_pdf_text(pdf_path)
-
-            # Try OCR if needed
-            if not text.strip() or is_scanned_pdf(pdf_path):
-                st.info("📖 Running OCR on scanned document...")
-                success, ocr_text, _ = extract_text_from_scanned_pdf(pdf_path)
-                if success:
-                    text = ocr_text
-
-            # Save extracted text
-            st.session_state.pdf_text = text
-            st.session_state.processing = False
-            st.session_state.show_preview = True
-
-            # Clean up
+            # Extract text (falls back to OCR for scanned PDFs). Completed pages are
+            # checkpointed by document hash, so a rerun or retry resumes where it stopped.
+            extraction_stats = {}
+            text = extract_pdf_text(pdf_path, progress_callback=show_extraction_progress, stats=extraction_stats)
+            if not text.strip():
+                # Raise rather than return, so a failed extraction is not cached for everyone
+                raise ValueError("No text could be extracted from this PDF.")
+            return {
+                "text": text,
+                "page_offsets": extraction_stats.get("page_offsets", []),
+                "metadata": get_pdf_metadata(pdf_path),
+            }
+        finally:
             os.remove(pdf_path)
 
-            st.success(f"✅ Text extracted successfully! ({len(text):,} characters)")
-            st.rerun()
+    try:
+        # Shared across sessions: the same PDF uploaded by anyone is extracted only once
+        lease = get_ingest_cache().open(
+            ingest_key(uploaded_file.getvalue(), stage="extract", dpi=300, lang=OCR_LANG), extract
+        )
+        extracted = lease.value
+
+        # Save extracted text; page offsets let retrieved chunks be cited by page
+        st.session_state.pdf_extract_lease = lease
+        st.session_state.pdf_metadata = extracted["metadata"]
+        st.session_state.pdf_text = extracted["text"]
+        st.session_state.pdf_page_offsets = extracted["page_offsets"]
+        reset_conversation()
+        st.session_state.processing = False
+        st.session_state.show_preview = True
 
-        except Exception as e:
-            st.error(f"❌ Error: {str(e)}")
-            st.session_state.processing = False
-            if 'pdf_path' in locals() and os.path.exists(pdf_path):
-                os.remove(pdf_path)
+        reused = " (reused from an earlier upload)" if lease.hit else ""
+        st.success(f"✅ Text extracted successfully! ({len(extracted['text']):,} characters){reused}")
+        st.rerun()
+
+    except Exception as e:
+        st.error(f"❌ Error: {str(e)}")
+        st.session_state.processing = False
 
 # Step 3: Preview Extracted Data
 if st.session_state.show_preview and st.session_state.pdf_text:
@@ -233,8 +274,32 @@ if st.session_state.show_preview and st.session_state.pdf_text:
         # Create chunks
         with st.spinner("🔄 Creating text chunks for AI processing..."):
             chunker = TextChunker(chunk_size=1000, overlap=200)
-            chunks = chunker.chunk_text(st.session_state.pdf_text)
+
+            def build_chunks() -> dict:
+                text = st.session_state.pdf_text
+                chunks = chunker.chunk_text(text)
+                return {
+                    "chunks": chunks,
+                    "locations": chunk_locations(
+                        chunker.chunk_spans(text), st.session_state.pdf_page_offsets, find_sections(text)
+                    ),
+                    "searcher": TextSearcher(chunks),
+                }
+
+            extract_lease = st.session_state.get("pdf_extract_lease")
+            if extract_lease is not None:
+                lease = get_ingest_cache().open(
+                    config_key(extract_lease.key, stage="chunks", chunk_size=1000, overlap=200), build_chunks
+                )
+                st.session_state.pdf_chunk_lease = lease
+                indexed = lease.value
+            else:
+                indexed = build_chunks()
+            chunks = indexed["chunks"]
             st.session_state.pdf_chunks = chunks
+            st.session_state.chunk_locations = indexed["locations"]
+            st.session_state.pdf_searcher = indexed["searcher"]
+            reset_conversation()
         
         st.success(f"✅ Created {len(chunks)} text chunks for optimal AI processing!")
         st.rerun()
@@ -268,18 +333,50 @@ if st.session_state.pdf_chunks:
             if connection_status:
                 available_models = pdf_chatbot.get_available_models()
                 if available_models:
+                    previous_model = st.session_state.selected_model
                     st.session_state.selected_model = st.selectbox(
                         "🤖 AI Model:", available_models, 
                         index=0 if st.session_state.selected_model not in available_models else available_models.index(st.session_state.selected_model)
                     )
+                    if st.session_state.selected_model != previous_model:
+                        # The user's new choice answers the next turn, even mid-conversation
+                        st.session_state.conversation_model = None
+                    model_status = pdf_chatbot.prepare_model(st.session_state.selected_model,
+                                                             routed=st.session_state.auto_route)
+                    if model_status["status"] == "ready":
+                        load_info = f" (loaded in {model_status['load_ms'] / 1000:.1f}s)" if model_status["load_ms"] else ""
+                        st.caption(f"🔥 Model warm{load_info}")
+                    elif model_status["status"] == "loading":
+                        st.caption("⏳ Warming up model in the background...")
+                    elif model_status["status"] == "failed":
+                        st.caption(f"⚠️ Warm-up failed: {model_status['error']}")
+                    st.session_state.auto_route = st.checkbox(
+                        "🧭 Pick model per question",
+                        value=st.session_state.auto_route,
+                        help="Send quick lookups to a small, fast model and synthesis questions to a "
+                             "larger one, within each model's latency target (OLLAMA_ROUTER_SLOS)."
+                    )
                 else:
                     st.warning("No Ollama models found. Install one with: `ollama pull llama2`")
         with col2:
             st.session_state.temperature = st.slider(
                 "🌡️ Creativity (Temperature):", 
-                min_value=0.1, max_value=1.0, 
+                min_value=0.0, max_value=1.0, 
                 value=st.session_state.temperature, step=0.1
             )
+            st.session_state.cache_responses = st.checkbox(
+                "♻️ Reuse cached answers",
+                value=st.session_state.get("cache_responses", False),
+                help="Identical questions are always answered from cache at temperature 0. "
+                     "Tick to also reuse cached answers at higher temperatures."
+            )
+            st.session_state.conversation_mode = st.checkbox(
+                "🧠 Conversation mode",
+                value=st.session_state.conversation_mode,
+                help="Keep the document context of the first question as a fixed prompt prefix "
+                     "so Ollama reuses it on follow-ups instead of re-reading it every turn. "
+                     "Older turns are folded into a running summary to keep prompts short."
+            )
 
     # Chat input
     user_question = st.text_area(
@@ -293,10 +390,35 @@ if st.session_state.pdf_chunks:
         if st.button("🚀 Ask AI", type="primary", disabled=not user_question.strip() or not connection_status):
             with st.spinner("🤖 AI is analyzing..."):
                 try:
-                    # Get relevant text chunks
-                    searcher = TextSearcher(st.session_state.pdf_chunks)
-                    context_chunks = searcher.search_relevant_chunks(user_question, 5)
-                    context = " ".join(context_chunks)
+                    # Get relevant text chunks: the best-scoring set that fits the model's
+                    # context window next to the answer, marked with page and section
+                    searcher = st.session_state.get("pdf_searcher") or TextSearcher(st.session_state.pdf_chunks)
+                    scored = searcher.score_chunks(user_question)
+                    packed = pack_context(
+                        scored,
+                        context_budget(st.session_state.max_tokens),
+                        st.session_state.chunk_locations
+                    )
+                    context_chunks = packed["blocks"]
+                    context = packed["text"]
+
+                    # Small or large model per question; a conversation keeps the model of
+                    # its first turn so the cached prompt prefix stays valid
+                    route = None
+                    answer_model = st.session_state.selected_model
+                    memory = st.session_state.conversation_memory
+                    if st.session_state.conversation_mode and len(memory):
+                        answer_model = st.session_state.conversation_model or answer_model
+                    elif st.session_state.auto_route:
+                        route = pdf_chatbot.router.route(
+                            user_question,
+                            scores=[score for score, _, _ in scored],
+                            prompt_tokens=packed["tokens"],
+                            num_predict=st.session_state.max_tokens
+                        )
+                        if route:
+                            answer_model = route.model
+                    st.session_state.conversation_model = answer_model
 
                     # Create system prompt
                     system_prompt = f"""You are a helpful AI assistant analyzing a PDF document. 
@@ -304,19 +426,64 @@ if st.session_state.pdf_chunks:
                     Answer based on the provided document content. Be specific and reference relevant parts.
                     If information isn't in the document, say so clearly."""
 
+                    # Shown only while other users' requests are ahead of ours
+                    queue_status = st.empty()
+
+                    def show_queue(position, eta):
+                        queue_status.info(f"🕒 Waiting for the AI: {position} request(s) ahead, about {eta:.0f}s")
+
                     # Get AI response
-                    response = pdf_chatbot.get_response(
-                        user_question,
-                        context=context,
-                        system_prompt=system_prompt
-                    )
+                    if st.session_state.conversation_mode:
+                        # The first question's chunks become the stable prefix; follow-ups
+                        # only add chunks that are not already pinned. Pinned chunks leave
+                        # room for the conversation memory, and the extra chunks get what
+                        # is left of the context budget after both.
+                        budget = context_budget(st.session_state.max_tokens)
+                        if not st.session_state.pinned_chunks:
+                            st.session_state.pinned_chunks = pack_context(
+                                scored, budget - memory.token_budget, st.session_state.chunk_locations
+                            )["blocks"]
+                        pinned = st.session_state.pinned_chunks
+                        new_blocks = dict(zip(packed["chunks"], packed["blocks"]))
+                        extra = pack_context(
+                            [c for c in scored if c[1] in new_blocks and new_blocks[c[1]] not in pinned],
+                            budget - estimate_tokens("\n\n".join(pinned)) - memory.tokens(),
+                            st.session_state.chunk_locations
+                        )
+                        extra_chunks = extra["blocks"]
+                        # Summary of older turns plus the last few; the new turn is appended on success
+                        history = memory.messages()
+                        sent = len(history)
+                        response = pdf_chatbot.get_chat_response(
+                            user_question,
+                            context="\n\n".join(pinned),
+                            system_prompt=system_prompt,
+                            history=history,
+                            extra_context="\n\n".join(extra_chunks),
+                            queue_callback=show_queue,
+                            model=answer_model
+                        )
+                        memory.model = answer_model
+                        memory.extend(history[sent:])
+                    else:
+                        response = pdf_chatbot.get_response(
+                            user_question,
+                            context=context,
+                            system_prompt=system_prompt,
+                            queue_callback=show_queue,
+                            model=answer_model
+                        )
+                    queue_status.empty()
 
                     # Add to history
                     st.session_state.chat_history.append({
                         "user": user_question,
                         "bot": response,
                         "timestamp": datetime.now().isoformat(),
-                        "chunks_used": len(context_chunks)
+                        "chunks_used": len(context_chunks),
+                        "metrics": st.session_state.get("last_generation_metrics"),
+                        "model": answer_model,
+                        "route": route.as_dict() if route else None
                     })
                     
 
@@ -328,16 +495,44 @@ if st.session_state.pdf_chunks:
     with col2:
         if st.button("🗑️ Clear Chat"):
             st.session_state.chat_history = []
+            reset_conversation()
             st.rerun()
 
+    # Whole-document summary (map-reduce over every chunk, not just the top matches)
+    if st.button("📚 Summarize Entire Document", disabled=not connection_status):
+        summarizer = MapReduceSummarizer(model=st.session_state.selected_model)
+        progress = st.progress(0.0, text="Summarizing sections...")
+        partials = st.expander("🧩 Partial summaries (as they arrive)", expanded=False)
+        try:
+            for event in summarizer.iter_summarize(st.session_state.pdf_chunks):
+                if event["stage"] == "final":
+                    st.session_state.chat_history.append({
+                        "user": "📚 Summarize the entire document",
+                        "bot": event["summary"],
+                        "timestamp": datetime.now().isoformat(),
+                        "chunks_used": len(st.session_state.pdf_chunks)
+                    })
+                    st.rerun()
+                label = "Summarizing sections" if event["stage"] == "map" else f"Merging summaries (level {event['level']})"
+                progress.progress(event["done"] / event["total"], text=f"{label}: {event['done']}/{event['total']}")
+                partials.markdown(f"**{label} · part {event['index'] + 1}:** {event['summary']}")
+        except Exception as e:
+            st.error(f"❌ Summarization failed: {str(e)}")
+
 
 # Chat history display (full width)
 if st.session_state.chat_history:
     st.markdown("---")
     st.subheader("💬 Chat History")
+    if len(st.session_state.chat_history) > HISTORY_LIMIT:
+        st.caption(f"Showing the last {HISTORY_LIMIT} of {len(st.session_state.chat_history)} exchanges.")
+    summary = st.session_state.conversation_memory.summary
+    if summary:
+        with st.expander("🧠 Summary of the earlier conversation"):
+            st.write(summary)
     
     # Display chat messages using safe Streamlit chat components
-    for chat in reversed(st.session_state.chat_history):
+    for chat in reversed(st.session_state.chat_history[-HISTORY_LIMIT:]):
         # User message
         with st.chat_message("user"):
             st.write(chat['user'])
@@ -345,6 +540,15 @@ if st.session_state.chat_history:
         # Bot message
         with st.chat_message("assistant"):
             st.write(chat['bot'])
+            metrics = chat.get("metrics")
+            if metrics:
+                st.caption(
+                    f"⏱️ Prompt eval: {metrics['prompt_tokens']} tokens in {metrics['prompt_eval_ms']:.0f} ms · "
+                    f"Generation: {metrics['eval_tokens']} tokens at {metrics['tokens_per_s']:.1f} tok/s"
+                )
+            route = chat.get("route")
+            if route:
+                st.caption(f"🧭 {route['model']}: {route['reason']} (difficulty {route['difficulty']:.2f})")
 
 
 
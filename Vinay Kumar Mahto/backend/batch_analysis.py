@@ -0,0 +1,163 @@
+import os
+import hashlib
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Generator, List, Optional
+
+from backend.checkpoint import ExtractionCheckpoint, CHECKPOINT_ROOT
+from backend.ollama_client import OllamaClient, get_ollama_client
+from backend.model_lifecycle import get_model_lifecycle
+from backend.context_packer import num_ctx_options
+from backend.scheduler import GenerationCancelled, OLLAMA_NUM_PARALLEL, PRIORITY_BATCH
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant. Analyze the chunk carefully."
+
+
+def chunks_fingerprint(chunks: List[str]) -> str:
+    """SHA-256 over the chunk texts; a different chunking of the same file gets a new id."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class BatchAnalyzer:
+    def __init__(self, chunks: List[str], instruction: str, model: str,
+                 system_prompt: str = DEFAULT_SYSTEM_PROMPT, workers: int = OLLAMA_NUM_PARALLEL,
+                 work_dir: str = CHECKPOINT_ROOT, client: OllamaClient = None):
+        """
+        Run one instruction over every chunk of a document.
+
+        Each chunk's answer is checkpointed as soon as it arrives (one JSON
+        file per chunk, keyed by the chunk texts, model and instruction), so
+        an interrupted run resumes where it stopped. Nothing is written to
+        disk until a run starts; until then the analyzer only reads an
+        existing checkpoint, so it is cheap to build on every rerun.
+
+        :param chunks: Document chunks, in order
+        :param instruction: What to do with each chunk
+        :param model: Ollama model name
+        :param workers: Requests kept in flight; the scheduler still caps the server-wide total
+        """
+        self.chunks = chunks
+        self.instruction = instruction
+        self.model = model
+        self.system_prompt = system_prompt
+        self.workers = max(1, workers)
+        self.client = client or get_ollama_client()
+        job = hashlib.sha256(f"{model}\0{system_prompt}\0{instruction}".encode("utf-8")).hexdigest()[:16]
+        self.doc_hash, self.stage, self.work_dir = chunks_fingerprint(chunks), f"analysis_{job}", work_dir
+        self._checkpoint: Optional[ExtractionCheckpoint] = None
+        self._group = None
+
+    def _existing_checkpoint(self) -> Optional[ExtractionCheckpoint]:
+        if self._checkpoint is None and os.path.isdir(os.path.join(self.work_dir, self.doc_hash, self.stage)):
+            self._checkpoint = ExtractionCheckpoint(self.doc_hash, self.stage, self.work_dir)
+        return self._checkpoint
+
+    @property
+    def checkpoint(self) -> ExtractionCheckpoint:
+        """The job's checkpoint, created on first use."""
+        if self._existing_checkpoint() is None:
+            self._checkpoint = ExtractionCheckpoint(self.doc_hash, self.stage, self.work_dir)
+            self._checkpoint.set_total_pages(len(self.chunks))
+        return self._checkpoint
+
+    def _analyze(self, index: int, group) -> str:
+        data = group.generate({
+            "model": self.model,
+            "stream": False,
+            "keep_alive": get_model_lifecycle(self.client.base_url).keep_alive_for(self.model),
+            "options": num_ctx_options(),
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": self.chunks[index]},
+                {"role": "user", "content": self.instruction},
+            ],
+        }, path="/api/chat")
+        result = data.get("message", {}).get("content", "").strip()
+        # Saved from the worker so answers that finish after the reader stopped are kept
+        self.checkpoint.save_page(index + 1, result, model=self.model, finished_at=time.time())
+        return result
+
+    def completed(self) -> int:
+        checkpoint = self._existing_checkpoint()
+        return len(checkpoint.completed_pages()) if checkpoint else 0
+
+    def iter_run(self) -> Generator[Dict, None, None]:
+        """
+        Analyze every chunk that has no saved result yet and yield one event per chunk:
+        ``{"index", "result", "error", "resumed", "done", "total", "per_min", "eta_s"}``.
+
+        ``per_min`` and ``eta_s`` only count chunks analyzed in this run. Failed
+        chunks are reported but not saved, so the next run retries them.
+        Closing the generator cancels queued and in-flight requests.
+        """
+        total = len(self.chunks)
+        saved = self.checkpoint.completed_pages()
+        done = 0
+        for index in sorted(n - 1 for n in saved if 0 < n <= total):
+            done += 1
+            yield {"index": index, "result": self.checkpoint.load_page(index + 1)["text"], "error": None,
+                   "resumed": True, "done": done, "total": total, "per_min": 0.0, "eta_s": None}
+
+        pending = [i for i in range(total) if i + 1 not in saved]
+        if not pending:
+            return
+        group = self._group = self.client.group(priority=PRIORITY_BATCH)
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-analysis")
+        start = time.time()
+        finished = 0
+        try:
+            futures = {executor.submit(self._analyze, i, group): i for i in pending}
+            for future in as_completed(futures):
+                index = futures[future]
+                result, error = None, None
+                try:
+                    result = future.result()
+                except GenerationCancelled:
+                    raise
+                except Exception as e:
+                    error = str(e)
+                    logger.warning(f"Chunk {index + 1} failed: {e}")
+                done += 1
+                finished += 1
+                elapsed = time.time() - start
+                per_min = finished / elapsed * 60 if elapsed > 0 else 0.0
+                remaining = total - done
+                yield {"index": index, "result": result, "error": error, "resumed": False,
+                       "done": done, "total": total, "per_min": per_min,
+                       "eta_s": remaining / per_min * 60 if per_min else None}
+        finally:
+            group.cancel("batch analysis stopped")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self):
+        if self._group is not None:
+            self._group.cancel("batch analysis stopped")
+
+    def results_table(self, preview_chars: int = 200) -> List[Dict]:
+        """One row per chunk for display or CSV/JSON export."""
+        checkpoint = self._existing_checkpoint()
+        rows = []
+        for index, chunk in enumerate(self.chunks):
+            saved = checkpoint.load_page(index + 1) if checkpoint else None
+            rows.append({
+                "chunk": index + 1,
+                "chunk_text": chunk[:preview_chars],
+                "result": saved["text"] if saved else "",
+                "status": "done" if saved else "pending",
+            })
+        return rows
+
+    def reset(self):
+        """Forget saved results so the next run starts from scratch."""
+        checkpoint = self._existing_checkpoint()
+        if checkpoint is not None:
+            checkpoint.clear()
+            checkpoint.set_total_pages(len(self.chunks))
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import logging
+from typing import Dict, Optional, Set
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Work directory for per-page extraction checkpoints
+CHECKPOINT_ROOT = os.environ.get(
+    "POLICYNAV_WORK_DIR",
+    os.path.join(tempfile.gettempdir(), "policynav_work")
+)
+
+
+def compute_file_hash(pdf_path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Return the SHA-256 hex digest of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCheckpoint:
+    def __init__(self, doc_hash: str, stage: str = "text", work_dir: str = CHECKPOINT_ROOT):
+        """
+        :param doc_hash: Content hash of the document being extracted
+        :param stage: Pipeline stage name (e.g. "text", "ocr_300")
+        :param work_dir: Root directory holding all checkpoints
+        """
+        self.doc_hash = doc_hash
+        self.stage = stage
+        self.path = os.path.join(work_dir, doc_hash, stage)
+        os.makedirs(self.path, exist_ok=True)
+
+    def _page_file(self, page_num: int) -> str:
+        return os.path.join(self.path, f"page_{page_num:05d}.json")
+
+    def _meta_file(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def _write_json(self, path: str, data: Dict):
+        # Write to a temp file first so a crash never leaves a half-written page; the
+        # name is unique so concurrent extractions of the same document do not collide
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable checkpoint {path}: {e}")
+            return None
+
+    def has_page(self, page_num: int) -> bool:
+        return os.path.exists(self._page_file(page_num))
+
+    def save_page(self, page_num: int, text: str, **extra):
+        """Persist the result for one page (1-based page number)."""
+        data = {"page": page_num, "text": text}
+        data.update(extra)
+        self._write_json(self._page_file(page_num), data)
+
+    def load_page(self, page_num: int) -> Optional[Dict]:
+        return self._read_json(self._page_file(page_num))
+
+    def completed_pages(self) -> Set[int]:
+        pages = set()
+        for name in os.listdir(self.path):
+            if name.startswith("page_") and name.endswith(".json"):
+                pages.add(int(name[len("page_"):-len(".json")]))
+        return pages
+
+    def set_total_pages(self, total_pages: int):
+        meta = self._read_json(self._meta_file()) or {}
+        meta["total_pages"] = total_pages
+        self._write_json(self._meta_file(), meta)
+
+    @property
+    def total_pages(self) -> Optional[int]:
+        meta = self._read_json(self._meta_file()) or {}
+        return meta.get("total_pages")
+
+    def is_complete(self) -> bool:
+        total = self.total_pages
+        return total is not None and len(self.completed_pages()) >= total
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Tuple
 
 class TextChunker:
     def __init__(self, chunk_size: int = 1000, overlap: int = 100):
@@ -9,6 +9,18 @@ class TextChunker:
         self.chunk_size = chunk_size
         self.overlap = overlap
 
+    def chunk_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        (start, end) offsets of each chunk in ``text``, before stripping.
+        """
+        spans = []
+        start = 0
+        while start < len(text):
+            end = min(start + self.chunk_size, len(text))
+            spans.append((start, end))
+            start += self.chunk_size - self.overlap
+        return spans
+
     def chunk_text(self, text: str) -> List[str]:
         """
         Split text into overlapping chunks.
@@ -16,11 +28,4 @@ class TextChunker:
         if not text:
             return []
 
-        chunks = []
-        start = 0
-        while start < len(text):
-            end = min(start + self.chunk_size, len(text))
-            chunk = text[start:end]
-            chunks.append(chunk.strip())
-            start += self.chunk_size - self.overlap
-        return chunks
+        return [text[start:end].strip() for start, end in self.chunk_spans(text)]
@@ -0,0 +1,202 @@
+import os
+import re
+import bisect
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+# Context window every request asks for and prompts are packed for
+NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", 4096))
+# Rough English average for llama-style tokenizers; errs on the long side for prose
+CHARS_PER_TOKEN = 4
+# Tokens kept free for instructions, the question and the prompt template
+PROMPT_RESERVE_TOKENS = 400
+# Context never shrinks below this share of num_ctx, even with a huge num_predict
+MIN_CONTEXT_SHARE = 0.25
+# Candidates scoring below this fraction of the previous one end the top-k list
+SCORE_DROP_RATIO = 0.5
+MAX_CANDIDATES = 20
+# Knapsack capacity is quantized to at most this many steps to keep the table small
+KNAPSACK_STEPS = 400
+
+# Numbered headings ("2.", "4.3 Teacher Education", "Chapter 5") or short ALL-CAPS lines
+_HEADING = re.compile(
+    r"^[ \t]*((?i:chapter|part|section)\s+[\dIVXLC]+[^\n]{0,80}"
+    r"|\d+(?:\.\d+){0,3}\.?[ \t]+[A-Z][^\n]{2,80}"
+    r"|[A-Z][A-Z0-9 ,&:\-]{3,60})[ \t]*$",
+    re.MULTILINE,
+)
+
+
+def num_ctx_options() -> Dict:
+    """
+    ``{"num_ctx": NUM_CTX}``, sent with every request so the window prompts
+    are packed for is the one Ollama uses, whatever the server default or
+    Modelfile says. Every request to a model must ask for the same num_ctx
+    or Ollama reloads it.
+    """
+    return {"num_ctx": NUM_CTX}
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def context_budget(num_predict: int, num_ctx: int = NUM_CTX, reserved: int = PROMPT_RESERVE_TOKENS) -> int:
+    """Tokens available for document context once the answer and the prompt template are accounted for."""
+    return max(int(num_ctx * MIN_CONTEXT_SHARE), num_ctx - num_predict - reserved)
+
+
+def fit_to_budget(text: str, budget_tokens: int) -> str:
+    """Cut ``text`` to the budget at the last paragraph or sentence break that fits."""
+    max_chars = budget_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    for sep in ("\n\n", "\n", ". "):
+        pos = cut.rfind(sep)
+        if pos > max_chars // 2:
+            return cut[:pos + len(sep)].rstrip()
+    return cut
+
+
+def find_sections(text: str) -> List[Tuple[int, str]]:
+    """(offset, heading) for every line of ``text`` that looks like a section heading."""
+    sections = []
+    for match in _HEADING.finditer(text):
+        heading = " ".join(match.group(1).split())
+        if heading.isdigit():
+            continue
+        sections.append((match.start(1), heading[:80]))
+    return sections
+
+
+def chunk_locations(spans: Sequence[Tuple[int, int]], page_offsets: Optional[Sequence[int]] = None,
+                    sections: Optional[Sequence[Tuple[int, str]]] = None) -> List[Dict]:
+    """
+    Page number (1-based) and enclosing section heading for each chunk span.
+
+    :param spans: (start, end) of each chunk in the document text
+    :param page_offsets: Start offset of every page in the same text
+    :param sections: Output of find_sections() for the same text
+    """
+    section_starts = [offset for offset, _ in sections or []]
+    locations = []
+    for start, end in spans:
+        location = {}
+        if page_offsets:
+            location["page"] = max(1, bisect.bisect_right(page_offsets, start))
+        if section_starts:
+            # The last heading before the chunk ends; a heading inside the chunk names it best
+            i = bisect.bisect_right(section_starts, end) - 1
+            if i >= 0:
+                location["section"] = sections[i][1]
+        locations.append(location)
+    return locations
+
+
+def format_marker(index: int, location: Optional[Dict]) -> str:
+    parts = []
+    if location:
+        page = location.get("page")
+        if page is not None:
+            parts.append(f"Page {page}")
+        if location.get("section"):
+            parts.append(f"Section: {location['section']}")
+    if not parts:
+        parts.append(f"Chunk {index + 1}")
+    return "[" + " | ".join(parts) + "]"
+
+
+def adaptive_cutoff(scores: Sequence[float], drop_ratio: float = SCORE_DROP_RATIO, min_k: int = 1) -> int:
+    """
+    How many of the descending ``scores`` to keep: stop at the first score
+    that falls below ``drop_ratio`` of the previous one or of the top score.
+    """
+    if not scores:
+        return 0
+    top = scores[0]
+    if top <= 0:
+        return min(min_k, len(scores))
+    k = 1
+    while k < len(scores):
+        score = scores[k]
+        if k >= min_k and (score < scores[k - 1] * drop_ratio or score < top * drop_ratio):
+            break
+        k += 1
+    return k
+
+
+def _knapsack(costs: List[int], values: List[float], capacity: int) -> List[int]:
+    """0/1 knapsack over quantized costs; returns the chosen item positions."""
+    step = max(1, -(-capacity // KNAPSACK_STEPS))
+    weights = [-(-cost // step) for cost in costs]
+    slots = capacity // step
+    best = [0.0] * (slots + 1)
+    keep = [[False] * (slots + 1) for _ in costs]
+    for i, (weight, value) in enumerate(zip(weights, values)):
+        for c in range(slots, weight - 1, -1):
+            candidate = best[c - weight] + value
+            if candidate > best[c]:
+                best[c] = candidate
+                keep[i][c] = True
+    chosen, c = [], slots
+    for i in range(len(costs) - 1, -1, -1):
+        if keep[i][c]:
+            chosen.append(i)
+            c -= weights[i]
+    return sorted(chosen)
+
+
+def pack_context(candidates: Sequence[Tuple[float, int, str]], budget_tokens: int,
+                 locations: Optional[Sequence[Dict]] = None, drop_ratio: float = SCORE_DROP_RATIO,
+                 max_candidates: int = MAX_CANDIDATES) -> Dict:
+    """
+    Choose the retrieved chunks that fit ``budget_tokens`` with the highest
+    total score and lay them out in document order, each under a
+    ``[Page n | Section: ...]`` marker.
+
+    Candidates after a sharp score drop are not considered at all. When even
+    the best chunk alone is over budget it is cut to fit rather than dropped.
+
+    :param candidates: (score, chunk index, text), any order
+    :param locations: Optional per-index dicts with "page" and/or "section"
+    :return: ``{"text", "blocks", "chunks", "tokens", "considered"}`` where
+        ``blocks`` are the marked chunks and ``chunks`` their indices
+    """
+    ranked = sorted((c for c in candidates if c[2].strip()), key=lambda c: c[0], reverse=True)[:max_candidates]
+    ranked = ranked[:adaptive_cutoff([score for score, _, _ in ranked], drop_ratio)]
+    if not ranked or budget_tokens <= 0:
+        return {"text": "", "blocks": [], "chunks": [], "tokens": 0, "considered": len(ranked)}
+
+    def location(index):
+        return locations[index] if locations is not None and index < len(locations) else None
+
+    blocks = [f"{format_marker(index, location(index))}\n{text.strip()}" for _, index, text in ranked]
+    # +2 tokens per block for the blank line between blocks
+    costs = [estimate_tokens(block) + 2 for block in blocks]
+    # A small floor keeps zero-score fallbacks in play when nothing matched
+    values = [max(score, 0.0) + 1e-3 for score, _, _ in ranked]
+    chosen = _knapsack(costs, values, budget_tokens)
+    if not chosen:
+        _, index, text = ranked[0]
+        marker = format_marker(index, location(index))
+        blocks[0] = f"{marker}\n{fit_to_budget(text.strip(), budget_tokens - estimate_tokens(marker) - 2)}"
+        chosen = [0]
+
+    chosen.sort(key=lambda i: ranked[i][1])
+    picked = [blocks[i] for i in chosen]
+    text = "\n\n".join(picked)
+    logger.debug(f"Packed {len(picked)}/{len(ranked)} chunks into {estimate_tokens(text)}/{budget_tokens} tokens")
+    return {
+        "text": text,
+        "blocks": picked,
+        "chunks": [ranked[i][1] for i in chosen],
+        "tokens": estimate_tokens(text),
+        "considered": len(ranked),
+    }
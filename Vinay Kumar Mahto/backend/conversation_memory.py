@@ -0,0 +1,191 @@
+import os
+import threading
+import logging
+from typing import Dict, List, Optional
+
+from backend.ollama_client import OllamaClient, GenerationGroup, get_ollama_client
+from backend.model_lifecycle import get_model_lifecycle
+from backend.context_packer import CHARS_PER_TOKEN, estimate_tokens, num_ctx_options
+from backend.response_cache import get_response_cache, make_cache_key
+from backend.scheduler import PRIORITY_BATCH
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+# Tokens of conversation (summary + verbatim turns) sent with a follow-up question
+MEMORY_TOKEN_BUDGET = int(os.environ.get("CONVERSATION_MEMORY_TOKENS", 1024))
+# Most recent turns (question + answer) always kept word for word
+RECENT_TURNS = int(os.environ.get("CONVERSATION_RECENT_TURNS", 3))
+# Most recent chat entries the apps render; older ones stay in the history and its exports
+HISTORY_LIMIT = int(os.environ.get("CONVERSATION_HISTORY_LIMIT", 100))
+SUMMARY_MAX_TOKENS = 256
+# Bump when the prompt changes so stale cached summaries are not reused
+PROMPT_VERSION = 1
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation about a policy document. Keep the "
+    "questions asked, the facts, numbers and page references given in the answers, and "
+    "anything the user said about what they need. Write at most 150 words.\n\n"
+    "CURRENT SUMMARY:\n{summary}\n\nNEW TURNS:\n{turns}\n\nUPDATED SUMMARY:"
+)
+
+
+def message_text(message: Dict) -> str:
+    """The part of a message worth remembering: the question, not the retrieved context sent with it."""
+    content = message.get("content") or ""
+    # Conversation mode sends "ADDITIONAL CONTEXT: ... QUESTION: ..." as the user message
+    marker = content.rfind("QUESTION:\n")
+    return content[marker + len("QUESTION:\n"):] if marker >= 0 else content
+
+
+def transcript(messages: List[Dict]) -> str:
+    return "\n".join(f"{m.get('role', 'user').title()}: {message_text(m)}" for m in messages)
+
+
+class ConversationMemory:
+    """
+    Bounded chat memory for follow-up questions: a rolling summary of older
+    turns plus the last ``recent_turns`` turns verbatim (fewer if they would
+    take more than half of ``token_budget``, but always the last one).
+
+    Once the conversation outgrows ``token_budget``, every turn but the
+    recent ones is folded into the summary by ``model`` on a background
+    thread, through the shared client at batch priority; until that finishes
+    those turns are still sent as they are. If summarizing fails, the
+    transcript is cut to its most recent part instead, so memory stays
+    bounded either way. ``model`` may be changed between turns.
+    """
+
+    def __init__(self, model: str = None, client: OllamaClient = None,
+                 token_budget: int = MEMORY_TOKEN_BUDGET, recent_turns: int = RECENT_TURNS):
+        self.model = model
+        self.client = client or get_ollama_client()
+        self.token_budget = token_budget
+        self.recent_turns = max(1, recent_turns)
+        self.summary = ""
+        self.turns: List[Dict] = []
+        self.compactions = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._group: Optional[GenerationGroup] = None
+        # Bumped by clear() so a summary finishing afterwards is dropped
+        self._epoch = 0
+
+    def __len__(self):
+        return len(self.turns)
+
+    def tokens(self) -> int:
+        with self._lock:
+            return estimate_tokens(self.summary) + self._turn_tokens(self.turns)
+
+    @staticmethod
+    def _turn_tokens(messages: List[Dict]) -> int:
+        return sum(estimate_tokens(m.get("content") or "") for m in messages)
+
+    def messages(self) -> List[Dict]:
+        """Chat messages to send before the next question: the summary, then the kept turns."""
+        with self._lock:
+            messages = list(self.turns)
+            if self.summary:
+                messages.insert(0, {"role": "system",
+                                    "content": f"SUMMARY OF THE EARLIER CONVERSATION:\n{self.summary}"})
+        return messages
+
+    def add(self, role: str, content: str):
+        self.extend([{"role": role, "content": content}])
+
+    def extend(self, messages: List[Dict]):
+        """
+        Append ``messages`` and start compacting in the background if over
+        budget. Only the question of a user message is kept: retrieved context
+        sent with it would fill the budget on its own.
+        """
+        with self._lock:
+            self.turns.extend({"role": m["role"], "content": message_text(m) if m["role"] == "user" else m["content"]}
+                              for m in messages)
+        if self.tokens() > self.token_budget:
+            self._compact()
+
+    def _compact(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            keep = 2 * self.recent_turns
+            while keep > 2 and self._turn_tokens(self.turns[-keep:]) > self.token_budget // 2:
+                keep -= 2
+            if len(self.turns) <= keep:
+                return
+            old = self.turns[:-keep]
+            summary, epoch = self.summary, self._epoch
+            # Created here so the work is tied to the calling browser session
+            self._group = group = self.client.group(priority=PRIORITY_BATCH)
+            self._thread = threading.Thread(target=self._summarize, args=(summary, old, epoch, group),
+                                            name="conversation-summary", daemon=True)
+        self._thread.start()
+
+    def _summarize(self, summary: str, old: List[Dict], epoch: int, group: GenerationGroup):
+        try:
+            new_summary = self._generate(summary, transcript(old), group)
+        except Exception as e:
+            logger.warning(f"Conversation summary failed ({e}); keeping the latest turns instead")
+            new_summary = ""
+        if not new_summary:
+            # Extractive fallback: the most recent text that fits the summary's size
+            text = f"{summary}\n{transcript(old)}".strip()
+            new_summary = text[-SUMMARY_MAX_TOKENS * CHARS_PER_TOKEN:]
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self.summary = new_summary
+            del self.turns[:len(old)]
+            self.compactions += 1
+        logger.info(f"Folded {len(old)} messages into the conversation summary ({len(new_summary)} chars)")
+
+    def _generate(self, summary: str, turns: str, group: GenerationGroup) -> str:
+        if not self.model:
+            return ""
+        options = {"temperature": 0, "num_predict": SUMMARY_MAX_TOKENS, **num_ctx_options()}
+        key = make_cache_key(endpoint="conversation_summary", version=PROMPT_VERSION, model=self.model,
+                             options=options, summary=summary, turns=turns)
+        cache = get_response_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        data = group.generate({
+            "model": self.model,
+            "prompt": SUMMARY_PROMPT.format(summary=summary or "(none yet)", turns=turns),
+            "stream": False,
+            "keep_alive": get_model_lifecycle(self.client.base_url).keep_alive_for(self.model),
+            "options": options,
+        }, timeout=180)
+        text = data.get("response", "").strip()
+        if data.get("done") and text:
+            cache.put(key, text, self.model)
+        return text
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until a summary in progress is done; False on timeout."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def clear(self):
+        """Forget everything and cancel a summary in progress."""
+        with self._lock:
+            self._epoch += 1
+            self.summary = ""
+            self.turns = []
+            group = self._group
+        if group is not None:
+            group.cancel("conversation cleared")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            compacting = self._thread is not None and self._thread.is_alive()
+            return {"turns": len(self.turns), "summary_chars": len(self.summary),
+                    "compactions": self.compactions, "compacting": compacting}
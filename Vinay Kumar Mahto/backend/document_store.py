@@ -0,0 +1,98 @@
+import hashlib
+import threading
+import weakref
+import logging
+from typing import Dict, Mapping, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def content_hash(pages: Mapping) -> str:
+    """SHA-256 over the page keys and texts, in order."""
+    digest = hashlib.sha256()
+    for key, text in pages.items():
+        digest.update(str(key).encode("utf-8", "surrogatepass"))
+        digest.update(b"\0")
+        digest.update(str(text).encode("utf-8", "surrogatepass"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class Document(dict):
+    """
+    Immutable ``{page: text}`` mapping addressed by the hash of its content.
+
+    A real dict, so existing readers (``.items()``, ``json.dumps``) work
+    unchanged, but every mutator raises TypeError and ``copy.copy`` /
+    ``copy.deepcopy`` return the document itself, so any number of sessions
+    can share one instance. ``dict(document)`` gives a mutable copy.
+    """
+
+    def __init__(self, pages: Mapping = None):
+        super().__init__(pages or {})
+        self.doc_id = content_hash(self)
+        self.chars = sum(len(str(text)) for text in self.values())
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Document is immutable; build a new one with dict(document)")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return Document, (dict(self),)
+
+    def __repr__(self):
+        return f"Document({self.doc_id[:12]}, pages={len(self)}, chars={self.chars})"
+
+
+class DocumentStore:
+    """
+    Process-wide, content-addressed set of live documents.
+
+    ``intern`` returns the one shared Document for a given content, so the
+    same PDF opened in several chat sessions (or by several users) is held
+    once. Entries are weak: a document is freed when no session refers to it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents: "weakref.WeakValueDictionary[str, Document]" = weakref.WeakValueDictionary()
+
+    def intern(self, pages: Mapping) -> Document:
+        """The shared Document for ``pages``; O(1) when ``pages`` already is one."""
+        if isinstance(pages, Document):
+            with self._lock:
+                return self._documents.setdefault(pages.doc_id, pages)
+        document = Document(pages)
+        with self._lock:
+            return self._documents.setdefault(document.doc_id, document)
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        with self._lock:
+            return self._documents.get(doc_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            documents = list(self._documents.values())
+        return {"documents": len(documents), "chars": sum(d.chars for d in documents)}
+
+
+_store: Optional[DocumentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    """Process-wide document store shared by every session."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DocumentStore()
+    return _store
@@ -0,0 +1,136 @@
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.ollama_client import OllamaClient, get_ollama_client
+from backend.model_lifecycle import get_model_lifecycle
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+# "sentence-transformers" (in-process) or "ollama" (/api/embed on the shared daemon)
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "sentence-transformers")
+# Model name for the chosen backend; empty = that backend's default
+EMBED_MODEL = os.environ.get("EMBED_MODEL", "")
+# Texts per /api/embed request, and requests kept in flight at once
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 64))
+EMBED_WORKERS = int(os.environ.get("EMBED_WORKERS", 4))
+EMBED_TIMEOUT = 120
+
+DEFAULT_MODELS = {
+    "sentence-transformers": "all-MiniLM-L6-v2",
+    "ollama": "nomic-embed-text",
+}
+
+
+class EmbeddingBackend:
+    """Turns texts into a float32 matrix with one row per text."""
+
+    name = ""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """In-process SentenceTransformer; the model is loaded on first use."""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model: str = DEFAULT_MODELS["sentence-transformers"], batch_size: int = 32):
+        super().__init__(model)
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model)
+        return self._model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        vectors = self._load().encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class OllamaEmbeddingBackend(EmbeddingBackend):
+    """
+    Embeddings from an embedding model served by Ollama (``/api/embed``).
+
+    Texts are sent ``batch_size`` at a time over the shared pooled client,
+    with up to ``workers`` batches in flight. Embedding requests skip the
+    generation scheduler: they run on a separate, small model and a query
+    embedding must not wait behind somebody's long chat answer.
+    """
+
+    name = "ollama"
+
+    def __init__(self, model: str = DEFAULT_MODELS["ollama"], client: OllamaClient = None,
+                 batch_size: int = EMBED_BATCH_SIZE, workers: int = EMBED_WORKERS):
+        super().__init__(model)
+        self.client = client or get_ollama_client()
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ollama-embed")
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        response = self.client.post("/api/embed", json={
+            "model": self.model,
+            "input": batch,
+            "keep_alive": get_model_lifecycle(self.client.base_url).keep_alive_for(self.model),
+        }, timeout=EMBED_TIMEOUT)
+        if response.status_code != 200:
+            raise RuntimeError(f"Ollama embed failed ({response.status_code}): {response.text[:200]}")
+        embeddings = response.json().get("embeddings") or []
+        if len(embeddings) != len(batch):
+            raise RuntimeError(f"Ollama returned {len(embeddings)} embeddings for {len(batch)} texts")
+        return embeddings
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            rows = self._embed_batch(batches[0])
+        else:
+            rows = [row for result in self._pool.map(self._embed_batch, batches) for row in result]
+        return np.asarray(rows, dtype=np.float32)
+
+
+_backends: Dict[tuple, EmbeddingBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def create_embedding_backend(name: str = EMBED_BACKEND, model: Optional[str] = None, **kwargs) -> EmbeddingBackend:
+    if name not in DEFAULT_MODELS:
+        raise ValueError(f"Unknown embedding backend {name!r}; use one of {', '.join(DEFAULT_MODELS)}")
+    model = model or EMBED_MODEL or DEFAULT_MODELS[name]
+    if name == "ollama":
+        return OllamaEmbeddingBackend(model, **kwargs)
+    return SentenceTransformerBackend(model, **kwargs)
+
+
+def get_embedding_backend(name: str = EMBED_BACKEND, model: Optional[str] = None) -> EmbeddingBackend:
+    """Process-wide embedding backend, so the model is loaded once rather than per session."""
+    model = model or EMBED_MODEL or DEFAULT_MODELS.get(name, "")
+    key = (name, model)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = _backends[key] = create_embedding_backend(name, model)
+            logger.info(f"Embedding with {name} model {model}")
+    return backend
@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+import weakref
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+# Memory budget for ingested documents no session is using; entries in use are never evicted
+INGEST_CACHE_MB = float(os.environ.get("INGEST_CACHE_MB", 512))
+
+
+def config_key(base: str, **config) -> str:
+    """``base`` extended with a hash of the pipeline settings that shaped the result."""
+    if not config:
+        return base
+    encoded = json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+    return f"{base}:{hashlib.sha256(encoded).hexdigest()[:16]}"
+
+
+def ingest_key(data: bytes, **config) -> str:
+    """Cache key for an upload: SHA-256 of its bytes plus the pipeline config."""
+    return config_key(hashlib.sha256(data).hexdigest(), **config)
+
+
+def estimate_size(value, _seen: set = None) -> int:
+    """Approximate bytes held by ``value``, counting shared objects once."""
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    if hasattr(value, "ntotal") and hasattr(value, "d"):
+        # faiss flat index: float32 vectors held outside Python
+        return value.ntotal * value.d * 4
+    if hasattr(value, "nbytes") and not callable(value.nbytes):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in value)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), seen)
+    return size
+
+
+class IngestLease:
+    """
+    A session's hold on a cached ingestion result (``value``). The entry cannot
+    be evicted while a lease is open. ``release`` ends it; so does garbage
+    collection, e.g. when the Streamlit session holding it goes away.
+    """
+
+    def __init__(self, cache: "IngestCache", key: str, value: Any, hit: bool):
+        self.key = key
+        self.value = value
+        self.hit = hit
+        self._finalizer = weakref.finalize(self, cache._release, key)
+
+    def release(self):
+        self._finalizer()
+
+
+class IngestCache:
+    """
+    Process-wide cache of extracted pages, chunks and indexes, keyed by
+    ``ingest_key``, so only the first upload of a document pays for
+    extraction, OCR, chunking and indexing.
+
+    Concurrent opens of the same key build it once. Entries are reference
+    counted through leases; when the total size exceeds the budget, the least
+    recently used entries without open leases are dropped.
+    """
+
+    def __init__(self, budget_mb: float = INGEST_CACHE_MB):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._building: Dict[str, threading.Lock] = {}
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _acquire(self, key: str) -> Optional[IngestLease]:
+        # Caller holds self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry["refs"] += 1
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return IngestLease(self, key, entry["value"], hit=True)
+
+    def open(self, key: str, build: Callable[[], Any]) -> IngestLease:
+        """Lease the entry for ``key``, calling ``build()`` first if it is not cached."""
+        with self._lock:
+            lease = self._acquire(key)
+            if lease is not None:
+                return lease
+            build_lock = self._building.setdefault(key, threading.Lock())
+        with build_lock:
+            try:
+                with self._lock:
+                    lease = self._acquire(key)
+                    if lease is not None:
+                        return lease
+                value = build()
+                size = estimate_size(value)
+                # Inserted before the build lock is dropped, so a concurrent open finds the entry
+                with self._lock:
+                    lease = self._acquire(key)
+                    if lease is not None:
+                        return lease
+                    self._entries[key] = {"value": value, "size": size, "refs": 1}
+                    self._bytes += size
+                    self._stats["misses"] += 1
+                    self._evict()
+            finally:
+                with self._lock:
+                    if self._building.get(key) is build_lock:
+                        del self._building[key]
+            logger.info(f"Ingested {key[:16]}… ({size / 1e6:.1f} MB); cache holds {self._bytes / 1e6:.1f} MB")
+            return IngestLease(self, key, value, hit=False)
+
+    def _release(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["refs"] = max(0, entry["refs"] - 1)
+                self._evict()
+
+    def _evict(self):
+        # Caller holds self._lock; oldest first, skipping entries in use
+        for key in list(self._entries):
+            if self._bytes <= self.budget_bytes:
+                return
+            entry = self._entries[key]
+            if entry["refs"] == 0:
+                del self._entries[key]
+                self._bytes -= entry["size"]
+                self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._bytes,
+                    "in_use": sum(1 for e in self._entries.values() if e["refs"])}
+
+
+_cache: Optional[IngestCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_ingest_cache() -> IngestCache:
+    """Process-wide ingestion cache shared by every session."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = IngestCache()
+    return _cache
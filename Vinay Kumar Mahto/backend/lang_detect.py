@@ -0,0 +1,51 @@
+import re
+
+# Tesseract language codes returned by detect_languages
+DEFAULT_LANG = "eng"
+
+DEVANAGARI_CHARS = re.compile(r"[\u0900-\u097F]")
+LATIN_CHARS = re.compile(r"[A-Za-z\u00C0-\u024F]")
+GERMAN_CHARS = re.compile(r"[äöüßÄÖÜ]")
+WORDS = re.compile(r"[^\W\d_]+")
+
+GERMAN_STOPWORDS = {
+    "der", "die", "das", "und", "ist", "nicht", "mit", "für", "von", "zu", "den", "auf",
+    "im", "dem", "des", "ein", "eine", "sich", "werden", "wird", "auch", "bei", "nach",
+}
+ENGLISH_STOPWORDS = {
+    "the", "and", "of", "to", "in", "is", "for", "that", "with", "on", "are", "be",
+    "as", "by", "this", "which", "will", "from", "an", "or", "it", "at", "have",
+}
+
+# Minimum characters needed before a decision is trusted
+MIN_LETTERS = 20
+# A script must make up at least this share of letters to get its language pack
+MIN_SCRIPT_SHARE = 0.15
+
+
+def detect_languages(text: str, default: str = DEFAULT_LANG) -> str:
+    """
+    Guess the minimal tesseract language set for a page from its text.
+
+    Script is decided by Unicode ranges (Devanagari vs. Latin); Latin text is
+    classified as German or English from umlauts and stopword counts. Returns
+    a tesseract ``lang`` string such as "eng", "deu" or "hin+eng", dominant
+    language first, or ``default`` when there is too little text to tell.
+    """
+    if not text:
+        return default
+    devanagari = len(DEVANAGARI_CHARS.findall(text))
+    latin = len(LATIN_CHARS.findall(text))
+    total = devanagari + latin
+    if total < MIN_LETTERS:
+        return default
+
+    langs = []
+    if latin / total >= MIN_SCRIPT_SHARE:
+        words = [w.lower() for w in WORDS.findall(text)]
+        german = sum(1 for w in words if w in GERMAN_STOPWORDS) + len(GERMAN_CHARS.findall(text))
+        english = sum(1 for w in words if w in ENGLISH_STOPWORDS)
+        langs.append("deu" if german > english else "eng")
+    if devanagari / total >= MIN_SCRIPT_SHARE:
+        langs.insert(0 if devanagari >= latin else len(langs), "hin")
+    return "+".join(langs) or default
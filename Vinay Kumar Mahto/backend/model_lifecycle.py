@@ -0,0 +1,229 @@
+import os
+import re
+import time
+import threading
+import logging
+from typing import Dict, Optional, Set
+
+from backend.ollama_client import OllamaClient, get_ollama_client, OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE
+from backend.context_packer import num_ctx_options
+from backend.scheduler import current_session_id, session_is_active
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+# Per-model keep_alive overrides, e.g. "gemma3:1b=2h,llama2=10m"
+MODEL_KEEP_ALIVE = os.environ.get("OLLAMA_MODEL_KEEP_ALIVE", "")
+# Models kept warm at once; beyond this, models no session uses are unloaded once idle
+MAX_WARM_MODELS = int(os.environ.get("OLLAMA_MAX_WARM_MODELS", 1))
+# A warm-up request may wait this long for a large model to load from disk
+WARMUP_TIMEOUT = 300
+
+DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_keep_alive(value) -> float:
+    """
+    Seconds for an Ollama keep_alive value ("30m", "1h30m", 600, "-1").
+    Negative values mean "keep loaded forever" and map to infinity.
+    """
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        value = str(value).strip()
+        try:
+            seconds = float(value)
+        except ValueError:
+            seconds = sum(float(n) * DURATION_UNITS[u] for n, u in DURATION.findall(value))
+    return float("inf") if seconds < 0 else seconds
+
+
+def parse_model_keep_alive(spec: str) -> Dict[str, str]:
+    """Parse "model=duration,model=duration" into a dict."""
+    overrides = {}
+    for item in spec.split(","):
+        model, sep, duration = item.strip().rpartition("=")
+        if sep and model:
+            overrides[model.strip()] = duration.strip()
+    return overrides
+
+
+class ModelLifecycle:
+    """
+    Keeps the selected Ollama model loaded so the first question does not pay
+    the model load time.
+
+    ``select`` records which models a browser session uses and preloads them
+    in the background (an empty /api/generate request). The manager is shared
+    by every session, so a model stays loaded while any active session has it
+    selected; beyond ``max_warm`` warm models, only models no active session
+    selected and idle past their keep_alive are unloaded to free RAM. Every
+    request should pass ``keep_alive_for(model)`` and call ``touch(model)`` so
+    the warm/cold bookkeeping matches the server.
+    """
+
+    def __init__(self, client: OllamaClient, keep_alive: str = OLLAMA_KEEP_ALIVE,
+                 overrides: Dict[str, str] = None, max_warm: int = MAX_WARM_MODELS):
+        self.client = client
+        self.keep_alive = keep_alive
+        self.overrides = parse_model_keep_alive(MODEL_KEEP_ALIVE) if overrides is None else overrides
+        self.max_warm = max(1, max_warm)
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict] = {}
+        self._loaded_events: Dict[str, threading.Event] = {}
+        # Browser session id -> models it has selected
+        self._selections: Dict[str, Set[str]] = {}
+
+    def keep_alive_for(self, model: str) -> str:
+        return self.overrides.get(model, self.keep_alive)
+
+    def _entry(self, model: str) -> Dict:
+        entry = self._models.get(model)
+        if entry is None:
+            entry = self._models[model] = {
+                "status": "cold", "load_ms": None, "last_used": 0.0, "error": None
+            }
+            self._loaded_events[model] = threading.Event()
+        return entry
+
+    def _expired(self, model: str, entry: Dict) -> bool:
+        idle = time.time() - entry["last_used"]
+        return idle > parse_keep_alive(self.keep_alive_for(model))
+
+    def status(self, model: str) -> Dict:
+        """Copy of the model's state: status is cold, loading, ready or failed."""
+        with self._lock:
+            entry = self._entry(model)
+            if entry["status"] == "ready" and self._expired(model, entry):
+                entry["status"] = "cold"
+                self._loaded_events[model].clear()
+            return dict(entry)
+
+    def touch(self, model: str):
+        """Record a completed request; Ollama restarts its keep_alive timer on every call."""
+        with self._lock:
+            entry = self._entry(model)
+            entry["last_used"] = time.time()
+            if entry["status"] != "loading":
+                entry["status"] = "ready"
+                self._loaded_events[model].set()
+
+    def warm(self, model: str):
+        """Start loading ``model`` in the background unless it is already warm or loading."""
+        if self.status(model)["status"] in ("ready", "loading"):
+            return
+        with self._lock:
+            entry = self._entry(model)
+            if entry["status"] == "loading":
+                return
+            entry["status"] = "loading"
+            entry["error"] = None
+            self._loaded_events[model].clear()
+        threading.Thread(target=self._load, args=(model,), name=f"ollama-warmup-{model}", daemon=True).start()
+
+    def _load(self, model: str):
+        start = time.perf_counter()
+        error, load_ms = None, None
+        try:
+            # An empty prompt makes Ollama load the model without generating anything
+            response = self.client.post(
+                "/api/generate",
+                json={"model": model, "prompt": "", "stream": False, "keep_alive": self.keep_alive_for(model),
+                      "options": num_ctx_options()},
+                timeout=WARMUP_TIMEOUT
+            )
+            if response.status_code == 200:
+                load_ns = response.json().get("load_duration")
+                load_ms = load_ns / 1e6 if load_ns else (time.perf_counter() - start) * 1000
+            else:
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            entry = self._entry(model)
+            if error:
+                entry.update(status="failed", error=error)
+                logger.warning(f"Warm-up of {model} failed: {error}")
+            else:
+                entry.update(status="ready", load_ms=load_ms, last_used=time.time())
+                logger.info(f"Model {model} warm in {load_ms:.0f} ms")
+            self._loaded_events[model].set()
+
+    def wait_ready(self, model: str, timeout: Optional[float] = None) -> bool:
+        """Block until a pending warm-up finishes; True if the model is loaded."""
+        with self._lock:
+            event = self._loaded_events.get(model)
+        if event is not None:
+            event.wait(timeout)
+        return self.status(model)["status"] == "ready"
+
+    def unload(self, model: str):
+        """Ask Ollama to drop ``model`` from memory now (keep_alive=0)."""
+        try:
+            self.client.post("/api/generate", json={"model": model, "keep_alive": 0}, timeout=30)
+            logger.info(f"Unloaded idle model {model}")
+        except Exception as e:
+            logger.warning(f"Could not unload {model}: {e}")
+        with self._lock:
+            entry = self._entry(model)
+            entry["status"] = "cold"
+            self._loaded_events[model].clear()
+
+    def select(self, *models: str, session_id: Optional[str] = None):
+        """
+        Mark ``models`` as the ones the calling session uses (replacing its
+        previous choice), preload them in the background and unload warm
+        models beyond ``max_warm`` that no active session uses and that have
+        been idle past their keep_alive, least recently used first.
+        """
+        session_id = session_id or current_session_id()
+        now = time.time()
+        with self._lock:
+            self._selections[session_id] = set(models)
+            for session in [s for s in self._selections if not session_is_active(s)]:
+                del self._selections[session]
+            for model in models:
+                self._entry(model)["last_used"] = now
+        for model in models:
+            self.warm(model)
+        with self._lock:
+            in_use = set().union(*self._selections.values())
+            warm = sorted(
+                ((entry["last_used"], name) for name, entry in self._models.items()
+                 if entry["status"] in ("ready", "loading")),
+                reverse=True
+            )
+            idle = [
+                name for last_used, name in warm[self.max_warm:]
+                if name not in in_use and self._models[name]["status"] == "ready"
+                and self._expired(name, self._models[name])
+            ]
+        for name in idle:
+            threading.Thread(target=self.unload, args=(name,), name=f"ollama-unload-{name}", daemon=True).start()
+
+    def selected(self) -> Dict[str, int]:
+        """Number of sessions that have each model selected."""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for models in self._selections.values():
+                for model in models:
+                    counts[model] = counts.get(model, 0) + 1
+            return counts
+
+
+_lifecycles: Dict[str, ModelLifecycle] = {}
+_lifecycles_lock = threading.Lock()
+
+
+def get_model_lifecycle(base_url: str = OLLAMA_BASE_URL) -> ModelLifecycle:
+    """Process-wide lifecycle manager for ``base_url``."""
+    key = base_url.rstrip("/")
+    with _lifecycles_lock:
+        lifecycle = _lifecycles.get(key)
+        if lifecycle is None:
+            lifecycle = _lifecycles[key] = ModelLifecycle(get_ollama_client(key))
+    return lifecycle
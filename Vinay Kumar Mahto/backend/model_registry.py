@@ -0,0 +1,114 @@
+import os
+import time
+import threading
+import logging
+from typing import Dict, List
+
+from backend.ollama_client import OllamaClient, get_ollama_client, OLLAMA_BASE_URL
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds a successful /api/tags result stays fresh
+MODEL_REGISTRY_TTL = float(os.environ.get("OLLAMA_MODELS_TTL", 30))
+# Re-probe sooner while Ollama is unreachable so recovery shows up quickly
+MODEL_REGISTRY_DOWN_TTL = float(os.environ.get("OLLAMA_MODELS_DOWN_TTL", 5))
+# How long the very first read may wait for the initial probe
+FIRST_PROBE_WAIT = 2.0
+
+
+def parse_models(data) -> List[str]:
+    """Model names from an /api/tags style payload."""
+    if isinstance(data, list):
+        return [str(m) for m in data if m]
+    if isinstance(data, dict):
+        if "models" in data:
+            names = []
+            for m in data["models"] or []:
+                name = (m.get("name") or m.get("model")) if isinstance(m, dict) else m
+                if name:
+                    names.append(str(name))
+            return names
+        return list(data.keys())
+    return []
+
+
+class ModelRegistry:
+    """
+    TTL cache of Ollama connection status and installed models.
+
+    Reads never block on the network: a stale entry is returned immediately
+    and a background thread refreshes it. Only the first read after startup
+    waits (up to FIRST_PROBE_WAIT seconds) for the initial probe.
+    """
+
+    def __init__(self, client: OllamaClient, ttl: float = MODEL_REGISTRY_TTL,
+                 down_ttl: float = MODEL_REGISTRY_DOWN_TTL):
+        self.client = client
+        self.ttl = ttl
+        self.down_ttl = down_ttl
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._refreshing = False
+        self._connected = False
+        self._models: List[str] = []
+        self._updated = 0.0
+        self._start_refresh()
+
+    def refresh(self):
+        """Probe /api/tags now (blocking) and update the cached status."""
+        connected, models = False, self._models
+        try:
+            response = self.client.get("/api/tags", timeout=5)
+            if response.status_code == 200:
+                connected, models = True, parse_models(response.json())
+        except Exception as e:
+            logger.debug(f"Ollama probe failed: {e}")
+        with self._lock:
+            self._connected = connected
+            self._models = models
+            self._updated = time.time()
+            self._refreshing = False
+        self._ready.set()
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="ollama-model-registry", daemon=True).start()
+
+    def _current(self):
+        if not self._ready.is_set():
+            self._ready.wait(FIRST_PROBE_WAIT)
+        with self._lock:
+            ttl = self.ttl if self._connected else self.down_ttl
+            stale = time.time() - self._updated > ttl
+        if stale:
+            self._start_refresh()
+
+    def is_connected(self) -> bool:
+        self._current()
+        return self._connected
+
+    def models(self) -> List[str]:
+        self._current()
+        return list(self._models)
+
+    def age(self) -> float:
+        """Seconds since the cached status was last refreshed."""
+        return time.time() - self._updated if self._updated else float("inf")
+
+
+_registries: Dict[str, ModelRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_model_registry(base_url: str = OLLAMA_BASE_URL) -> ModelRegistry:
+    """Process-wide registry for ``base_url``; the first call starts the background probe."""
+    key = base_url.rstrip("/")
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = ModelRegistry(get_ollama_client(key))
+    return registry
@@ -0,0 +1,257 @@
+import os
+import re
+import threading
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from backend.ollama_client import OLLAMA_BASE_URL
+from backend.ollama_stream import GenerationStats
+from backend.model_lifecycle import get_model_lifecycle, parse_model_keep_alive, parse_keep_alive, DURATION
+from backend.model_registry import get_model_registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+# Candidate models from small/fast to large/slow, e.g. "gemma3:1b,llama3.1:8b";
+# empty = the installed models whose names carry a size ("1b", "8b"), smallest first
+ROUTER_MODELS = os.environ.get("OLLAMA_ROUTER_MODELS", "")
+# Per-model latency SLOs for a whole answer, in seconds or as durations, e.g. "gemma3:1b=5,llama3.1:8b=40s"
+ROUTER_SLOS = os.environ.get("OLLAMA_ROUTER_SLOS", "")
+ROUTER_DEFAULT_SLO = float(os.environ.get("OLLAMA_ROUTER_DEFAULT_SLO", 30))
+# Difficulty (0..1) from which a question counts as synthesis rather than lookup
+ROUTER_HARD_THRESHOLD = float(os.environ.get("OLLAMA_ROUTER_HARD_THRESHOLD", 0.5))
+
+# Expected answer lengths in tokens, capped by the request's num_predict
+EASY_ANSWER_TOKENS = 150
+HARD_ANSWER_TOKENS = 600
+# Speed assumed before a model has been observed: tokens/s of a 1B model,
+# scaled down linearly with size; prompt eval runs about this many times faster
+PRIOR_TOKENS_PER_S_1B = 40.0
+PRIOR_PROMPT_SPEEDUP = 10.0
+# Seconds per billion parameters to load a cold model from disk
+PRIOR_LOAD_S_PER_B = 1.5
+# Weight of the newest observation in the running tokens/s averages
+EWMA_ALPHA = 0.3
+
+# Name fragments of embedding models, which cannot answer questions
+EMBEDDING_HINTS = ("embed", "minilm", "bge")
+
+MODEL_SIZE = re.compile(r"(\d+(?:\.\d+)?)([bm])\b", re.IGNORECASE)
+SYNTHESIS_CUES = re.compile(
+    r"\b(summari[sz]e|summary|compare|comparison|contrast|explain|why|analy[sz]e|analysis|evaluate|"
+    r"discuss|implications?|overall|relationship|differences?|pros and cons|advantages|critique|"
+    r"how does|how do|what if)\b", re.IGNORECASE)
+LOOKUP_CUES = re.compile(
+    r"^\s*(what is|what's|what are|who|when|where|which|how many|how much|define|name|list|"
+    r"find|is there|does|did|on which page)\b", re.IGNORECASE)
+LONG_ANSWER_CUES = re.compile(
+    r"\b(in detail|detailed|thorough|comprehensive|step by step|essay|elaborate|all the|every)\b", re.IGNORECASE)
+SHORT_ANSWER_CUES = re.compile(
+    r"\b(brief|briefly|short|one sentence|one word|yes or no|just the|only the|quick)\b", re.IGNORECASE)
+
+
+def parse_slos(spec: str) -> Dict[str, float]:
+    """Parse "model=seconds,model=duration" into seconds per model, skipping (and logging) bad entries."""
+    slos = {}
+    for model, value in parse_model_keep_alive(spec).items():
+        if not re.fullmatch(r"\d+(?:\.\d+)?|(?:" + DURATION.pattern + r")+", value):
+            logger.warning(f"Ignoring router SLO {model}={value!r}: expected seconds or a duration like 5s or 1m")
+            continue
+        seconds = parse_keep_alive(value)
+        if seconds <= 0:
+            logger.warning(f"Ignoring router SLO {model}={value!r}: must be positive")
+            continue
+        slos[model] = seconds
+    return slos
+
+
+def model_size(name: str) -> Optional[float]:
+    """Parameter count in billions from a tag like "llama3.1:8b" or "qwen2:500m"; None if absent."""
+    matches = MODEL_SIZE.findall(name.split("/")[-1])
+    if not matches:
+        return None
+    value, unit = matches[-1]
+    return float(value) / (1000 if unit.lower() == "m" else 1)
+
+
+def question_features(question: str, scores: Sequence[float] = None, num_predict: int = None) -> Dict[str, float]:
+    """
+    Cheap routing features:
+
+    * ``words``: question length
+    * ``synthesis`` / ``lookup``: phrasing cues (1.0 or 0.0)
+    * ``long_answer`` / ``short_answer``: requested output length cues, a small
+      num_predict counting as a short answer
+    * ``spread``: how flat the retrieval scores are, 0 when one chunk clearly
+      wins (a lookup) and towards 1 when evidence is spread over many chunks
+    """
+    top = sorted((s for s in scores or [] if s > 0), reverse=True)[:5]
+    spread = 0.0
+    if len(top) > 1:
+        spread = 1.0 - (top[0] / sum(top) - 1 / len(top)) / (1 - 1 / len(top))
+    return {
+        "words": float(len(question.split())),
+        "synthesis": 1.0 if SYNTHESIS_CUES.search(question) else 0.0,
+        "lookup": 1.0 if LOOKUP_CUES.search(question) else 0.0,
+        "long_answer": 1.0 if LONG_ANSWER_CUES.search(question) else 0.0,
+        "short_answer": 1.0 if SHORT_ANSWER_CUES.search(question) or (num_predict and num_predict <= 200) else 0.0,
+        "spread": spread,
+    }
+
+
+def difficulty(features: Dict[str, float]) -> float:
+    """Weighted sum of the features, clamped to 0..1; ROUTER_HARD_THRESHOLD splits easy from hard."""
+    score = (0.3 * min(1.0, features["words"] / 40)
+             + 0.35 * features["synthesis"]
+             - 0.15 * features["lookup"]
+             + 0.2 * features["long_answer"]
+             - 0.2 * features["short_answer"]
+             + 0.25 * features["spread"])
+    return max(0.0, min(1.0, score))
+
+
+class RouteDecision:
+    """The model a question was routed to and why."""
+
+    def __init__(self, model: str, hard: bool, difficulty: float, predicted_s: float,
+                 slo_s: float, reason: str, features: Dict[str, float]):
+        self.model = model
+        self.hard = hard
+        self.difficulty = difficulty
+        self.predicted_s = predicted_s
+        self.slo_s = slo_s
+        self.reason = reason
+        self.features = features
+
+    def as_dict(self) -> Dict:
+        return {
+            "model": self.model,
+            "hard": self.hard,
+            "difficulty": self.difficulty,
+            "predicted_s": self.predicted_s,
+            "slo_s": self.slo_s,
+            "reason": self.reason,
+        }
+
+
+class ModelRouter:
+    """
+    Sends each question to the smallest model that should answer it well
+    within its latency SLO.
+
+    Easy (lookup) questions go to the fastest candidate that meets its SLO;
+    hard (synthesis) questions to the largest one that does, and to the
+    largest candidate when none does, so quality is not traded away for
+    speed on the questions that need it. Predicted latency uses tokens/s
+    observed per model (``observe``), falling back to a size-based prior,
+    plus the load time when the model is not warm.
+    """
+
+    def __init__(self, models: List[str] = None, slos: Dict[str, float] = None,
+                 default_slo: float = ROUTER_DEFAULT_SLO, hard_threshold: float = ROUTER_HARD_THRESHOLD,
+                 base_url: str = OLLAMA_BASE_URL):
+        if models is None:
+            models = [m.strip() for m in ROUTER_MODELS.split(",") if m.strip()]
+        if slos is None:
+            slos = parse_slos(ROUTER_SLOS)
+        self.models = models
+        self.slos = slos
+        self.default_slo = default_slo
+        self.hard_threshold = hard_threshold
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._speeds: Dict[str, Dict[str, float]] = {}
+
+    def candidates(self, available: List[str] = None) -> List[str]:
+        """Routable models, small to large, limited to installed ones."""
+        if available is None:
+            available = get_model_registry(self.base_url).models()
+        if self.models:
+            return [m for m in self.models if m in available]
+        sized = [(model_size(m), m) for m in available if not any(h in m.lower() for h in EMBEDDING_HINTS)]
+        return [m for _, m in sorted((s, m) for s, m in sized if s is not None)]
+
+    def observe(self, model: str, stats: GenerationStats):
+        """Fold a finished generation's speeds into the model's running averages."""
+        with self._lock:
+            speed = self._speeds.setdefault(model, {"tokens_per_s": 0.0, "prompt_tokens_per_s": 0.0, "samples": 0})
+            updates = {"tokens_per_s": stats.tokens_per_s}
+            if stats.prompt_tokens and stats.prompt_eval_ms:
+                updates["prompt_tokens_per_s"] = stats.prompt_tokens / (stats.prompt_eval_ms / 1000)
+            for key, value in updates.items():
+                if value > 0:
+                    speed[key] = value if not speed[key] else (1 - EWMA_ALPHA) * speed[key] + EWMA_ALPHA * value
+            speed["samples"] += 1
+
+    def speeds(self, model: str) -> Dict[str, float]:
+        """Observed (or prior) generation and prompt-eval tokens/s of ``model``."""
+        size = model_size(model) or 7.0
+        prior = PRIOR_TOKENS_PER_S_1B / max(size, 0.5)
+        with self._lock:
+            observed = dict(self._speeds.get(model, {}))
+        tokens_per_s = observed.get("tokens_per_s") or prior
+        return {
+            "tokens_per_s": tokens_per_s,
+            "prompt_tokens_per_s": observed.get("prompt_tokens_per_s") or tokens_per_s * PRIOR_PROMPT_SPEEDUP,
+            "samples": observed.get("samples", 0),
+        }
+
+    def predict_latency(self, model: str, prompt_tokens: int, answer_tokens: int) -> float:
+        """Seconds for a whole answer: cold load (if any) + prompt eval + generation."""
+        speed = self.speeds(model)
+        seconds = prompt_tokens / speed["prompt_tokens_per_s"] + answer_tokens / speed["tokens_per_s"]
+        status = get_model_lifecycle(self.base_url).status(model)
+        if status["status"] != "ready":
+            load_ms = status["load_ms"]
+            seconds += load_ms / 1000 if load_ms else PRIOR_LOAD_S_PER_B * (model_size(model) or 7.0)
+        return seconds
+
+    def slo_for(self, model: str) -> float:
+        return self.slos.get(model, self.default_slo)
+
+    def route(self, question: str, scores: Sequence[float] = None, prompt_tokens: int = 0,
+              num_predict: int = None, available: List[str] = None) -> Optional[RouteDecision]:
+        """
+        Pick a model for ``question``. ``scores`` are the retrieval scores of
+        the candidate chunks and ``prompt_tokens`` the size of the prompt that
+        will be sent. Returns None when fewer than two candidates are installed
+        (callers keep their selected model then).
+        """
+        candidates = self.candidates(available)
+        if len(candidates) < 2:
+            return None
+        features = question_features(question, scores, num_predict)
+        level = difficulty(features)
+        hard = level >= self.hard_threshold
+        answer_tokens = HARD_ANSWER_TOKENS if hard else EASY_ANSWER_TOKENS
+        if num_predict and num_predict > 0:
+            answer_tokens = min(answer_tokens, num_predict)
+
+        predicted = {m: self.predict_latency(m, prompt_tokens, answer_tokens) for m in candidates}
+        within = [m for m in candidates if predicted[m] <= self.slo_for(m)]
+        if hard:
+            model = within[-1] if within else candidates[-1]
+            reason = "synthesis question" if within else "synthesis question; no model meets its SLO"
+        else:
+            model = within[0] if within else min(candidates, key=predicted.get)
+            reason = "lookup question" if within else "lookup question; no model meets its SLO, fastest"
+        decision = RouteDecision(model, hard, level, predicted[model], self.slo_for(model), reason, features)
+        logger.info(f"Routed to {model} ({reason}, difficulty {level:.2f}, ~{predicted[model]:.1f}s)")
+        return decision
+
+
+_routers: Dict[str, ModelRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_model_router(base_url: str = OLLAMA_BASE_URL) -> ModelRouter:
+    """Process-wide router for ``base_url``, so observed speeds are shared by every session."""
+    key = base_url.rstrip("/")
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            router = _routers[key] = ModelRouter(base_url=key)
+    return router
@@ -1,10 +1,16 @@
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 import cv2
+import fitz
 import numpy as np
 import os
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from backend.ocr_engine import get_ocr_engine, restrict_languages, OCR_WORKERS, OCR_DATA_KEYS
+from backend.page_layout import analyze_page, summarize_layouts
+from backend.lang_detect import detect_languages
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,28 +33,200 @@ for path in TESSERACT_PATHS:
 if not tesseract_found:
     logger.info("Using tesseract from PATH (default behavior)")
 
-def preprocess_image(image):
-    gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
+# Skip blank pages and crop to text regions before OCR ("0" disables the pre-pass)
+LAYOUT_PREPASS = os.environ.get("OCR_LAYOUT_PREPASS", "1") != "0"
+
+# Language packs loaded for the cheap detection pass when lang="auto"
+PROBE_LANGS = os.environ.get("OCR_PROBE_LANGS", "eng+deu+hin")
+# Scale and maximum height (pixels) of the detection pass crop
+PROBE_SCALE = 0.5
+PROBE_MAX_HEIGHT = 900
+
+# Page rendering backend: "pymupdf" (in-process pixmaps) or "pdf2image" (pdftoppm subprocess)
+RENDER_BACKEND = os.environ.get("OCR_RENDER_BACKEND", "pymupdf")
+
+def pixmap_to_array(pix):
+    """
+    View a PyMuPDF pixmap's samples as a uint8 array without copying.
+    The array borrows the pixmap's memory, so keep ``pix`` alive while using it.
+    """
+    samples = getattr(pix, "samples_mv", None) or pix.samples
+    arr = np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    return arr[:, :, 0] if pix.n == 1 else arr
+
+def binarize_image(image):
+    arr = image if isinstance(image, np.ndarray) else np.array(image)
+    gray = arr if arr.ndim == 2 else cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
     denoised = cv2.fastNlMeansDenoising(gray, h=10)
     _, thresh = cv2.threshold(denoised, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    return Image.fromarray(thresh)
+    return thresh
+
+def preprocess_image(image):
+    return Image.fromarray(binarize_image(image))
+
+def choose_page_language(binary, regions=None):
+    """
+    Pick the minimal tesseract language set for a page.
+
+    OCRs a downscaled strip of the first text region with PROBE_LANGS and
+    detects the script and language from that.
+    """
+    x, y, rw, rh = regions[0] if regions else (0, 0, binary.shape[1], binary.shape[0])
+    strip = binary[y:y + min(rh, int(PROBE_MAX_HEIGHT / PROBE_SCALE)), x:x + rw]
+    small = cv2.resize(strip, None, fx=PROBE_SCALE, fy=PROBE_SCALE, interpolation=cv2.INTER_AREA)
+    probe_text, _ = get_ocr_engine(restrict_languages(PROBE_LANGS)).recognize(small)
+    return restrict_languages(detect_languages(probe_text))
+
+def ocr_page_image(img, lang="eng", layout_prepass=None):
+    """
+    OCR a single rendered page with this thread's warm engine.
 
-def extract_text_from_scanned_pdf(pdf_path, dpi=300):
+    With the layout pre-pass, blank pages are skipped and only the detected
+    text regions are OCR'd; word boxes are shifted back to page coordinates.
+    With ``lang="auto"`` the language set is chosen per page (see
+    choose_page_language) and recorded in ``layout["lang"]``.
+    Returns (text, ocr_data, layout).
+    """
+    binary = binarize_image(img)
+    h, w = binary.shape[:2]
+    if not (LAYOUT_PREPASS if layout_prepass is None else layout_prepass):
+        layout = {"blank": False, "regions": [(0, 0, w, h)], "pixels_total": h * w, "pixels_ocr": h * w}
+    else:
+        layout = analyze_page(binary)
+    if layout["blank"]:
+        layout["lang"] = None
+        return "", {key: [] for key in OCR_DATA_KEYS}, layout
+
+    if lang == "auto":
+        lang = choose_page_language(binary, layout["regions"])
+    layout["lang"] = lang
+    engine = get_ocr_engine(lang)
+    texts = []
+    ocr_data = {key: [] for key in OCR_DATA_KEYS}
+    block_offset = 0
+    for x, y, rw, rh in layout["regions"]:
+        region_text, region_data = engine.recognize(binary[y:y + rh, x:x + rw])
+        texts.append(region_text)
+        blocks = region_data.get("block_num", [])
+        for key in OCR_DATA_KEYS:
+            values = region_data.get(key, [])
+            if key == "left":
+                values = [v + x for v in values]
+            elif key == "top":
+                values = [v + y for v in values]
+            elif key == "block_num":
+                values = [v + block_offset for v in values]
+            ocr_data[key].extend(values)
+        block_offset += max(blocks, default=0)
+    return "\n".join(texts), ocr_data, layout
+
+def _ocr_job(pix, ocr_input, lang):
+    # ``pix`` is only passed along to keep the pixmap memory alive until OCR is done
+    return ocr_page_image(ocr_input, lang=lang)
+
+def render_pdf_page(pdf_path, page_num, dpi=300, doc=None):
+    """Render one 1-based page of a PDF to an RGB PIL image."""
+    if doc is None:
+        return convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num)[0]
+    pix = doc.load_page(page_num - 1).get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+def _render_for_ocr(pdf_path, page_num, dpi, doc, keep_image):
+    """
+    Render a page for OCR. Returns (pix, ocr_input, image); ``pix`` must stay
+    referenced until OCR is done because ``ocr_input`` may view its memory.
+    """
+    if doc is None or keep_image:
+        img = render_pdf_page(pdf_path, page_num, dpi, doc)
+        return None, img, img
+    pix = doc.load_page(page_num - 1).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return pix, pixmap_to_array(pix), None
+
+def extract_text_from_scanned_pdf(pdf_path, dpi=300, checkpoint=None, progress_callback=None, keep_images=True,
+                                  render_backend=None, workers=OCR_WORKERS, stats=None, lang="eng"):
+    """
+    OCR a scanned PDF page by page.
+
+    Pages are rendered on the calling thread and OCR'd by a pool of ``workers``
+    threads, each holding its own warm OCR engine. Results, checkpoint writes
+    and progress callbacks are handled in page order on the calling thread.
+
+    :param checkpoint: Optional ExtractionCheckpoint; completed pages are loaded
+        from it instead of being OCR'd again, and new pages are saved to it.
+    :param progress_callback: Optional callable(pages_done, total_pages, stage)
+    :param keep_images: Return the rendered page images alongside the OCR data.
+        Pages restored from a checkpoint are only re-rendered when this is set.
+    :param render_backend: "pymupdf" or "pdf2image"; defaults to RENDER_BACKEND
+    :param workers: Number of OCR worker threads
+    :param stats: Optional dict, updated with the layout pre-pass summary
+        (blank pages skipped, pixels OCR'd vs. saved, languages per page) and
+        the start offset of every page in the returned text
+    :param lang: Tesseract language string, or "auto" to choose per page
+    """
+    doc = None
     try:
-        images = convert_from_path(pdf_path, dpi=dpi)
+        if (render_backend or RENDER_BACKEND) == "pymupdf":
+            doc = fitz.open(pdf_path)
+            total_pages = len(doc)
+        else:
+            total_pages = pdfinfo_from_path(pdf_path)["Pages"]
+        if checkpoint is not None:
+            checkpoint.set_total_pages(total_pages)
         ocr_text = ""
         ocr_data_pages = []
-        for img in images:
-            processed = preprocess_image(img)
-            text = pytesseract.image_to_string(processed, lang="eng")
-            ocr_data = pytesseract.image_to_data(processed, lang="eng", output_type=pytesseract.Output.DICT)
+        layouts = []
+        page_offsets = []
+        in_flight = deque()
+        max_in_flight = max(1, workers) * 2
+
+        def finish_oldest():
+            nonlocal ocr_text
+            page_num, future, cached, img = in_flight.popleft()
+            if cached is not None:
+                text, ocr_data, layout = cached["text"], cached.get("ocr_data", {}), cached.get("layout", {})
+            else:
+                text, ocr_data, layout = future.result()
+                if checkpoint is not None:
+                    checkpoint.save_page(page_num, text, ocr_data=ocr_data, layout=layout)
+            page_offsets.append(len(ocr_text))
             ocr_text += text + "\n"
             ocr_data_pages.append((img, ocr_data))
+            layouts.append(layout)
+            if progress_callback:
+                progress_callback(page_num, total_pages, "ocr")
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for page_num in range(1, total_pages + 1):
+                cached = checkpoint.load_page(page_num) if checkpoint is not None else None
+                if cached is not None:
+                    img = render_pdf_page(pdf_path, page_num, dpi, doc) if keep_images else None
+                    in_flight.append((page_num, None, cached, img))
+                else:
+                    pix, ocr_input, img = _render_for_ocr(pdf_path, page_num, dpi, doc, keep_images)
+                    future = pool.submit(_ocr_job, pix, ocr_input, lang)
+                    in_flight.append((page_num, future, None, img))
+                    del pix, ocr_input
+                while in_flight and (len(in_flight) >= max_in_flight or in_flight[0][1] is None
+                                     or in_flight[0][1].done()):
+                    finish_oldest()
+            while in_flight:
+                finish_oldest()
+        summary = summarize_layouts(layouts)
+        logger.info(
+            f"OCR pre-pass: {summary['blank_pages']}/{summary['pages']} blank pages skipped, "
+            f"{summary['saved_ratio']:.0%} of page pixels not sent to OCR"
+        )
+        if stats is not None:
+            stats.update(summary)
+            stats["page_languages"] = [layout.get("lang") for layout in layouts]
+            stats["page_offsets"] = page_offsets
         return True, ocr_text, ocr_data_pages
     except Exception as e:
         logger.error(f"OCR extraction failed: {e}")
         return False, "", []
-
+    finally:
+        if doc is not None:
+            doc.close()
 
 
 print(cv2.__version__)
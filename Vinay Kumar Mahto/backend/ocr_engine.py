@@ -0,0 +1,160 @@
+import os
+import threading
+import logging
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:  # optional: falls back to pytesseract
+    tesserocr = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# "auto" uses tesserocr when installed, "pytesseract" forces the subprocess engine
+OCR_ENGINE = os.environ.get("OCR_ENGINE", "auto")
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+if OCR_WORKERS > 1:
+    # Parallel pages already use the cores; stop each tesseract from spawning its own OpenMP team
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+OCR_DATA_KEYS = ["level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                 "left", "top", "width", "height", "conf", "text"]
+
+
+def text_from_ocr_data(ocr_data: Dict[str, List]) -> str:
+    """
+    Rebuild page text from an image_to_data dict: words joined per line,
+    blank line between paragraphs.
+    """
+    lines = []
+    current_key = None
+    current_par = None
+    words = []
+    for i, word in enumerate(ocr_data.get("text", [])):
+        if not word or not word.strip():
+            continue
+        par_key = (ocr_data["block_num"][i], ocr_data["par_num"][i])
+        line_key = par_key + (ocr_data["line_num"][i],)
+        if line_key != current_key:
+            if words:
+                lines.append(" ".join(words))
+            if current_par is not None and par_key != current_par:
+                lines.append("")
+            words = []
+            current_key, current_par = line_key, par_key
+        words.append(word)
+    if words:
+        lines.append(" ".join(words))
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+class PytesseractEngine:
+    """Runs the tesseract CLI per call; one image_to_data pass gives text and boxes."""
+    name = "pytesseract"
+
+    def __init__(self, lang: str = "eng"):
+        self.lang = lang
+
+    def recognize(self, image) -> Tuple[str, Dict[str, List]]:
+        ocr_data = pytesseract.image_to_data(image, lang=self.lang, output_type=pytesseract.Output.DICT)
+        return text_from_ocr_data(ocr_data), ocr_data
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """Keeps a tesseract API instance (and its loaded language model) warm in-process."""
+    name = "tesserocr"
+
+    def __init__(self, lang: str = "eng"):
+        self.lang = lang
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+
+    def recognize(self, image) -> Tuple[str, Dict[str, List]]:
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        self.api.SetImage(image)
+        self.api.Recognize()
+        text = self.api.GetUTF8Text()
+        return text, self._collect_words()
+
+    def _collect_words(self) -> Dict[str, List]:
+        """Word boxes in the same layout as pytesseract's image_to_data dict."""
+        RIL = tesserocr.RIL
+        ocr_data = {key: [] for key in OCR_DATA_KEYS}
+        block = par = line = word_num = 0
+        iterator = self.api.GetIterator()
+        for word in tesserocr.iterate_level(iterator, RIL.WORD):
+            if word.IsAtBeginningOf(RIL.BLOCK):
+                block, par, line = block + 1, 0, 0
+            if word.IsAtBeginningOf(RIL.PARA):
+                par, line = par + 1, 0
+            if word.IsAtBeginningOf(RIL.TEXTLINE):
+                line, word_num = line + 1, 0
+            word_num += 1
+            box = word.BoundingBox(RIL.WORD)
+            if box is None:
+                continue
+            x1, y1, x2, y2 = box
+            values = [5, 1, block, par, line, word_num, x1, y1, x2 - x1, y2 - y1,
+                      word.Confidence(RIL.WORD), word.GetUTF8Text(RIL.WORD) or ""]
+            for key, value in zip(OCR_DATA_KEYS, values):
+                ocr_data[key].append(value)
+        return ocr_data
+
+    def close(self):
+        self.api.End()
+
+
+@lru_cache(maxsize=1)
+def available_languages() -> frozenset:
+    """Language packs installed for tesseract (empty if it cannot be queried)."""
+    try:
+        if OCR_ENGINE != "pytesseract" and tesserocr is not None:
+            return frozenset(tesserocr.get_languages()[1])
+        return frozenset(pytesseract.get_languages(config=""))
+    except Exception as e:
+        logger.warning(f"Could not list tesseract languages: {e}")
+        return frozenset()
+
+
+def restrict_languages(lang: str, fallback: str = "eng") -> str:
+    """Drop language packs that are not installed from a "a+b" lang string."""
+    installed = available_languages()
+    if not installed:
+        return lang
+    kept = [code for code in lang.split("+") if code in installed]
+    return "+".join(kept) or fallback
+
+
+_local = threading.local()
+
+
+def get_ocr_engine(lang: str = "eng"):
+    """
+    Return this thread's OCR engine for ``lang``, creating it on first use.
+    Each pool worker thread therefore keeps its own warm tesseract instance.
+    """
+    engines = getattr(_local, "engines", None)
+    if engines is None:
+        engines = _local.engines = {}
+    engine = engines.get(lang)
+    if engine is None:
+        if OCR_ENGINE != "pytesseract" and tesserocr is not None:
+            try:
+                engine = TesserocrEngine(lang)
+            except Exception as e:
+                logger.warning(f"tesserocr unavailable for '{lang}', using pytesseract: {e}")
+        if engine is None:
+            engine = PytesseractEngine(lang)
+        logger.info(f"OCR engine for '{lang}': {engine.name}")
+        engines[lang] = engine
+    return engine
@@ -1,15 +1,22 @@
 from datetime import datetime
 import requests
-import json
 import time
 from collections import deque
-from typing import List, Generator
+from typing import Callable, List, Generator, Optional
 import streamlit as st
+from backend.ollama_client import OllamaClient, get_ollama_client, OLLAMA_BASE_URL
+from backend.ollama_stream import GenerationStats, OllamaStream, OllamaStreamError, parse_response
+from backend.resilience import CircuitOpenError, RETRY_ATTEMPTS
+from backend.model_registry import get_model_registry, parse_models
+from backend.model_lifecycle import get_model_lifecycle, WARMUP_TIMEOUT
+from backend.model_router import get_model_router
+from backend.context_packer import context_budget, estimate_tokens, fit_to_budget, num_ctx_options
+from backend.scheduler import get_scheduler, GenerationCancelled, PRIORITY_INTERACTIVE
+from backend.response_cache import get_response_cache, make_cache_key, should_cache, replay_stream
 
 # -------------------------------
 # Config
 # -------------------------------
-OLLAMA_BASE_URL = "http://localhost:11434"
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 MAX_CONTEXT_LENGTH = 4000
 RATE_LIMIT_REQUESTS = 15
@@ -65,52 +72,58 @@ class RateLimiter:
 # Ollama PDF Chatbot
 # -------------------------------
 class OllamaPDFChatbot:
-    def __init__(self, base_url: str = OLLAMA_BASE_URL):
-        self.base_url = base_url
-        self.session = requests.Session()
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, client: OllamaClient = None):
+        # Share the process-wide pooled client so reruns and users reuse connections
+        self.client = client or get_ollama_client(base_url)
+        self.base_url = self.client.base_url
+        self.session = self.client.session
+        self.registry = get_model_registry(self.base_url)
+        self.lifecycle = get_model_lifecycle(self.base_url)
+        self.router = get_model_router(self.base_url)
 
-    # Health check
-    def check_connection(self) -> bool:
-        try:
-            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
-            return response.status_code == 200
-        except Exception:
-            return False
+    # Health check (cached; refreshed in the background)
+    def check_connection(self, force: bool = False) -> bool:
+        if force:
+            self.registry.refresh()
+        return self.registry.is_connected()
 
-    # Get available models
+    # Get available models (cached; refreshed in the background)
     def get_available_models(self) -> List[str]:
-        endpoints = ["/api/tags", "/api/models", "/api/list"]
-        for ep in endpoints:
-            try:
-                response = self.session.get(f"{self.base_url}{ep}", timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    return self._parse_models(data)
-            except Exception:
-                continue
-        return []
+        return self.registry.models()
 
     def _parse_models(self, data) -> List[str]:
-        if isinstance(data, list):
-            return [str(m) for m in data if m]
-        if isinstance(data, dict):
-            if "models" in data:
-                models = data["models"]
-                return [m.get("name") or m.get("model") for m in models if isinstance(m, dict)]
-            return list(data.keys())
-        return []
+        return parse_models(data)
+
+    # Preload the selected model in the background (no-op if already warm); with
+    # routing on, every router candidate stays selected so none is unloaded between questions
+    def prepare_model(self, model: str, routed: bool = False) -> dict:
+        available = self.get_available_models()
+        if model in available:
+            models = [model]
+            if routed:
+                models += [m for m in self.router.candidates(available) if m != model]
+            self.lifecycle.select(*models)
+        return self.lifecycle.status(model)
+
+    def _await_warmup(self, model: str):
+        # A load in progress would otherwise eat into the request timeout and trigger retries
+        if self.lifecycle.status(model)["status"] == "loading":
+            self.lifecycle.wait_ready(model, WARMUP_TIMEOUT)
 
     # -------------------------------
-    # Streaming response with retry
+    # Streaming response (connection retries live in the client)
     # -------------------------------
     def stream_response(
         self,
         prompt: str,
         context: str = "",
         system_prompt: str = "",
-        retries: int = 3,
-        wait: int = 10
+        retries: int = RETRY_ATTEMPTS,
+        priority: int = PRIORITY_INTERACTIVE,
+        queue_callback: Optional[Callable[[int, float], None]] = None,
+        model: Optional[str] = None
     ) -> Generator[str, None, None]:
+        st.session_state.last_generation_metrics = None
         if not prompt.strip():
             yield "❌ Please enter a valid question."
             return
@@ -119,124 +132,343 @@ class OllamaPDFChatbot:
             yield "❌ Question too long. Keep under 5000 chars."
             return
 
-        if not st.session_state.rate_limiter.allow_request():
-            wait_time = st.session_state.rate_limiter.get_wait_time()
-            yield f"⏳ Rate limit exceeded. Wait {wait_time:.1f}s."
-            return
-
+        model = model or st.session_state.selected_model
         payload = {
-            "model": st.session_state.selected_model,
+            "model": model,
             "prompt": self._build_prompt(prompt, context, system_prompt),
             "stream": True,
+            "keep_alive": self.lifecycle.keep_alive_for(model),
             "options": {
                 "temperature": st.session_state.temperature,
                 "top_p": st.session_state.top_p,
                 "top_k": st.session_state.top_k,
                 "num_predict": st.session_state.max_tokens,
+                **num_ctx_options(),
             }
         }
         if system_prompt:
             payload["system"] = system_prompt
 
-        for attempt in range(retries):
-            try:
-                with self.session.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload,
-                    stream=True,
-                    timeout=180
-                ) as response:
-                    if response.status_code != 200:
-                        yield f"❌ Error {response.status_code}: {response.text[:500]}"
-                        return
+        cache_key = self._response_cache_key(payload)
+        cached = get_response_cache().get(cache_key) if cache_key else None
+        if cached is not None:
+            yield from replay_stream(cached)
+            return
 
-                    full_response = ""
-                    for raw_line in response.iter_lines(decode_unicode=True):
-                        if not raw_line:
-                            continue
-                        try:
-                            json_line = json.loads(raw_line.strip())
-                            if "response" in json_line:
-                                token = json_line["response"]
-                                full_response += token
-                                yield token
-                            if "error" in json_line:
-                                yield f"\n❌ Error: {json_line['error']}"
-                                break
-                        except Exception:
-                            continue
-                    return  # ✅ Success, exit after one attempt
-            except requests.exceptions.Timeout:
-                if attempt < retries - 1:
-                    yield f"⏳ Timeout, retrying in {wait}s... (attempt {attempt+1}/{retries})"
-                    time.sleep(wait)
-                else:
-                    yield "⏳ Request timeout. The model may be loading or unavailable."
-            except requests.exceptions.ConnectionError:
-                yield "❌ Could not connect to Ollama. Run `ollama serve`."
-                return
-            except Exception as e:
-                yield f"❌ Unexpected error: {str(e)}"
+        if not st.session_state.rate_limiter.allow_request():
+            wait_time = st.session_state.rate_limiter.get_wait_time()
+            yield f"⏳ Rate limit exceeded. Wait {wait_time:.1f}s."
+            return
+
+        self._await_warmup(payload["model"])
+        handle = self.client.generation()
+        try:
+            with handle, self._slot(priority, queue_callback, handle), self.client.post(
+                "/api/generate",
+                retries=retries,
+                handle=handle,
+                json=payload,
+                stream=True,
+                timeout=180
+            ) as response:
+                if response.status_code != 200:
+                    yield f"❌ Error {response.status_code}: {response.text[:500]}"
+                    return
+
+                stream = OllamaStream(response, handle)
+                yield from stream
+                if stream.done:
+                    self._record_generation(model, stream.stats)
+                    if cache_key:
+                        get_response_cache().put(cache_key, stream.text, payload["model"])
                 return
+        except GenerationCancelled:
+            yield "\n\n⏹️ Generation stopped."
+            return
+        except OllamaStreamError as e:
+            yield f"\n❌ Error: {e}"
+        except requests.exceptions.Timeout:
+            yield "⏳ Request timeout. The model may be loading or unavailable."
+        except CircuitOpenError as e:
+            yield f"❌ {e}"
+        except requests.exceptions.ConnectionError:
+            yield "❌ Could not connect to Ollama. Run `ollama serve`."
+        except Exception as e:
+            yield f"❌ Unexpected error: {str(e)}"
+            return
 
     # -------------------------------
-    # Non-streaming response with retry
+    # Non-streaming response (connection retries live in the client)
     # -------------------------------
     def get_response(
         self,
         prompt: str,
         context: str = "",
         system_prompt: str = "",
-        retries: int = 3,
-        wait: int = 10
+        retries: int = RETRY_ATTEMPTS,
+        priority: int = PRIORITY_INTERACTIVE,
+        queue_callback: Optional[Callable[[int, float], None]] = None,
+        model: Optional[str] = None
     ) -> str:
+        st.session_state.last_generation_metrics = None
         if not prompt.strip():
             return "❌ Please enter a valid question."
 
         if len(prompt) > 5000:
             return "❌ Question too long. Keep under 5000 chars."
 
+        model = model or st.session_state.selected_model
+        payload = {
+            "model": model,
+            "prompt": self._build_prompt(prompt, context, system_prompt),
+            "stream": False,
+            "keep_alive": self.lifecycle.keep_alive_for(model),
+            "options": {
+                "temperature": st.session_state.temperature,
+                "top_p": st.session_state.top_p,
+                "top_k": st.session_state.top_k,
+                "num_predict": st.session_state.max_tokens,
+                **num_ctx_options(),
+            }
+        }
+
+        cache_key = self._response_cache_key(payload)
+        cached = get_response_cache().get(cache_key) if cache_key else None
+        if cached is not None:
+            return cached
+
         if not st.session_state.rate_limiter.allow_request():
             wait_time = st.session_state.rate_limiter.get_wait_time()
             return f"⏳ Rate limit exceeded. Wait {wait_time:.1f}s."
 
+        self._await_warmup(payload["model"])
+        try:
+            with self.client.generation(streaming=False) as handle, self._slot(priority, queue_callback, handle):
+                response = self.client.post(
+                    "/api/generate",
+                    retries=retries,
+                    handle=handle,
+                    json=payload,
+                    timeout=120
+                )
+            if response.status_code == 200:
+                text, stats = parse_response(response.json())
+                if stats is not None:
+                    self._record_generation(model, stats)
+                    if cache_key:
+                        get_response_cache().put(cache_key, text, payload["model"])
+                return text or "No response generated."
+            else:
+                return f"❌ Error {response.status_code}: Could not get response from Ollama."
+        except GenerationCancelled:
+            return "⏹️ Generation stopped."
+        except OllamaStreamError as e:
+            return f"❌ Error: {e}"
+        except requests.exceptions.Timeout:
+            return "⏳ Request timeout. The model may be loading or unavailable."
+        except CircuitOpenError as e:
+            return f"❌ {e}"
+        except requests.exceptions.ConnectionError:
+            return "❌ Could not connect to Ollama. Please make sure `ollama serve` is running."
+        except Exception as e:
+            return f"❌ Unexpected error: {str(e)}"
+
+    # -------------------------------
+    # Conversation mode (/api/chat with a stable prefix)
+    # -------------------------------
+    def build_conversation_messages(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: str = "",
+        history: List[dict] = None,
+        extra_context: str = ""
+    ) -> List[dict]:
+        """
+        Order the conversation so everything that does not change between turns
+        comes first: instructions and the pinned document context in the system
+        message, then earlier turns exactly as they were sent. Only the new user
+        message differs, so Ollama can reuse the KV cache for the whole prefix.
+        """
+        base_system = (
+            "You are a helpful AI assistant that answers based on document content. "
+            "Be precise, factual, and cite page numbers if available."
+        )
+        system_parts = [f"INSTRUCTIONS:\n{base_system}"]
+        if system_prompt:
+            system_parts.append(f"SYSTEM PROMPT:\n{system_prompt}")
+        budget = self._context_budget()
+        if context:
+            context = fit_to_budget(context, budget)
+            system_parts.append(f"DOCUMENT CONTEXT:\n{context}")
+        user_parts = []
+        # Extra context only gets the budget the pinned context and earlier turns leave
+        room = budget - estimate_tokens(context) - sum(estimate_tokens(m.get("content") or "") for m in history or [])
+        if extra_context and room > 0:
+            user_parts.append(f"ADDITIONAL CONTEXT:\n{fit_to_budget(extra_context, room)}")
+        user_parts.append(f"QUESTION:\n{prompt}")
+        messages = [{"role": "system", "content": "\n\n".join(system_parts)}]
+        messages.extend(history or [])
+        messages.append({"role": "user", "content": "\n\n".join(user_parts)})
+        return messages
+
+    def stream_chat(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: str = "",
+        history: List[dict] = None,
+        extra_context: str = "",
+        priority: int = PRIORITY_INTERACTIVE,
+        queue_callback: Optional[Callable[[int, float], None]] = None,
+        model: Optional[str] = None
+    ) -> Generator[str, None, None]:
+        """
+        Conversation-mode streaming via /api/chat with ``keep_alive``.
+
+        ``context`` should stay the same for the whole conversation; per-question
+        retrieval goes in ``extra_context``. On success the sent user message and
+        the reply are appended to ``history`` so the next turn shares the prefix.
+        Prompt-eval stats land in st.session_state.last_generation_metrics.
+        """
+        st.session_state.last_generation_metrics = None
+        if not prompt.strip():
+            yield "❌ Please enter a valid question."
+            return
+
+        if len(prompt) > 5000:
+            yield "❌ Question too long. Keep under 5000 chars."
+            return
+
+        messages = self.build_conversation_messages(prompt, context, system_prompt, history, extra_context)
+        model = model or st.session_state.selected_model
         payload = {
-            "model": st.session_state.selected_model,
-            "prompt": self._build_prompt(prompt, context, system_prompt),
-            "stream": False,
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "keep_alive": self.lifecycle.keep_alive_for(model),
             "options": {
                 "temperature": st.session_state.temperature,
                 "top_p": st.session_state.top_p,
                 "top_k": st.session_state.top_k,
                 "num_predict": st.session_state.max_tokens,
+                **num_ctx_options(),
             }
         }
 
-        for attempt in range(retries):
+        cache_key = None
+        if should_cache(payload["options"]["temperature"], st.session_state.get("cache_responses", False)):
+            cache_key = make_cache_key(endpoint="chat", model=payload["model"],
+                                       options=payload["options"], messages=messages)
+        full_response = get_response_cache().get(cache_key) if cache_key else None
+        if full_response is not None:
+            yield from replay_stream(full_response)
+        else:
+            if not st.session_state.rate_limiter.allow_request():
+                wait_time = st.session_state.rate_limiter.get_wait_time()
+                yield f"⏳ Rate limit exceeded. Wait {wait_time:.1f}s."
+                return
+            self._await_warmup(payload["model"])
+            full_response = ""
+            completed = False
+            handle = self.client.generation()
             try:
-                response = self.session.post(
-                    f"{self.base_url}/api/generate",
+                with handle, self._slot(priority, queue_callback, handle), self.client.post(
+                    "/api/chat",
+                    handle=handle,
                     json=payload,
-                    timeout=120
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("response", "No response generated.")
-                else:
-                    return f"❌ Error {response.status_code}: Could not get response from Ollama."
+                    stream=True,
+                    timeout=180
+                ) as response:
+                    if response.status_code != 200:
+                        yield f"❌ Error {response.status_code}: {response.text[:500]}"
+                        return
+                    stream = OllamaStream(response, handle)
+                    yield from stream
+                    full_response = stream.text
+                    if stream.done:
+                        completed = True
+                        self._record_generation(model, stream.stats)
+            except GenerationCancelled:
+                yield "\n\n⏹️ Generation stopped."
+                return
+            except OllamaStreamError as e:
+                yield f"\n❌ Error: {e}"
+                return
             except requests.exceptions.Timeout:
-                if attempt < retries - 1:
-                    time.sleep(wait)
-                    continue
-                return "⏳ Request timeout. The model may be loading or unavailable."
+                yield "⏳ Request timeout. The model may be loading or unavailable."
+                return
+            except CircuitOpenError as e:
+                yield f"❌ {e}"
+                return
             except requests.exceptions.ConnectionError:
-                return "❌ Could not connect to Ollama. Please make sure `ollama serve` is running."
+                yield "❌ Could not connect to Ollama. Run `ollama serve`."
+                return
             except Exception as e:
-                return f"❌ Unexpected error: {str(e)}"
+                yield f"❌ Unexpected error: {str(e)}"
+                return
+            if not completed:
+                return
+            if cache_key:
+                get_response_cache().put(cache_key, full_response, payload["model"])
+
+        if history is not None:
+            history.append(messages[-1])
+            history.append({"role": "assistant", "content": full_response})
+
+    def get_chat_response(self, *args, **kwargs) -> str:
+        """Non-streaming wrapper around stream_chat (same arguments)."""
+        return "".join(self.stream_chat(*args, **kwargs))
+
+    def _record_generation(self, model: str, stats: GenerationStats):
+        """Bookkeeping after a finished generation: warm state, router speeds, UI metrics."""
+        self.lifecycle.touch(model)
+        self.router.observe(model, stats)
+        st.session_state.last_generation_metrics = stats.as_dict()
+
+    # -------------------------------
+    # Global scheduling
+    # -------------------------------
+    def _slot(self, priority: int, queue_callback=None, handle=None):
+        """
+        Wait for a process-wide Ollama slot. ``queue_callback(position, eta_s)``
+        is called while queued so the UI can show where the request stands;
+        cancelling ``handle`` takes the request out of the queue.
+        """
+        return get_scheduler().slot(
+            session_id=handle.session_id if handle else None,
+            priority=priority,
+            on_wait=queue_callback,
+            cancelled=handle.cancelled if handle else None
+        )
+
+    def cancel_generation(self) -> int:
+        """Stop this browser session's in-flight generations; returns how many were cancelled."""
+        return self.client.cancel_session()
+
+    # -------------------------------
+    # Response cache
+    # -------------------------------
+    def _response_cache_key(self, payload: dict):
+        """Cache key when the request is deterministic or the user opted in, else None."""
+        opt_in = st.session_state.get("cache_responses", False)
+        if not should_cache(payload["options"].get("temperature"), opt_in):
+            return None
+        return make_cache_key(
+            endpoint="generate",
+            model=payload["model"],
+            options=payload["options"],
+            prompt=payload["prompt"],
+            system=payload.get("system", "")
+        )
 
     # -------------------------------
     # Prompt builder
     # -------------------------------
+    def _context_budget(self) -> int:
+        """Context tokens that fit num_ctx next to the answer; callers should pack to this."""
+        return context_budget(st.session_state.max_tokens)
+
     def _build_prompt(self, prompt: str, context: str, system_prompt: str) -> str:
         base_system = (
             "You are a helpful AI assistant that answers based on document content. "
@@ -244,9 +476,15 @@ class OllamaPDFChatbot:
         )
         parts = []
         if context:
-            parts.append(f"DOCUMENT CONTEXT:\n{context[:10000]}")
+            parts.append(f"DOCUMENT CONTEXT:\n{fit_to_budget(context, self._context_budget())}")
         if system_prompt:
             parts.append(f"SYSTEM PROMPT:\n{system_prompt}")
         parts.append(f"QUESTION:\n{prompt}")
         parts.append(f"INSTRUCTIONS:\n{base_system}")
         return "\n\n".join(parts)
+
+
+@st.cache_resource
+def get_pdf_chatbot(base_url: str = OLLAMA_BASE_URL) -> OllamaPDFChatbot:
+    """Process-wide chatbot; per-user settings are read from st.session_state at call time."""
+    return OllamaPDFChatbot(base_url)
@@ -0,0 +1,467 @@
+import os
+import time
+import socket
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import chain
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+
+from backend.scheduler import get_scheduler, current_session_id, session_is_active, GenerationCancelled, PRIORITY_BATCH
+from backend.resilience import CircuitBreaker, CircuitOpenError, backoff_delays, RETRY_ATTEMPTS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+if "://" not in OLLAMA_BASE_URL:
+    OLLAMA_BASE_URL = f"http://{OLLAMA_BASE_URL}"
+# Optional second Ollama server used for failover and hedged requests
+OLLAMA_SECONDARY_URL = os.environ.get("OLLAMA_SECONDARY_HOST", "")
+if OLLAMA_SECONDARY_URL and "://" not in OLLAMA_SECONDARY_URL:
+    OLLAMA_SECONDARY_URL = f"http://{OLLAMA_SECONDARY_URL}"
+# Seconds without a response before the same request is also sent to the secondary (0 = off)
+HEDGE_AFTER = float(os.environ.get("OLLAMA_HEDGE_AFTER", 0))
+# Keep-alive connections kept per Ollama server, shared by every session in the process
+POOL_MAXSIZE = int(os.environ.get("OLLAMA_POOL_MAXSIZE", 16))
+# Seconds a request waits for a free pooled connection before failing
+POOL_TIMEOUT = float(os.environ.get("OLLAMA_POOL_TIMEOUT", 30))
+# How long Ollama keeps a model (and its cached prompt prefix) loaded after a request
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# A stream whose reader has not pulled a token for this long is treated as abandoned
+ABANDON_TIMEOUT = float(os.environ.get("OLLAMA_ABANDON_TIMEOUT", 60))
+REAPER_INTERVAL = 5
+
+# The GenerationHandle passed to the post() this thread is sending right now; set
+# only for the duration of one synchronous send, never across a yield
+_sending = threading.local()
+
+
+def _shutdown(conn):
+    # Shut the socket down: close() alone does not wake a thread blocked reading it
+    sock = getattr(conn, "sock", None)
+    try:
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class _BoundConnection:
+    """
+    Connection mixin that binds itself to the GenerationHandle of the request
+    being sent before sending it, so cancelling also aborts a request that is
+    still waiting for its response headers (Ollama sends them with the first
+    token).
+    """
+
+    generation: Optional["GenerationHandle"] = None
+
+    def request(self, *args, **kwargs):
+        handle = self.generation = getattr(_sending, "handle", None)
+        if handle is not None:
+            handle._bind(self)
+        super().request(*args, **kwargs)
+        if handle is not None and handle.is_cancelled:
+            _shutdown(self)
+
+
+class _BoundHTTPConnection(_BoundConnection, HTTPConnection):
+    pass
+
+
+class _BoundHTTPSConnection(_BoundConnection, HTTPSConnection):
+    pass
+
+
+class PoolTimeoutError(requests.exceptions.ConnectionError):
+    """Every pooled connection stayed busy for POOL_TIMEOUT seconds; the server itself may be fine."""
+
+
+class _BoundPool:
+    def _get_conn(self, timeout=None):
+        # requests never passes a pool timeout, and a full blocking pool would wait forever
+        return super()._get_conn(timeout=POOL_TIMEOUT if timeout is None else timeout)
+
+
+class _BoundHTTPConnectionPool(_BoundPool, HTTPConnectionPool):
+    ConnectionCls = _BoundHTTPConnection
+
+
+class _BoundHTTPSConnectionPool(_BoundPool, HTTPSConnectionPool):
+    ConnectionCls = _BoundHTTPSConnection
+
+
+def _pool_timeout(e: EmptyPoolError) -> PoolTimeoutError:
+    return PoolTimeoutError(f"No free connection to Ollama after {POOL_TIMEOUT:.0f}s ({e})")
+
+
+class _GenerationAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _BoundHTTPConnectionPool,
+                                                   "https": _BoundHTTPSConnectionPool}
+
+
+class GenerationHandle:
+    """
+    One in-flight generation that can be cancelled from any thread.
+
+    Requests sent with ``client.post(..., handle=handle)`` are bound to it
+    as they are sent. Cancelling shuts their connections down, whether
+    the model is still evaluating the prompt or already generating; Ollama
+    stops when the client disconnects, which frees its slot. Streaming
+    readers call ``touch()`` after each token so stalled streams can be
+    detected.
+    """
+
+    def __init__(self, client: "OllamaClient", session_id: Optional[str] = None, streaming: bool = True):
+        self.id = uuid.uuid4().hex
+        self.client = client
+        self.session_id = session_id or current_session_id()
+        self.streaming = streaming
+        self.started = time.time()
+        self.last_touch: Optional[float] = None
+        self.cancelled = threading.Event()
+        self.reason = ""
+        self._response: Optional[requests.Response] = None
+        self._connections: List[_BoundConnection] = []
+
+    def _bind(self, conn: _BoundConnection):
+        if self.cancelled.is_set():
+            raise GenerationCancelled(self.reason)
+        self._connections.append(conn)
+
+    def attach(self, response: requests.Response):
+        self._response = response
+        if self.cancelled.is_set():
+            response.close()
+
+    def touch(self):
+        self.last_touch = time.time()
+
+    def iter_chunks(self, response: requests.Response) -> Iterator[bytes]:
+        """
+        Attach ``response`` and yield raw body chunks as they arrive, touching
+        the handle on every chunk the reader pulls. Raises GenerationCancelled
+        if the stream ends because the handle was cancelled.
+        """
+        self.attach(response)
+        try:
+            for chunk in response.iter_content(chunk_size=None):
+                self.touch()
+                yield chunk
+        except Exception:
+            if self.is_cancelled:
+                raise GenerationCancelled(self.reason)
+            raise
+        if self.is_cancelled:
+            raise GenerationCancelled(self.reason)
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancelled.is_set()
+
+    def stalled(self, timeout: float = ABANDON_TIMEOUT) -> bool:
+        """True when a stream has started but nobody has read from it for ``timeout`` seconds."""
+        return self.streaming and self.last_touch is not None and time.time() - self.last_touch > timeout
+
+    def cancel(self, reason: str = "cancelled"):
+        if self.cancelled.is_set():
+            return
+        self.reason = reason
+        self.cancelled.set()
+        for conn in list(self._connections):
+            # Skip pooled connections that have moved on to another request
+            if conn.generation is self:
+                _shutdown(conn)
+        if self._response is not None:
+            try:
+                self._response.close()
+            except Exception:
+                pass
+        logger.info(f"Generation {self.id[:8]} for session {self.session_id} {reason}")
+
+    def __enter__(self):
+        self.client._register(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.client._unregister(self)
+        return False
+
+
+class GenerationGroup:
+    """
+    Related blocking requests (one batch job) that share a session, a
+    scheduler priority and a single cancel switch. ``generate`` is safe to
+    call from worker threads. Each request runs under its own
+    GenerationHandle, so cancelling aborts the ones Ollama is already
+    working on as well as the queued ones.
+    """
+
+    def __init__(self, client: "OllamaClient", session_id: Optional[str] = None, priority: int = PRIORITY_BATCH):
+        self.client = client
+        self.session_id = session_id or current_session_id()
+        self.priority = priority
+        self.cancelled = threading.Event()
+        self._handles: List[GenerationHandle] = []
+        self._lock = threading.Lock()
+
+    def generate(self, payload: dict, path: str = "/api/generate", timeout: float = 600) -> dict:
+        """Run one non-streaming request through the scheduler and return the JSON reply."""
+        if self.cancelled.is_set():
+            raise GenerationCancelled("batch cancelled")
+        with self.client.generation(session_id=self.session_id, streaming=False) as handle:
+            with self._lock:
+                self._handles.append(handle)
+            try:
+                with get_scheduler().slot(session_id=self.session_id, priority=self.priority,
+                                          cancelled=self.cancelled):
+                    if self.cancelled.is_set():
+                        # Cancelled while queued, before the handle was listed
+                        raise GenerationCancelled("batch cancelled")
+                    response = self.client.post(path, handle=handle, json=payload, timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                # The body read fails the same way when cancel() shuts the socket mid-reply
+                if handle.is_cancelled:
+                    raise GenerationCancelled(handle.reason) from e
+                raise
+            finally:
+                with self._lock:
+                    self._handles.remove(handle)
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            raise RuntimeError(data["error"])
+        return data
+
+    def cancel(self, reason: str = "batch cancelled"):
+        """Drop queued requests and cancel the ones in flight."""
+        self.cancelled.set()
+        with self._lock:
+            handles = list(self._handles)
+        for handle in handles:
+            handle.cancel(reason)
+
+
+class OllamaClient:
+    """
+    HTTP client for one Ollama server backed by a pooled, keep-alive
+    ``requests.Session``. Safe to share across Streamlit sessions and threads.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, pool_maxsize: int = POOL_MAXSIZE,
+                 secondary: "OllamaClient" = None, hedge_after: float = HEDGE_AFTER):
+        self.base_url = base_url.rstrip("/")
+        self.secondary = secondary
+        self.hedge_after = hedge_after
+        self.breaker = CircuitBreaker(self.base_url, probe=self._probe)
+        self.session = requests.Session()
+        # pool_block: wait for a free keep-alive connection instead of opening throwaway ones
+        adapter = _GenerationAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+        self._generations: Dict[str, GenerationHandle] = {}
+        self._generations_lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        try:
+            return self.session.get(self.url(path), **kwargs)
+        except EmptyPoolError as e:
+            raise _pool_timeout(e) from e
+
+    def post(self, path: str, retries: int = RETRY_ATTEMPTS, handle: Optional[GenerationHandle] = None,
+             **kwargs) -> requests.Response:
+        """
+        POST with failure handling: connection failures are retried after a
+        jittered exponential backoff, an open circuit fails fast (or fails over
+        to the secondary server), and with ``hedge_after`` set a slow request
+        is duplicated to the secondary and the first response wins.
+
+        Read timeouts are not retried: they usually mean the model is busy,
+        and repeating the request would only queue more work behind it. Nor
+        is PoolTimeoutError, which already waited POOL_TIMEOUT for a connection.
+        With ``handle`` the connection is bound to it before the request is
+        sent, so ``handle.cancel()`` aborts it at any point.
+        """
+        last_error = None
+        for delay in chain([0.0], backoff_delays(max(0, retries - 1))):
+            if delay:
+                time.sleep(delay)
+            try:
+                return self._post_hedged(path, handle, **kwargs)
+            except (CircuitOpenError, PoolTimeoutError):
+                raise
+            except requests.exceptions.ConnectionError as e:
+                last_error = e
+        raise last_error
+
+    def _probe(self) -> bool:
+        return self.session.get(self.url("/api/tags"), timeout=3).status_code == 200
+
+    def _send(self, path: str, handle: Optional[GenerationHandle] = None, **kwargs) -> requests.Response:
+        """One POST attempt to this server, recorded in its circuit breaker."""
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                f"Ollama at {self.base_url} is unavailable; retrying in the background "
+                f"(next check in {self.breaker.retry_in():.0f}s)"
+            )
+        _sending.handle = handle
+        try:
+            response = self.session.post(self.url(path), **kwargs)
+        except EmptyPoolError as e:
+            # Our own connections are all busy; not a server failure
+            raise _pool_timeout(e) from e
+        except requests.exceptions.ConnectionError as e:
+            if handle is not None and handle.is_cancelled:
+                # Our own cancel shut the connection; the server is fine
+                raise GenerationCancelled(handle.reason) from e
+            # Includes connect timeouts; a slow model (read timeout) is not a dead server
+            self.breaker.record_failure()
+            raise
+        finally:
+            _sending.handle = None
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _post_hedged(self, path: str, handle: Optional[GenerationHandle] = None, **kwargs) -> requests.Response:
+        secondary = self.secondary if self.secondary and self.secondary.breaker.allow() else None
+        if not self.breaker.allow() and secondary:
+            return secondary._send(path, handle, **kwargs)  # failover while the primary is down
+        if not secondary or not self.hedge_after:
+            return self._send(path, handle, **kwargs)
+
+        futures = [_hedge_pool.submit(self._send, path, handle, **kwargs)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            logger.info(f"No response from {self.base_url} after {self.hedge_after}s; hedging to {secondary.base_url}")
+            futures.append(_hedge_pool.submit(secondary._send, path, handle, **kwargs))
+        error = None
+        while futures:
+            done, pending = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower copy is closed when it arrives so its server stops generating
+                    for loser in pending:
+                        loser.add_done_callback(_close_response)
+                    return future.result()
+                error = error or future.exception()
+            futures = list(pending)
+        raise error
+
+    def close(self):
+        self.session.close()
+
+    # -------------------------------
+    # Cancellable generations
+    # -------------------------------
+    def generation(self, session_id: Optional[str] = None, streaming: bool = True) -> GenerationHandle:
+        """
+        Handle for one request; use as a context manager around the request,
+        pass it to ``post(..., handle=handle)`` so the connection is bound to
+        it as it is sent, and ``attach`` the response to it so ``cancel`` can
+        also close the stream.
+        """
+        return GenerationHandle(self, session_id, streaming)
+
+    def group(self, session_id: Optional[str] = None, priority: int = PRIORITY_BATCH) -> GenerationGroup:
+        """Cancellable group for the requests of one batch job."""
+        return GenerationGroup(self, session_id, priority)
+
+    def _register(self, handle: GenerationHandle):
+        with self._generations_lock:
+            self._generations[handle.id] = handle
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_forever, name="ollama-reaper", daemon=True)
+                self._reaper.start()
+
+    def _unregister(self, handle: GenerationHandle):
+        with self._generations_lock:
+            self._generations.pop(handle.id, None)
+
+    def active_generations(self, session_id: Optional[str] = None) -> List[GenerationHandle]:
+        with self._generations_lock:
+            handles = list(self._generations.values())
+        return [h for h in handles if session_id is None or h.session_id == session_id]
+
+    def cancel_session(self, session_id: Optional[str] = None, reason: str = "cancelled by user") -> int:
+        """Cancel every in-flight generation of a session (default: the calling one)."""
+        handles = self.active_generations(session_id or current_session_id())
+        for handle in handles:
+            handle.cancel(reason)
+        return len(handles)
+
+    def reap(self) -> int:
+        """Abort generations whose browser session is gone or whose reader stopped reading."""
+        reaped = 0
+        for handle in self.active_generations():
+            if handle.is_cancelled:
+                continue
+            if not session_is_active(handle.session_id):
+                handle.cancel("aborted: session closed")
+            elif handle.stalled():
+                handle.cancel("aborted: stream abandoned")
+            else:
+                continue
+            reaped += 1
+        return reaped
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(REAPER_INTERVAL)
+            try:
+                self.reap()
+            except Exception as e:
+                logger.warning(f"Generation reaper failed: {e}")
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
+
+
+# Runs the racing copies of hedged requests
+_hedge_pool = ThreadPoolExecutor(max_workers=2 * POOL_MAXSIZE, thread_name_prefix="ollama-hedge")
+
+_clients: Dict[str, OllamaClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(base_url: str = OLLAMA_BASE_URL) -> OllamaClient:
+    """
+    Return the process-wide client for ``base_url``, creating it on first use.
+    Streamlit reruns and different browser sessions all get the same instance,
+    so TCP connections to Ollama are reused instead of reopened per rerun.
+    """
+    key = base_url.rstrip("/")
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                secondary = None
+                if OLLAMA_SECONDARY_URL and key == OLLAMA_BASE_URL.rstrip("/"):
+                    secondary = OllamaClient(OLLAMA_SECONDARY_URL)
+                client = _clients[key] = OllamaClient(key, secondary=secondary)
+                logger.info(f"Created shared Ollama client for {key}"
+                            + (f" (secondary {secondary.base_url})" if secondary else ""))
+    return client
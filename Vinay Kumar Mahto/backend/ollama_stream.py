@@ -0,0 +1,182 @@
+import json
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the json module
+    orjson = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NS_TO_MS = 1e-6
+
+
+def json_loads(data: bytes):
+    # json.loads(bytes) sniffs the encoding on every call; Ollama always sends UTF-8
+    return json.loads(data.decode("utf-8"))
+
+
+# Chosen once; orjson parses bytes directly and is several times faster
+loads = orjson.loads if orjson is not None else json_loads
+
+
+class OllamaStreamError(Exception):
+    """An ``{"error": ...}`` object from Ollama, mid-stream or as the whole reply."""
+
+
+class GenerationStats:
+    """Timing stats from the final ``done`` object of /api/generate or /api/chat, in ms."""
+
+    __slots__ = ("model", "done_reason", "prompt_tokens", "prompt_eval_ms", "eval_tokens",
+                 "eval_ms", "load_ms", "total_ms")
+
+    def __init__(self, model: str = "", done_reason: str = "", prompt_tokens: int = 0,
+                 prompt_eval_ms: float = 0.0, eval_tokens: int = 0, eval_ms: float = 0.0,
+                 load_ms: float = 0.0, total_ms: float = 0.0):
+        self.model = model
+        self.done_reason = done_reason
+        self.prompt_tokens = prompt_tokens
+        self.prompt_eval_ms = prompt_eval_ms
+        self.eval_tokens = eval_tokens
+        self.eval_ms = eval_ms
+        self.load_ms = load_ms
+        self.total_ms = total_ms
+
+    @classmethod
+    def from_final(cls, final: Dict) -> "GenerationStats":
+        return cls(
+            model=final.get("model", ""),
+            done_reason=final.get("done_reason", "") or "",
+            prompt_tokens=final.get("prompt_eval_count", 0) or 0,
+            prompt_eval_ms=(final.get("prompt_eval_duration", 0) or 0) * NS_TO_MS,
+            eval_tokens=final.get("eval_count", 0) or 0,
+            eval_ms=(final.get("eval_duration", 0) or 0) * NS_TO_MS,
+            load_ms=(final.get("load_duration", 0) or 0) * NS_TO_MS,
+            total_ms=(final.get("total_duration", 0) or 0) * NS_TO_MS,
+        )
+
+    @property
+    def tokens_per_s(self) -> float:
+        return self.eval_tokens / (self.eval_ms / 1000) if self.eval_ms else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """The metrics shown in the UI and stored with chat history."""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "prompt_eval_ms": self.prompt_eval_ms,
+            "eval_tokens": self.eval_tokens,
+            "eval_ms": self.eval_ms,
+            "tokens_per_s": self.tokens_per_s,
+            "load_ms": self.load_ms,
+            "total_ms": self.total_ms,
+        }
+
+
+class NDJSONParser:
+    """
+    Incremental newline-delimited JSON parser over raw byte chunks.
+
+    Network chunks are split on ``b"\\n"`` only; a trailing partial line is
+    kept until the next chunk, so objects (and multi-byte UTF-8 characters)
+    split across reads are parsed once, whole. Lines that are not JSON are
+    skipped.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> List[Dict]:
+        if self._buffer:
+            data = self._buffer + data
+        lines = data.split(b"\n")
+        self._buffer = lines.pop()
+        return self._parse(lines)
+
+    def close(self) -> List[Dict]:
+        """Parse whatever is left after the last newline."""
+        rest, self._buffer = self._buffer, b""
+        return self._parse([rest])
+
+    @staticmethod
+    def _parse(lines: List[bytes]) -> List[Dict]:
+        objects = []
+        for line in lines:
+            if not line or line.isspace():
+                continue
+            try:
+                obj = loads(line)
+            except ValueError:
+                logger.debug(f"Skipping non-JSON line from Ollama: {line[:200]!r}")
+                continue
+            if isinstance(obj, dict):
+                objects.append(obj)
+        return objects
+
+
+def message_text(obj: Dict) -> str:
+    """The text of one /api/generate (``response``) or /api/chat (``message.content``) object."""
+    text = obj.get("response")
+    if text is None:
+        text = (obj.get("message") or {}).get("content")
+    return text or ""
+
+
+def parse_response(data: Dict) -> Tuple[str, Optional[GenerationStats]]:
+    """Text and stats (None unless ``done``) of a non-streaming reply; raises OllamaStreamError."""
+    if "error" in data:
+        raise OllamaStreamError(data["error"])
+    return message_text(data), GenerationStats.from_final(data) if data.get("done") else None
+
+
+class OllamaStream:
+    """
+    The text tokens of a streaming /api/generate or /api/chat response.
+
+    Iterating yields each non-empty token; afterwards ``text`` holds the
+    whole answer and ``stats`` the final GenerationStats (None if the stream
+    ended without ``done``). An error object raises OllamaStreamError. With
+    a GenerationHandle the stream is read through it, so it can be cancelled.
+    """
+
+    def __init__(self, response: requests.Response, handle=None):
+        self.response = response
+        self.handle = handle
+        self.stats: Optional[GenerationStats] = None
+        self._parts: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self.stats is not None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def _objects(self) -> Iterator[Dict]:
+        if self.handle is not None:
+            chunks = self.handle.iter_chunks(self.response)
+        else:
+            chunks = self.response.iter_content(chunk_size=None)
+        parser = NDJSONParser()
+        for chunk in chunks:
+            yield from parser.feed(chunk)
+        yield from parser.close()
+
+    def __iter__(self) -> Iterator[str]:
+        # Hot loop: one pass per token, no per-object helper calls
+        parts = self._parts
+        for obj in self._objects():
+            if "error" in obj:
+                raise OllamaStreamError(obj["error"])
+            token = obj.get("response")
+            if token is None:
+                token = (obj.get("message") or {}).get("content")
+            if token:
+                parts.append(token)
+                yield token
+            if obj.get("done"):
+                self.stats = GenerationStats.from_final(obj)
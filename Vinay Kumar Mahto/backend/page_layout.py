@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple
+
+# Analysis runs on a downscaled copy of the binarized page
+ANALYSIS_SCALE = 4
+# Only pages without a single text-like component are skipped as blank. Pages with
+# fewer components or less ink than this (a lone heading or signature) are OCR'd whole
+MIN_TEXT_COMPONENTS = 3
+SPARSE_INK_RATIO = 0.001
+# Vertical whitespace wider than this fraction of the page splits text columns
+COLUMN_GAP_RATIO = 0.03
+# Padding (full-resolution pixels) kept around each cropped region
+REGION_PADDING = 16
+
+
+def _runs(profile: np.ndarray, min_gap: int) -> List[Tuple[int, int]]:
+    """Return [start, end) runs of True in a 1-D profile, merging gaps shorter than min_gap."""
+    idx = np.flatnonzero(profile)
+    if idx.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(idx) > min_gap)
+    starts = np.concatenate(([idx[0]], idx[breaks + 1]))
+    ends = np.concatenate((idx[breaks], [idx[-1]])) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def analyze_page(binary: np.ndarray) -> Dict:
+    """
+    Fast pre-pass over a binarized page (dark text on white).
+
+    A page is blank only if it has no text-like connected components; sparse
+    pages are OCR'd whole rather than risk skipping their text. Otherwise
+    projection profiles of the text-like components find the text columns.
+    Returns a dict with ``blank``, ``regions`` as (x, y, w, h) boxes in page
+    pixels, ``pixels_total`` and ``pixels_ocr``.
+    """
+    h, w = binary.shape[:2]
+    small = cv2.resize(binary, (max(1, w // ANALYSIS_SCALE), max(1, h // ANALYSIS_SCALE)),
+                       interpolation=cv2.INTER_AREA)
+    ink = (small < 128).astype(np.uint8)
+    sh, sw = ink.shape
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+
+    # Text-like components: not single-pixel specks, not page-sized frames or pictures
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    keep = (areas >= 2) & (stats[1:, cv2.CC_STAT_WIDTH] < sw * 0.5) & (stats[1:, cv2.CC_STAT_HEIGHT] < sh * 0.2)
+    text_components = int(keep.sum())
+    ink_ratio = float(areas[keep].sum()) / ink.size if ink.size else 0.0
+
+    layout = {
+        "blank": text_components == 0,
+        "regions": [],
+        "pixels_total": int(h * w),
+        "pixels_ocr": 0,
+        "text_components": text_components,
+    }
+    if layout["blank"]:
+        return layout
+    if text_components < MIN_TEXT_COMPONENTS or ink_ratio < SPARSE_INK_RATIO:
+        layout["regions"].append((0, 0, int(w), int(h)))
+        layout["pixels_ocr"] = int(h * w)
+        return layout
+
+    keep_label = np.zeros(count, dtype=bool)
+    keep_label[1:] = keep
+    text_mask = keep_label[labels]
+
+    rows = _runs(text_mask.any(axis=1), sh)
+    top, bottom = rows[0][0], rows[-1][1]
+    min_gap = max(2, int(sw * COLUMN_GAP_RATIO))
+    for x0, x1 in _runs(text_mask[top:bottom].any(axis=0), min_gap):
+        col_rows = _runs(text_mask[top:bottom, x0:x1].any(axis=1), sh)
+        y0, y1 = top + col_rows[0][0], top + col_rows[-1][1]
+        left = max(0, x0 * ANALYSIS_SCALE - REGION_PADDING)
+        upper = max(0, y0 * ANALYSIS_SCALE - REGION_PADDING)
+        right = min(w, x1 * ANALYSIS_SCALE + REGION_PADDING)
+        lower = min(h, y1 * ANALYSIS_SCALE + REGION_PADDING)
+        layout["regions"].append((int(left), int(upper), int(right - left), int(lower - upper)))
+        layout["pixels_ocr"] += int((right - left) * (lower - upper))
+    return layout
+
+
+def summarize_layouts(layouts: List[Dict]) -> Dict:
+    """Aggregate per-page layout results into document-level OCR savings."""
+    pixels_total = sum(l.get("pixels_total", 0) for l in layouts)
+    pixels_ocr = sum(l.get("pixels_ocr", 0) for l in layouts)
+    languages = {}
+    for l in layouts:
+        if l.get("lang"):
+            languages[l["lang"]] = languages.get(l["lang"], 0) + 1
+    return {
+        "pages": len(layouts),
+        "blank_pages": sum(1 for l in layouts if l.get("blank")),
+        "regions": sum(len(l.get("regions", [])) for l in layouts),
+        "pixels_total": pixels_total,
+        "pixels_ocr": pixels_ocr,
+        "pixels_saved": pixels_total - pixels_ocr,
+        "saved_ratio": (pixels_total - pixels_ocr) / pixels_total if pixels_total else 0.0,
+        "languages": languages,
+    }
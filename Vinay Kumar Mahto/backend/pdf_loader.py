@@ -1,25 +1,69 @@
 import fitz
+import os
 import logging
 from backend.ocr import extract_text_from_scanned_pdf
+from backend.checkpoint import ExtractionCheckpoint, compute_file_hash, CHECKPOINT_ROOT
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def extract_pdf_text(pdf_path: str) -> str:
+# OCR language for scanned PDFs: a tesseract lang string, or "auto" to pick per page
+OCR_LANG = os.environ.get("OCR_LANG", "auto")
+
+def extract_pdf_text(pdf_path: str, work_dir: str = CHECKPOINT_ROOT, progress_callback=None, dpi: int = 300,
+                     lang: str = OCR_LANG, stats: dict = None) -> str:
     """
     Extract text from a PDF file, using OCR if the PDF is scanned.
+
+    Per-page results are checkpointed under ``work_dir`` keyed by the document
+    hash, so a retried extraction of the same file skips completed pages.
+    ``progress_callback(pages_done, total_pages, stage)`` is called after each page.
+    If ``stats`` is given, ``stats["page_offsets"]`` receives the start offset of
+    every page in the returned text.
     """
     try:
+        doc_hash = compute_file_hash(pdf_path)
+        checkpoint = ExtractionCheckpoint(doc_hash, "text", work_dir)
         doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
+        total_pages = len(doc)
+        checkpoint.set_total_pages(total_pages)
+        pages = []
+        for page_num in range(1, total_pages + 1):
+            cached = checkpoint.load_page(page_num)
+            if cached is not None:
+                page_text = cached["text"]
+            else:
+                page_text = doc.load_page(page_num - 1).get_text()
+                checkpoint.save_page(page_num, page_text)
+            pages.append(page_text)
+            if progress_callback:
+                progress_callback(page_num, total_pages, "text")
         doc.close()
+        text = "".join(pages)
+        page_offsets, offset = [], 0
+        for page_text in pages:
+            page_offsets.append(offset)
+            offset += len(page_text)
         if len(text.strip()) < 100:
             logger.info("PDF appears to be scanned. Using OCR...")
-            success, ocr_text, _ = extract_text_from_scanned_pdf(pdf_path)
+            ocr_checkpoint = ExtractionCheckpoint(doc_hash, f"ocr_{dpi}_{lang}", work_dir)
+            ocr_stats = {}
+            success, ocr_text, _ = extract_text_from_scanned_pdf(
+                pdf_path,
+                dpi=dpi,
+                checkpoint=ocr_checkpoint,
+                progress_callback=progress_callback,
+                keep_images=False,
+                stats=ocr_stats,
+                lang=lang
+            )
             if success:
+                logger.info(f"OCR languages per page: {ocr_stats.get('languages', {})}")
+                if stats is not None:
+                    stats["page_offsets"] = ocr_stats.get("page_offsets", [])
                 return ocr_text
+        if stats is not None:
+            stats["page_offsets"] = page_offsets
         return text
     except Exception as e:
         logger.error(f"Text extraction failed: {e}")
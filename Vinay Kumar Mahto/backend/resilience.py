@@ -0,0 +1,96 @@
+import os
+import time
+import random
+import threading
+import logging
+from typing import Callable, Iterator
+
+import requests
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+# Attempts per request when the connection fails (not when the model is just slow)
+RETRY_ATTEMPTS = int(os.environ.get("OLLAMA_RETRIES", 3))
+BACKOFF_BASE = float(os.environ.get("OLLAMA_BACKOFF_BASE", 0.25))
+BACKOFF_CAP = float(os.environ.get("OLLAMA_BACKOFF_CAP", 4.0))
+# Consecutive failures that open the circuit, and how often an open circuit is probed
+BREAKER_THRESHOLD = int(os.environ.get("OLLAMA_BREAKER_THRESHOLD", 3))
+BREAKER_PROBE_INTERVAL = float(os.environ.get("OLLAMA_BREAKER_PROBE_INTERVAL", 5))
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without touching the network while the server is known to be down."""
+
+
+def backoff_delays(attempts: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> Iterator[float]:
+    """
+    "Full jitter" exponential backoff: the n-th delay is uniform in
+    [0, min(cap, base * 2**n)], so clients that failed together do not retry together.
+    """
+    for attempt in range(attempts):
+        yield random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Fails requests fast while a server is down.
+
+    After ``threshold`` consecutive failures the circuit opens: ``allow()``
+    returns False and a background thread calls ``probe()`` every
+    ``probe_interval`` seconds until it succeeds, which closes the circuit
+    again. User requests never wait on a dead server in the meantime.
+    """
+
+    def __init__(self, name: str, probe: Callable[[], bool], threshold: int = BREAKER_THRESHOLD,
+                 probe_interval: float = BREAKER_PROBE_INTERVAL):
+        self.name = name
+        self.probe = probe
+        self.threshold = max(1, threshold)
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        return self._opened_at is None
+
+    def record_success(self):
+        with self._lock:
+            was_open = self._opened_at is not None
+            self._failures = 0
+            self._opened_at = None
+        if was_open:
+            logger.info(f"Circuit for {self.name} closed: server is back")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures < self.threshold:
+                return
+            self._opened_at = time.time()
+        logger.warning(f"Circuit for {self.name} opened after {self._failures} failures; probing in the background")
+        threading.Thread(target=self._probe_until_closed, name=f"breaker-probe-{self.name}", daemon=True).start()
+
+    def _probe_until_closed(self):
+        while self.is_open:
+            time.sleep(self.probe_interval)
+            try:
+                if self.probe():
+                    self.record_success()
+            except Exception as e:
+                logger.debug(f"Probe of {self.name} failed: {e}")
+
+    def retry_in(self) -> float:
+        """Seconds until the next background probe, for user-facing messages."""
+        if self._opened_at is None:
+            return 0.0
+        elapsed = time.time() - self._opened_at
+        return self.probe_interval - elapsed % self.probe_interval
@@ -0,0 +1,130 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import logging
+from typing import Dict, Generator, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+RESPONSE_CACHE_PATH = os.environ.get(
+    "POLICYNAV_RESPONSE_CACHE",
+    os.path.join(tempfile.gettempdir(), "policynav_cache", "responses.sqlite3")
+)
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("POLICYNAV_RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def make_cache_key(**parts) -> str:
+    """SHA-256 over the request parts (endpoint, model, options, prompt, ...)."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def should_cache(temperature: Optional[float], opt_in: bool = False) -> bool:
+    """Exact-match replay is only safe for deterministic sampling unless the user opts in."""
+    return opt_in or temperature == 0
+
+
+def replay_stream(text: str) -> Generator[str, None, None]:
+    """Yield a cached answer word by word so the UI renders it like a live stream."""
+    for piece in re.findall(r"\S+\s*|\s+", text):
+        yield piece
+
+
+class ResponseCache:
+    """
+    Persistent exact-match LLM response cache in SQLite.
+
+    Entries are evicted least-recently-used first once the stored responses
+    exceed ``max_bytes``.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+            return row[0]
+
+    def put(self, key: str, response: str, model: str = ""):
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, model, response, size, now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC"):
+            doomed.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        logger.info(f"Response cache evicted {len(doomed)} entries ({freed:,} bytes)")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, size, hits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM responses"
+            ).fetchone()
+        return {"entries": entries, "bytes": size, "hits": hits, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache, opened on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,234 @@
+import os
+import time
+import itertools
+import threading
+import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+# Generations allowed to run at once; match the server's OLLAMA_NUM_PARALLEL
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", 1))
+# Lower number = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+# Service-time guess used for wait estimates until real requests have finished
+INITIAL_SERVICE_ESTIMATE = 15.0
+SERVICE_TIME_SMOOTHING = 0.2
+
+
+# Ids returned by current_session_id() that belong to Streamlit browser sessions
+_streamlit_sessions = set()
+
+
+def current_session_id() -> str:
+    """Streamlit browser-session id of the calling script run, else the thread name."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            _streamlit_sessions.add(ctx.session_id)
+            return ctx.session_id
+    except Exception:
+        pass
+    return threading.current_thread().name
+
+
+def session_is_active(session_id: str) -> bool:
+    """
+    False once Streamlit reports the browser session as gone (tab closed or
+    disconnected). Ids that are not Streamlit sessions are always active.
+    """
+    if session_id not in _streamlit_sessions:
+        return True
+    try:
+        from streamlit.runtime import Runtime
+        if Runtime.exists():
+            return Runtime.instance().is_active_session(session_id)
+    except Exception:
+        pass
+    return True
+
+
+class GenerationCancelled(Exception):
+    """Raised when a request is cancelled before or while it runs."""
+
+
+class Ticket:
+    """One queued or running Ollama request."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, session_id: str, priority: int):
+        self.id = next(self._ids)
+        self.session_id = session_id
+        self.priority = priority
+        self.enqueued = time.time()
+        self.started: Optional[float] = None
+        self.released = False
+        self._granted = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._granted.is_set() and not self.released
+
+
+class OllamaScheduler:
+    """
+    Process-wide admission control in front of the shared Ollama client.
+
+    At most ``concurrency`` requests run at once. Waiting requests are grouped
+    by priority, then by session: each session has its own FIFO and sessions
+    at the same priority take turns, so one user's batch job cannot starve
+    everybody else's chat.
+    """
+
+    def __init__(self, concurrency: int = OLLAMA_NUM_PARALLEL):
+        self.concurrency = max(1, concurrency)
+        self._lock = threading.Lock()
+        # priority -> session_id -> FIFO of tickets; session order is the round-robin order
+        self._queues: Dict[int, "OrderedDict[str, deque]"] = {}
+        self._active = 0
+        self._avg_service = INITIAL_SERVICE_ESTIMATE
+        self._completed = 0
+
+    def submit(self, session_id: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE) -> Ticket:
+        ticket = Ticket(session_id or current_session_id(), priority)
+        with self._lock:
+            sessions = self._queues.setdefault(priority, OrderedDict())
+            sessions.setdefault(ticket.session_id, deque()).append(ticket)
+            self._dispatch()
+        return ticket
+
+    def _dispatch(self):
+        # Called with the lock held
+        while self._active < self.concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+            self._active += 1
+            ticket.started = time.time()
+            ticket._granted.set()
+
+    def _next_ticket(self) -> Optional[Ticket]:
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            if not sessions:
+                continue
+            session_id, tickets = next(iter(sessions.items()))
+            ticket = tickets.popleft()
+            del sessions[session_id]
+            if tickets:
+                sessions[session_id] = tickets  # back of the round-robin
+            return ticket
+        return None
+
+    def wait(self, ticket: Ticket, timeout: Optional[float] = None) -> bool:
+        """Block until the ticket is allowed to run; False on timeout."""
+        return ticket._granted.wait(timeout)
+
+    def release(self, ticket: Ticket):
+        """Free a running ticket's slot, or drop it from the queue if it never started."""
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket._granted.is_set():
+                self._active -= 1
+                duration = time.time() - ticket.started
+                self._completed += 1
+                alpha = 1.0 if self._completed == 1 else SERVICE_TIME_SMOOTHING
+                self._avg_service += alpha * (duration - self._avg_service)
+            else:
+                sessions = self._queues.get(ticket.priority, {})
+                tickets = sessions.get(ticket.session_id)
+                if tickets is not None:
+                    tickets.remove(ticket)
+                    if not tickets:
+                        del sessions[ticket.session_id]
+            self._dispatch()
+
+    def position(self, ticket: Ticket) -> int:
+        """
+        Requests expected to start before this one (0 = next). Exact for FIFO
+        within a session; across sessions it assumes the current round-robin
+        order holds.
+        """
+        with self._lock:
+            if ticket._granted.is_set() or ticket.released:
+                return 0
+            ahead = 0
+            for priority in sorted(self._queues):
+                sessions = self._queues[priority]
+                if priority < ticket.priority:
+                    ahead += sum(len(q) for q in sessions.values())
+                    continue
+                if priority > ticket.priority:
+                    break
+                own = sessions.get(ticket.session_id)
+                index = own.index(ticket) if own else 0
+                before_us = True
+                for session_id, tickets in sessions.items():
+                    if session_id == ticket.session_id:
+                        ahead += index
+                        before_us = False
+                        continue
+                    # Sessions ahead in the rotation get one more turn before ours
+                    ahead += min(len(tickets), index + 1 if before_us else index)
+            return ahead
+
+    def estimated_wait(self, ticket: Ticket) -> float:
+        """Rough seconds until the ticket starts, from the average request duration."""
+        if ticket._granted.is_set():
+            return 0.0
+        rounds = self.position(ticket) // self.concurrency + 1
+        return rounds * self._avg_service
+
+    @contextmanager
+    def slot(self, session_id: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE,
+             on_wait: Optional[Callable[[int, float], None]] = None, poll: float = 0.5,
+             cancelled: Optional[threading.Event] = None):
+        """
+        Hold a concurrency slot for the body of the ``with`` block.
+        While queued, ``on_wait(position, estimated_wait_s)`` is called every ``poll`` seconds;
+        if ``cancelled`` gets set first the ticket leaves the queue and GenerationCancelled is raised.
+        """
+        ticket = self.submit(session_id, priority)
+        try:
+            while not self.wait(ticket, poll):
+                if cancelled is not None and cancelled.is_set():
+                    raise GenerationCancelled("cancelled while queued")
+                if on_wait:
+                    on_wait(self.position(ticket), self.estimated_wait(ticket))
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "active": self._active,
+                "queued": sum(len(q) for s in self._queues.values() for q in s.values()),
+                "avg_service_s": self._avg_service,
+            }
+
+
+_scheduler: Optional[OllamaScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> OllamaScheduler:
+    """Process-wide scheduler shared by every session and app that talks to Ollama."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = OllamaScheduler()
+            logger.info(f"Ollama scheduler allows {_scheduler.concurrency} concurrent request(s)")
+    return _scheduler
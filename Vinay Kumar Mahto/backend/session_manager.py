@@ -1,10 +1,31 @@
+import sys
+import secrets
 import streamlit as st
 from datetime import datetime
 from backend.ollama_chatbot import RateLimiter
-import copy
+from backend.document_store import get_document_store
+from backend.session_store import get_session_store, SESSION_LIST_LIMIT, SESSION_PAGE_SIZE, SESSION_WINDOW
+
+# Query parameter that identifies a browser's sessions across refreshes
+OWNER_PARAM = "sid"
 
 
 class SessionManager:
+    """
+    Chat sessions persisted in the SQLite session store.
+
+    ``chat_sessions`` holds only metadata (name, pdf name, document id,
+    message count) for the most recent sessions; messages live in the store
+    and only the latest page of the open session is in ``messages``, starting
+    at row ``history_start``, and at most SESSION_WINDOW of them stay in
+    memory once saved. The first ``messages_saved`` messages of that window
+    are already stored; saving appends just the ones after them, and the
+    document is referenced by content hash and shared through the document
+    store instead of being copied into every session. Sessions belong to the
+    browser identified by the ``sid`` query parameter, so a refresh restores
+    them.
+    """
+
     @staticmethod
     def initialize_session_state():
         """Initialize Streamlit session_state with defaults."""
@@ -29,54 +50,183 @@ class SessionManager:
             if key not in st.session_state:
                 st.session_state[key] = value
 
+        SessionManager.restore_sessions()
+
         # Ensure a default chat session always exists
-        if "default" not in st.session_state.chat_sessions:
-            SessionManager.create_chat_session("default")
+        if not st.session_state.chat_sessions:
+            st.session_state.chat_sessions["default"] = SessionManager._new_meta("default")
+            st.session_state.current_session = "default"
+
+    @staticmethod
+    def owner() -> str:
+        """This browser's id, kept in the URL so it survives a refresh."""
+        if "session_owner" not in st.session_state:
+            owner = st.query_params.get(OWNER_PARAM)
+            if not owner:
+                owner = secrets.token_urlsafe(12)
+                st.query_params[OWNER_PARAM] = owner
+            st.session_state.session_owner = owner
+        return st.session_state.session_owner
+
+    @staticmethod
+    def restore_sessions():
+        """Once per Streamlit session: list stored sessions and reopen the most recent one."""
+        if st.session_state.get("sessions_restored"):
+            return
+        st.session_state.sessions_restored = True
+        st.session_state.setdefault("history_start", 0)
+        st.session_state.setdefault("messages_saved", 0)
+        stored = get_session_store().list_sessions(SessionManager.owner())
+        if not stored:
+            return
+        st.session_state.chat_sessions = {meta["name"]: meta for meta in stored}
+        SessionManager._open(stored[-1]["name"])
+
+    @staticmethod
+    def _new_meta(name: str) -> dict:
+        return {"name": name, "timestamp": datetime.now().isoformat(), "pdf_name": st.session_state.pdf_name,
+                "doc_id": None, "message_count": 0}
+
+    @staticmethod
+    def _shared_document():
+        """
+        The current pdf_text as a shared Document. The first call after a new
+        upload hashes it once and puts the Document back in session_state, so
+        later saves are O(1); non-dict values (strings) are immutable already
+        and are not persisted.
+        """
+        pdf_text = st.session_state.pdf_text
+        if isinstance(pdf_text, dict):
+            pdf_text = st.session_state.pdf_text = get_document_store().intern(pdf_text)
+        return pdf_text
+
+    @staticmethod
+    def _open(name: str):
+        """Load the latest page of ``name`` and its document into session_state."""
+        store = get_session_store()
+        meta = st.session_state.chat_sessions[name]
+        messages, start = store.load_messages(SessionManager.owner(), name)
+        st.session_state.current_session = name
+        st.session_state.messages = messages
+        st.session_state.history_start = start
+        st.session_state.messages_saved = len(messages)
+        st.session_state.pdf_name = meta.get("pdf_name")
+        st.session_state.pdf_text = store.load_document(meta.get("doc_id")) or {}
 
     @staticmethod
     def create_chat_session(name: str = None):
-        """Create a new chat session."""
+        """Create a new, empty chat session on the current document."""
+        store = get_session_store()
+        owner = SessionManager.owner()
+        if st.session_state.get("current_session") in st.session_state.chat_sessions:
+            SessionManager.save_current_session()
         if not name:
-            name = f"session_{len(st.session_state.chat_sessions) + 1}"
+            n = len(st.session_state.chat_sessions) + 1
+            while f"session_{n}" in st.session_state.chat_sessions or store.get_session(owner, f"session_{n}"):
+                n += 1
+            name = f"session_{n}"
 
-        st.session_state.chat_sessions[name] = {
-            "messages": [],
-            "timestamp": datetime.now().isoformat(),
-            "pdf_name": st.session_state.pdf_name,
-            "pdf_text": copy.deepcopy(st.session_state.pdf_text)
-        }
+        meta = store.create_session(owner, name, st.session_state.pdf_name, SessionManager._shared_document())
+        st.session_state.chat_sessions[name] = meta
         st.session_state.current_session = name
+        st.session_state.messages = []
+        st.session_state.history_start = 0
+        st.session_state.messages_saved = 0
+        SessionManager._trim_sessions()
         return name
 
     @staticmethod
     def switch_chat_session(session_name: str):
         """Switch to a different chat session."""
-        if session_name in st.session_state.chat_sessions:
-            s = st.session_state.chat_sessions[session_name]
-            st.session_state.current_session = session_name
-            st.session_state.messages = copy.deepcopy(s["messages"])
-            st.session_state.pdf_name = s["pdf_name"]
-            st.session_state.pdf_text = copy.deepcopy(s.get("pdf_text", {}))
-            return True
-        return False
+        if session_name not in st.session_state.chat_sessions:
+            meta = get_session_store().get_session(SessionManager.owner(), session_name)
+            if meta is None:
+                return False
+            st.session_state.chat_sessions[session_name] = meta
+        if st.session_state.current_session in st.session_state.chat_sessions:
+            SessionManager.save_current_session()
+        SessionManager._open(session_name)
+        return True
 
     @staticmethod
     def save_current_session():
-        """Save the current state into the active session."""
-        if st.session_state.current_session in st.session_state.chat_sessions:
-            st.session_state.chat_sessions[st.session_state.current_session].update({
-                "messages": copy.deepcopy(st.session_state.messages),
-                "pdf_name": st.session_state.pdf_name,
-                "pdf_text": copy.deepcopy(st.session_state.pdf_text)
-            })
+        """Save the current state into the active session: new messages and the document reference."""
+        name = st.session_state.current_session
+        store = get_session_store()
+        owner = SessionManager.owner()
+        meta = st.session_state.chat_sessions.setdefault(name, SessionManager._new_meta(name))
+        document = SessionManager._shared_document()
+        saved = st.session_state.get("messages_saved", 0)
+        new = st.session_state.messages[saved:]
+        if new:
+            meta["message_count"] = store.sync_messages(owner, name, new)
+            st.session_state.messages_saved = len(st.session_state.messages)
+        doc_id = getattr(document, "doc_id", None)
+        if doc_id != meta.get("doc_id") or st.session_state.pdf_name != meta.get("pdf_name"):
+            store.set_document(owner, name, st.session_state.pdf_name, document)
+            meta.update({"doc_id": doc_id, "pdf_name": st.session_state.pdf_name})
+
+        # Everything is stored now, so the oldest messages can leave memory
+        excess = len(st.session_state.messages) - SESSION_WINDOW
+        if excess > 0:
+            del st.session_state.messages[:excess]
+            st.session_state.history_start = st.session_state.get("history_start", 0) + excess
+            st.session_state.messages_saved -= excess
 
     @staticmethod
     def save_chat(chat_history):
-        """Save chat history to the current session."""
+        """Replace the stored history of the current session with ``chat_history``."""
         if not hasattr(st.session_state, "current_session"):
             st.session_state.current_session = "default"
 
-        if st.session_state.current_session not in st.session_state.chat_sessions:
-            SessionManager.create_chat_session(st.session_state.current_session)
+        name = st.session_state.current_session
+        store, owner = get_session_store(), SessionManager.owner()
+        meta = st.session_state.chat_sessions.setdefault(name, SessionManager._new_meta(name))
+        meta["message_count"] = store.replace_messages(owner, name, list(chat_history))
+
+    @staticmethod
+    def has_earlier_messages() -> bool:
+        return st.session_state.get("history_start", 0) > 0
 
-        st.session_state.chat_sessions[st.session_state.current_session]["messages"] = copy.deepcopy(chat_history)
+    @staticmethod
+    def load_earlier_messages(limit: int = SESSION_PAGE_SIZE):
+        """Prepend the page of stored messages before the ones on screen."""
+        start = st.session_state.get("history_start", 0)
+        if start <= 0:
+            return
+        earlier, start = get_session_store().load_messages(
+            SessionManager.owner(), st.session_state.current_session, before=start, limit=limit
+        )
+        st.session_state.messages = earlier + st.session_state.messages
+        st.session_state.history_start = start
+        st.session_state.messages_saved = st.session_state.get("messages_saved", 0) + len(earlier)
+
+    @staticmethod
+    def full_history():
+        """
+        A function returning every stored message of the current session, for
+        deferred exports; it does not touch session_state, so it can run on
+        another thread.
+        """
+        store, owner, name = get_session_store(), SessionManager.owner(), st.session_state.current_session
+        return lambda: store.load_messages(owner, name, limit=sys.maxsize)[0]
+
+    @staticmethod
+    def clear_messages():
+        """Empty the current chat, in the store as well."""
+        name = st.session_state.current_session
+        get_session_store().delete_messages(SessionManager.owner(), name)
+        if name in st.session_state.chat_sessions:
+            st.session_state.chat_sessions[name]["message_count"] = 0
+        st.session_state.messages = []
+        st.session_state.history_start = 0
+        st.session_state.messages_saved = 0
+        SessionManager.save_current_session()
+
+    @staticmethod
+    def _trim_sessions():
+        # Keep metadata for the most recent sessions only; older ones stay in the store
+        sessions = st.session_state.chat_sessions
+        while len(sessions) > SESSION_LIST_LIMIT:
+            oldest = next(name for name in sessions if name != st.session_state.current_session)
+            del sessions[oldest]
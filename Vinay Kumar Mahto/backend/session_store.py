@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from backend.document_store import Document, get_document_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+# Holds every user's chats and document text: the folder is created private (0700)
+# and the database files are readable by this user only
+SESSION_STORE_PATH = os.environ.get(
+    "POLICYNAV_SESSION_DB",
+    os.path.join(tempfile.gettempdir(), "policynav_cache", "sessions.sqlite3")
+)
+# Sessions not updated for this many days are deleted with their messages and
+# any document no other session uses (0 = keep forever)
+SESSION_RETENTION_DAYS = float(os.environ.get("POLICYNAV_SESSION_RETENTION_DAYS", 30))
+# Seconds between retention sweeps of a long-running process
+PURGE_INTERVAL = 3600
+# Messages loaded per page when a session is opened or scrolled back
+SESSION_PAGE_SIZE = int(os.environ.get("POLICYNAV_SESSION_PAGE_SIZE", 50))
+# Most recent sessions listed in the sidebar (and kept as metadata in memory)
+SESSION_LIST_LIMIT = int(os.environ.get("POLICYNAV_SESSION_LIST_LIMIT", 20))
+# Messages of the open session kept in memory; older ones are dropped after saving
+SESSION_WINDOW = int(os.environ.get("POLICYNAV_SESSION_WINDOW", 4 * SESSION_PAGE_SIZE))
+
+MESSAGE_FIELDS = ("role", "content")
+
+
+class SessionStore:
+    """
+    Chat sessions persisted in SQLite.
+
+    Sessions are metadata rows (name, pdf name, document reference, message
+    count); messages are append-only rows read a page at a time; documents
+    are stored once per content hash and referenced by ``doc_id``. Every
+    session belongs to an ``owner`` (a browser, see SessionManager).
+    Sessions idle for longer than ``retention_days`` are purged when the
+    store opens and then at most hourly as sessions are created.
+    """
+
+    def __init__(self, path: str = SESSION_STORE_PATH, retention_days: float = SESSION_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._purged = 0.0
+        os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS sessions (
+                    owner TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    pdf_name TEXT,
+                    doc_id TEXT,
+                    message_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (owner, name)
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS messages (
+                    owner TEXT NOT NULL,
+                    session TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT,
+                    content TEXT,
+                    extra TEXT,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (owner, session, seq)
+                )"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    pages TEXT NOT NULL,
+                    chars INTEGER NOT NULL,
+                    created REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(owner, updated)")
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.chmod(path + suffix, 0o600)
+            except OSError:
+                pass
+        self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Delete sessions idle past the retention period, their messages and orphaned documents."""
+        self._purged = time.time()
+        if self.retention_days <= 0:
+            return 0
+        cutoff = self._purged - self.retention_days * 86400
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM messages WHERE (owner, session) IN "
+                "(SELECT owner, name FROM sessions WHERE updated < ?)", (cutoff,)
+            )
+            purged = self._conn.execute("DELETE FROM sessions WHERE updated < ?", (cutoff,)).rowcount
+            self._conn.execute(
+                "DELETE FROM documents WHERE doc_id NOT IN "
+                "(SELECT doc_id FROM sessions WHERE doc_id IS NOT NULL)"
+            )
+        if purged:
+            logger.info(f"Purged {purged} chat session(s) idle for over {self.retention_days:g} days")
+        return purged
+
+    @staticmethod
+    def _meta(row) -> Dict:
+        name, created, updated, pdf_name, doc_id, count = row
+        return {"name": name, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(created)),
+                "updated": updated, "pdf_name": pdf_name, "doc_id": doc_id, "message_count": count}
+
+    def list_sessions(self, owner: str, limit: int = SESSION_LIST_LIMIT) -> List[Dict]:
+        """Metadata of the ``limit`` most recently updated sessions, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, created, updated, pdf_name, doc_id, message_count FROM sessions "
+                "WHERE owner = ? ORDER BY updated DESC LIMIT ?", (owner, limit)
+            ).fetchall()
+        return [self._meta(row) for row in reversed(rows)]
+
+    def get_session(self, owner: str, name: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, created, updated, pdf_name, doc_id, message_count FROM sessions "
+                "WHERE owner = ? AND name = ?", (owner, name)
+            ).fetchone()
+        return self._meta(row) if row else None
+
+    def create_session(self, owner: str, name: str, pdf_name: str = None, document=None) -> Dict:
+        """Create (or reset) session ``name`` with no messages."""
+        now = time.time()
+        if now - self._purged > PURGE_INTERVAL:
+            self.purge_expired()
+        doc_id = self._put_document(document)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE owner = ? AND session = ?", (owner, name))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (owner, name, created, updated, pdf_name, doc_id, message_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)", (owner, name, now, now, pdf_name, doc_id)
+            )
+        return self.get_session(owner, name)
+
+    def delete_session(self, owner: str, name: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE owner = ? AND session = ?", (owner, name))
+            self._conn.execute("DELETE FROM sessions WHERE owner = ? AND name = ?", (owner, name))
+
+    def sync_messages(self, owner: str, name: str, messages: List[Dict]) -> int:
+        """
+        Append ``messages`` to session ``name`` and return the new message count.
+
+        Row numbers are taken from the stored count inside the transaction, so
+        two tabs saving the same session interleave their messages instead of
+        overwriting each other. Nothing is ever deleted here; clearing a chat
+        is an explicit ``delete_messages``.
+        """
+        with self._lock, self._conn:
+            return self._append(owner, name, messages)
+
+    def replace_messages(self, owner: str, name: str, messages: List[Dict]) -> int:
+        """Replace every message of session ``name`` with ``messages`` in one transaction."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE owner = ? AND session = ?", (owner, name))
+            self._conn.execute("UPDATE sessions SET message_count = 0 WHERE owner = ? AND name = ?", (owner, name))
+            return self._append(owner, name, messages)
+
+    def _append(self, owner: str, name: str, messages: List[Dict]) -> int:
+        # Caller holds self._lock inside a transaction
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT message_count FROM sessions WHERE owner = ? AND name = ?", (owner, name)
+        ).fetchone()
+        if row is None:
+            self._conn.execute(
+                "INSERT INTO sessions (owner, name, created, updated, message_count) VALUES (?, ?, ?, ?, 0)",
+                (owner, name, now, now)
+            )
+            count = 0
+        else:
+            count = row[0]
+        self._conn.executemany(
+            "INSERT INTO messages (owner, session, seq, role, content, extra, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(owner, name, seq, *self._encode(message), now) for seq, message in enumerate(messages, start=count)]
+        )
+        count += len(messages)
+        self._conn.execute(
+            "UPDATE sessions SET message_count = ?, updated = ? WHERE owner = ? AND name = ?",
+            (count, now, owner, name)
+        )
+        return count
+
+    def delete_messages(self, owner: str, name: str):
+        """Remove every message of session ``name`` (the session itself stays)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE owner = ? AND session = ?", (owner, name))
+            self._conn.execute(
+                "UPDATE sessions SET message_count = 0, updated = ? WHERE owner = ? AND name = ?",
+                (time.time(), owner, name)
+            )
+
+    def load_messages(self, owner: str, name: str, before: int = None,
+                      limit: int = SESSION_PAGE_SIZE) -> Tuple[List[Dict], int]:
+        """
+        The ``limit`` messages just before row ``before`` (default: the end),
+        oldest first, and the row number of the first one returned.
+        """
+        with self._lock:
+            if before is None:
+                row = self._conn.execute(
+                    "SELECT message_count FROM sessions WHERE owner = ? AND name = ?", (owner, name)
+                ).fetchone()
+                before = row[0] if row else 0
+            start = max(0, before - limit)
+            rows = self._conn.execute(
+                "SELECT role, content, extra FROM messages WHERE owner = ? AND session = ? AND seq >= ? AND seq < ? "
+                "ORDER BY seq", (owner, name, start, before)
+            ).fetchall()
+        return [self._decode(row) for row in rows], start
+
+    def set_document(self, owner: str, name: str, pdf_name: str = None, document=None):
+        """Point session ``name`` at ``document`` (stored once per content hash)."""
+        doc_id = self._put_document(document)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET pdf_name = ?, doc_id = ?, updated = ? WHERE owner = ? AND name = ?",
+                (pdf_name, doc_id, time.time(), owner, name)
+            )
+
+    def load_document(self, doc_id: str) -> Optional[Document]:
+        """The shared in-memory Document for ``doc_id``, read from disk only if no session holds it."""
+        if not doc_id:
+            return None
+        store = get_document_store()
+        document = store.get(doc_id)
+        if document is not None:
+            return document
+        with self._lock:
+            row = self._conn.execute("SELECT pages FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return store.intern(json.loads(row[0])) if row else None
+
+    def _put_document(self, document) -> Optional[str]:
+        if not isinstance(document, Document) or not document:
+            return None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO documents (doc_id, pages, chars, created) VALUES (?, ?, ?, ?)",
+                (document.doc_id, json.dumps(document, ensure_ascii=False), document.chars, time.time())
+            )
+        return document.doc_id
+
+    @staticmethod
+    def _encode(message: Dict) -> Tuple:
+        extra = {k: v for k, v in message.items() if k not in MESSAGE_FIELDS}
+        return (message.get("role"), message.get("content"),
+                json.dumps(extra, ensure_ascii=False, default=str) if extra else None)
+
+    @staticmethod
+    def _decode(row) -> Dict:
+        role, content, extra = row
+        message = {"role": role, "content": content}
+        if extra:
+            message.update(json.loads(extra))
+        return message
+
+    def stats(self) -> Dict:
+        with self._lock:
+            sessions, messages, documents = (
+                self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("sessions", "messages", "documents")
+            )
+        return {"sessions": sessions, "messages": messages, "documents": documents}
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide session store, opened on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+    return _store
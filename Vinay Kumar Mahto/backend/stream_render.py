@@ -0,0 +1,74 @@
+import os
+import time
+from typing import Callable, Iterable, List, Optional
+
+# -------------------------------
+# Config
+# -------------------------------
+# Re-render at most every FLUSH_INTERVAL seconds, or sooner once FLUSH_TOKENS tokens are waiting
+FLUSH_INTERVAL = float(os.environ.get("STREAM_FLUSH_INTERVAL", 0.05))
+FLUSH_TOKENS = int(os.environ.get("STREAM_FLUSH_TOKENS", 30))
+
+
+class ThrottledRenderer:
+    """
+    Coalesces streamed tokens and re-renders the accumulated text on a time or
+    size cadence instead of on every token.
+
+    Each Streamlit ``placeholder.markdown`` call re-sends the whole answer, so
+    rendering per token costs O(n^2) in the answer length and floods the
+    websocket. With throttling the number of renders is bounded by the stream
+    duration / ``interval`` and by tokens / ``max_tokens``.
+    """
+
+    def __init__(self, render: Callable[[str], None], interval: float = FLUSH_INTERVAL,
+                 max_tokens: int = FLUSH_TOKENS, clock: Callable[[], float] = time.monotonic):
+        """
+        :param render: Called with the full text so far, e.g. ``lambda t: placeholder.markdown(t)``
+        :param interval: Longest time a token may wait before it is shown
+        :param max_tokens: Tokens that force a flush regardless of time
+        """
+        self.render = render
+        self.interval = interval
+        self.max_tokens = max_tokens
+        self.clock = clock
+        self.renders = 0
+        self._text = ""
+        self._pending: List[str] = []
+        self._last_flush = clock()
+
+    @property
+    def text(self) -> str:
+        """Everything received so far, including tokens not rendered yet."""
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending = []
+        return self._text
+
+    def add(self, token: str):
+        self._pending.append(token)
+        if len(self._pending) >= self.max_tokens or self.clock() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if not self._pending and self.renders:
+            return
+        self.render(self.text)
+        self.renders += 1
+        self._last_flush = self.clock()
+
+
+def render_stream(tokens: Iterable[str], render: Callable[[str], None],
+                  final_render: Optional[Callable[[str], None]] = None,
+                  interval: float = FLUSH_INTERVAL, max_tokens: int = FLUSH_TOKENS) -> str:
+    """
+    Consume a token stream with throttled rendering and return the full text.
+    ``final_render`` (default ``render``) draws the finished answer once, e.g.
+    without the typing cursor.
+    """
+    renderer = ThrottledRenderer(render, interval, max_tokens)
+    for token in tokens:
+        renderer.add(str(token))
+    text = renderer.text
+    (final_render or render)(text)
+    return text
@@ -0,0 +1,168 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Generator, List, Optional
+
+from backend.ollama_client import OllamaClient, GenerationGroup, get_ollama_client
+from backend.model_lifecycle import get_model_lifecycle
+from backend.context_packer import num_ctx_options
+from backend.response_cache import get_response_cache, make_cache_key
+from backend.scheduler import OLLAMA_NUM_PARALLEL, PRIORITY_BATCH
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Config
+# -------------------------------
+# Requests kept in flight at once; the scheduler still caps the server-wide total
+SUMMARY_WORKERS = int(os.environ.get("SUMMARY_WORKERS", OLLAMA_NUM_PARALLEL))
+# Consecutive chunks are packed into one map call up to this many characters
+MAP_MAX_CHARS = int(os.environ.get("SUMMARY_MAP_MAX_CHARS", 4000))
+# Partial summaries are merged in groups up to this many characters per reduce call
+REDUCE_MAX_CHARS = int(os.environ.get("SUMMARY_REDUCE_MAX_CHARS", 6000))
+MAP_MAX_TOKENS = 300
+REDUCE_MAX_TOKENS = 600
+# Bump when the prompts change so stale cached partials are not reused
+PROMPT_VERSION = 1
+
+MAP_PROMPT = (
+    "Summarize the following section of a public policy document. Keep every concrete "
+    "fact: names, numbers, dates, obligations and page or section references. "
+    "Use short bullet points.\n\nSECTION:\n{text}"
+)
+REDUCE_PROMPT = (
+    "The following are summaries of consecutive parts of one public policy document. "
+    "Merge them into a single coherent summary. Remove repetition but keep every "
+    "concrete fact, number and reference.\n\nPART SUMMARIES:\n{text}"
+)
+
+
+def pack_chunks(chunks: List[str], max_chars: int) -> List[str]:
+    """Join consecutive chunks into windows of at most ``max_chars`` (a longer chunk stays alone)."""
+    windows, current, size = [], [], 0
+    for chunk in chunks:
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        if current and size + len(chunk) > max_chars:
+            windows.append("\n".join(current))
+            current, size = [], 0
+        current.append(chunk)
+        size += len(chunk) + 1
+    if current:
+        windows.append("\n".join(current))
+    return windows
+
+
+class MapReduceSummarizer:
+    """
+    Whole-document summarization: every window of chunks is summarized
+    concurrently (map), then the partial summaries are merged level by level
+    until one remains (reduce).
+
+    All calls go through the shared Ollama client and the process-wide
+    scheduler at batch priority, so interactive chat stays responsive.
+    Every partial is cached by (model, stage, text) in the response cache,
+    which makes a re-run cheap.
+    """
+
+    def __init__(self, model: str, client: OllamaClient = None, workers: int = SUMMARY_WORKERS,
+                 map_max_chars: int = MAP_MAX_CHARS, reduce_max_chars: int = REDUCE_MAX_CHARS,
+                 priority: int = PRIORITY_BATCH):
+        self.model = model
+        self.client = client or get_ollama_client()
+        self.workers = max(1, workers)
+        self.map_max_chars = map_max_chars
+        self.reduce_max_chars = reduce_max_chars
+        self.priority = priority
+        self._group: Optional[GenerationGroup] = None
+
+    def _summarize(self, stage: str, text: str, group: GenerationGroup):
+        """Return (summary, cached) for one map or reduce input."""
+        template, max_tokens = (MAP_PROMPT, MAP_MAX_TOKENS) if stage == "map" else (REDUCE_PROMPT, REDUCE_MAX_TOKENS)
+        options = {"temperature": 0, "num_predict": max_tokens, **num_ctx_options()}
+        key = make_cache_key(endpoint="summary", version=PROMPT_VERSION, stage=stage,
+                             model=self.model, options=options, text=text)
+        cache = get_response_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, True
+
+        data = group.generate({
+            "model": self.model,
+            "prompt": template.format(text=text),
+            "stream": False,
+            "keep_alive": get_model_lifecycle(self.client.base_url).keep_alive_for(self.model),
+            "options": options,
+        })
+        summary = data.get("response", "").strip()
+        if data.get("done"):
+            cache.put(key, summary, self.model)
+        return summary, False
+
+    def _run_level(self, stage: str, level: int, inputs: List[str], group: GenerationGroup,
+                   executor: ThreadPoolExecutor, totals: Dict) -> Generator[Dict, None, List[str]]:
+        results: List[Optional[str]] = [None] * len(inputs)
+        futures = {executor.submit(self._summarize, stage, text, group): i for i, text in enumerate(inputs)}
+        done = 0
+        for future in as_completed(futures):
+            i = futures[future]
+            summary, cached = future.result()
+            results[i] = summary
+            done += 1
+            totals["calls"] += 1
+            totals["cached"] += int(cached)
+            yield {"stage": stage, "level": level, "index": i, "done": done,
+                   "total": len(inputs), "summary": summary, "cached": cached}
+        return results
+
+    def iter_summarize(self, chunks: List[str]) -> Generator[Dict, None, None]:
+        """
+        Summarize ``chunks`` and yield progress events as partial results arrive:
+
+        - ``{"stage": "map" | "reduce", "level", "index", "done", "total", "summary", "cached"}``
+          after each partial summary (completion order, not document order)
+        - ``{"stage": "final", "summary", "levels", "calls", "cached"}`` once at the end
+
+        Closing the generator early stops queued work and cancels requests in flight.
+        """
+        group = self._group = self.client.group(priority=self.priority)
+        windows = pack_chunks(chunks, self.map_max_chars)
+        if not windows:
+            yield {"stage": "final", "summary": "", "levels": 0, "calls": 0, "cached": 0}
+            return
+
+        totals = {"calls": 0, "cached": 0}
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="summarize")
+        try:
+            level, stage, inputs = 0, "map", windows
+            while True:
+                results = yield from self._run_level(stage, level, inputs, group, executor, totals)
+                if len(results) <= 1:
+                    break
+                # Hierarchical reduce: merge neighbouring summaries in groups that fit one call
+                level, stage = level + 1, "reduce"
+                inputs = pack_chunks(results, self.reduce_max_chars)
+                if len(inputs) == len(results):
+                    # Every summary is too long to pair up by size; merge them two at a time
+                    inputs = ["\n".join(results[i:i + 2]) for i in range(0, len(results), 2)]
+            logger.info(f"Summarized {len(windows)} windows in {level + 1} levels "
+                        f"({totals['calls']} calls, {totals['cached']} cached)")
+            yield {"stage": "final", "summary": results[0] if results else "", "levels": level + 1, **totals}
+        finally:
+            group.cancel("summarization stopped")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self):
+        """Stop starting new calls and cancel the ones already running."""
+        if self._group is not None:
+            self._group.cancel("summarization stopped")
+
+    def summarize(self, chunks: List[str]) -> str:
+        """Blocking variant of iter_summarize; returns the final summary."""
+        summary = ""
+        for event in self.iter_summarize(chunks):
+            if event["stage"] == "final":
+                summary = event["summary"]
+        return summary
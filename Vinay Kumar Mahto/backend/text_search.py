@@ -8,11 +8,8 @@ class TextSearcher:
         self.text_chunks = text_chunks
         self.full_text = " ".join(text_chunks)
     
-    def search_relevant_chunks(self, query: str, max_chunks: int = 5) -> List[str]:
-        """Find the most relevant text chunks based on the query."""
-        if not query or not self.text_chunks:
-            return self.text_chunks[:max_chunks]
-        
+    def score_chunks(self, query: str) -> List[Tuple[float, int, str]]:
+        """(score, index, chunk) for every chunk, best first."""
         # Score each chunk based on keyword matches and similarity
         chunk_scores = []
         query_lower = query.lower()
@@ -32,9 +29,15 @@ class TextSearcher:
             score = keyword_matches * 2 + similarity
             chunk_scores.append((score, i, chunk))
         
-        # Sort by score and return top chunks
+        # Sort by score, best first
         chunk_scores.sort(key=lambda x: x[0], reverse=True)
-        return [chunk for _, _, chunk in chunk_scores[:max_chunks]]
+        return chunk_scores
+
+    def search_relevant_chunks(self, query: str, max_chunks: int = 5) -> List[str]:
+        """Find the most relevant text chunks based on the query."""
+        if not query or not self.text_chunks:
+            return self.text_chunks[:max_chunks]
+        return [chunk for _, _, chunk in self.score_chunks(query)[:max_chunks]]
     
     def find_text_matches(self, search_term: str) -> List[Tuple[int, str]]:
         """Find exact matches of a search term in chunks."""
@@ -0,0 +1,80 @@
+"""
+Compare embedding throughput (chunks/s): in-process SentenceTransformer vs Ollama /api/embed.
+
+The Ollama backend is measured at several batch sizes and worker counts to
+show what batching and concurrent requests buy. With --fake the Ollama side
+talks to an in-process fake server (benchmarks.fake_ollama) whose per-input
+cost is --fake-embed-ms, which only exercises the client path.
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.bench_embeddings --chunks 512 --ollama-model nomic-embed-text
+    python -m benchmarks.bench_embeddings --chunks 512 --backends ollama --fake
+"""
+import argparse
+import os
+import time
+from typing import List
+
+WORDS = ("the policy requires every institution to publish an annual report covering "
+         "curriculum reform teacher training funding and student outcomes").split()
+
+
+def make_chunks(count: int, words: int) -> List[str]:
+    return [" ".join(WORDS[(i + j) % len(WORDS)] for j in range(words)) + f" ({i})" for i in range(count)]
+
+
+def bench(backend, chunks: List[str]) -> float:
+    backend.embed(chunks[:1])  # load the model outside the timing
+    start = time.perf_counter()
+    vectors = backend.embed(chunks)
+    elapsed = time.perf_counter() - start
+    assert vectors.shape[0] == len(chunks)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--words", type=int, default=150, help="Words per chunk")
+    parser.add_argument("--backends", default="sentence-transformers,ollama", help="Comma-separated")
+    parser.add_argument("--st-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--ollama-model", default="nomic-embed-text")
+    parser.add_argument("--batch-sizes", default="1,16,64")
+    parser.add_argument("--workers", default="1,4")
+    parser.add_argument("--fake", action="store_true", help="Use an in-process fake Ollama")
+    parser.add_argument("--fake-embed-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    fake = None
+    if args.fake:
+        from benchmarks.fake_ollama import FakeOllama, FakeOllamaConfig
+        fake = FakeOllama(FakeOllamaConfig(models=[args.ollama_model], embed_ms=args.fake_embed_ms,
+                                           num_parallel=8)).start()
+        # Read by backend.ollama_client at import time
+        os.environ["OLLAMA_HOST"] = fake.url
+
+    from backend.embeddings import SentenceTransformerBackend, OllamaEmbeddingBackend
+
+    chunks = make_chunks(args.chunks, args.words)
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    try:
+        if "sentence-transformers" in backends:
+            try:
+                elapsed = bench(SentenceTransformerBackend(args.st_model), chunks)
+                print(f"{'sentence-transformers':>24}: {len(chunks) / elapsed:8.1f} chunks/s ({elapsed:.2f}s)")
+            except ImportError as e:
+                print(f"{'sentence-transformers':>24}: skipped ({e})")
+        if "ollama" in backends:
+            for workers in (int(w) for w in args.workers.split(",")):
+                for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+                    backend = OllamaEmbeddingBackend(args.ollama_model, batch_size=batch_size, workers=workers)
+                    elapsed = bench(backend, chunks)
+                    label = f"ollama b={batch_size} w={workers}"
+                    print(f"{label:>24}: {len(chunks) / elapsed:8.1f} chunks/s ({elapsed:.2f}s)")
+    finally:
+        if fake is not None:
+            fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Measure the cross-session ingestion cache: N users uploading the same PDF at once.
+
+Each simulated user runs the main app's pipeline (extract_pdf_text, chunking,
+chunk locations, TextSearcher) on a generated --pages page PDF, either on
+its own or through backend.ingest_cache. Per-page extraction checkpoints go to
+a fresh temporary directory per run, so the uncached run does the real work.
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.bench_ingest --pages 200 --users 8
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import fitz
+
+from backend.chunker import TextChunker
+from backend.context_packer import chunk_locations, find_sections
+from backend.ingest_cache import IngestCache, ingest_key, config_key
+from backend.pdf_loader import extract_pdf_text
+from backend.text_search import TextSearcher
+
+WORDS = ("the policy requires every institution to publish an annual report covering "
+         "curriculum reform teacher training funding and student outcomes").split()
+
+
+def make_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        lines = [f"Section {p + 1}. " + " ".join(WORDS[(p + i + j) % len(WORDS)] for j in range(12))
+                 for i in range(45)]
+        page.insert_text((36, 48), "\n".join(lines), fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def ingest(data: bytes, work_dir: str) -> dict:
+    """The main app's extract + chunk + index steps for one upload."""
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    try:
+        stats = {}
+        text = extract_pdf_text(path, work_dir=work_dir, stats=stats)
+    finally:
+        os.remove(path)
+    chunker = TextChunker(chunk_size=1000, overlap=200)
+    chunks = chunker.chunk_text(text)
+    return {
+        "text": text,
+        "chunks": chunks,
+        "locations": chunk_locations(chunker.chunk_spans(text), stats.get("page_offsets", []), find_sections(text)),
+        "searcher": TextSearcher(chunks),
+    }
+
+
+def run_users(users: int, upload) -> float:
+    threads = [threading.Thread(target=upload) for _ in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--budget-mb", type=float, default=64)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    data = make_pdf(args.pages)
+    print(f"PDF: {args.pages} pages, {len(data) / 1e6:.1f} MB; {args.users} concurrent uploads")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        builds = []
+        # Uncached: every session extracts on its own (they share only the disk checkpoints)
+        elapsed = run_users(args.users, lambda: builds.append(ingest(data, work_dir)))
+        print(f"  {'per session':>12}: {elapsed:6.2f}s wall, {len(builds)} pipeline runs")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_ingest_")
+    cache = IngestCache(budget_mb=args.budget_mb)
+    builds, leases = [], []
+
+    def build():
+        builds.append(1)
+        return ingest(data, work_dir)
+
+    def upload():
+        key = config_key(ingest_key(data, stage="extract", dpi=300), stage="chunks", chunk_size=1000, overlap=200)
+        leases.append(cache.open(key, build))
+
+    try:
+        elapsed = run_users(args.users, upload)
+        print(f"  {'shared':>12}: {elapsed:6.2f}s wall, {len(builds)} pipeline run(s), {cache.stats()}")
+        start = time.perf_counter()
+        upload()
+        print(f"  {'later upload':>12}: {(time.perf_counter() - start) * 1000:6.2f} ms (cache hit)")
+        leases.clear()
+        print(f"  {'all closed':>12}: {cache.stats()}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
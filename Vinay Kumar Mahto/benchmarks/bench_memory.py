@@ -0,0 +1,87 @@
+"""
+Measure conversation memory on a long chat: full history vs rolling summary plus recent turns.
+
+Runs --turns question/answer turns against the fake Ollama server, which
+charges prompt-eval time per prompt token (--prompt-tokens-per-s). Each
+follow-up is sent either with the whole history or with
+backend.conversation_memory (summaries are made in the background by the
+same server). Reports prompt size and latency of the last turns and the
+size of the history kept in the session.
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.bench_memory --turns 40 --answer-tokens 150
+"""
+import argparse
+import logging
+import statistics
+import sys
+import time
+
+from backend.context_packer import estimate_tokens
+from backend.conversation_memory import ConversationMemory
+from backend.ingest_cache import estimate_size
+from backend.ollama_client import OllamaClient
+from benchmarks.fake_ollama import FakeOllama, FakeOllamaConfig
+
+MODEL = "llama3"
+SYSTEM = {"role": "system", "content": "You are a helpful AI assistant that answers based on document content."}
+
+
+def ask(client: OllamaClient, history: list, question: str) -> tuple:
+    messages = [SYSTEM, *history, {"role": "user", "content": question}]
+    start = time.perf_counter()
+    response = client.post("/api/chat", json={"model": MODEL, "messages": messages, "stream": False}, timeout=120)
+    response.raise_for_status()
+    reply = response.json()["message"]["content"]
+    tokens = sum(estimate_tokens(m["content"]) for m in messages)
+    return reply, tokens, time.perf_counter() - start
+
+
+def run(client: OllamaClient, turns: int, memory: ConversationMemory = None):
+    history, sizes, latencies = [], [], []
+    for turn in range(turns):
+        question = f"Follow-up {turn}: what does the policy say about teacher training in section {turn}?"
+        reply, tokens, elapsed = ask(client, history if memory is None else memory.messages(), question)
+        sizes.append(tokens)
+        latencies.append(elapsed)
+        turn_messages = [{"role": "user", "content": question}, {"role": "assistant", "content": reply}]
+        if memory is not None:
+            memory.extend(turn_messages)
+        else:
+            history.extend(turn_messages)
+    if memory is not None:
+        memory.wait(30)
+        history = [memory.summary, memory.turns]
+    return sizes, latencies, estimate_size(history)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--answer-tokens", type=int, default=150)
+    parser.add_argument("--prompt-tokens-per-s", type=float, default=10000)
+    parser.add_argument("--budget", type=int, default=1024, help="Memory token budget")
+    parser.add_argument("--recent-turns", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    config = FakeOllamaConfig(ttft=0.01, tokens_per_s=10 ** 6, tokens=args.answer_tokens,
+                              prompt_tokens_per_s=args.prompt_tokens_per_s, num_parallel=2, seed=0)
+    with FakeOllama(config) as fake:
+        client = OllamaClient(base_url=fake.url)
+        memory = ConversationMemory(model=MODEL, client=client, token_budget=args.budget,
+                                    recent_turns=args.recent_turns)
+        tail = max(1, args.turns // 10)
+        print(f"{args.turns} turns, {args.answer_tokens}-token answers, "
+              f"prompt eval at {args.prompt_tokens_per_s:.0f} tok/s; last {tail} turns:")
+        for name, mem in (("full history", None), ("memory", memory)):
+            sizes, latencies, held = run(client, args.turns, mem)
+            print(f"  {name:>12}: prompt {statistics.mean(sizes[-tail:]):7.0f} tokens (max {max(sizes)}), "
+                  f"{statistics.mean(latencies[-tail:]) * 1000:7.1f} ms per turn, {held / 1e3:7.1f} KB kept")
+        memory.wait(30)
+        print(f"  memory stats: {memory.stats()}, {memory.tokens()} tokens held")
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Measure client-side parse overhead per streamed token: the old per-line
+``iter_lines`` + ``json.loads`` loop vs backend.ollama_stream (incremental
+NDJSON over raw chunks, with orjson when it is installed).
+
+Both paths read the same synthetic /api/generate stream through
+``requests.Response`` machinery, delivered either one token per network
+chunk (how Ollama flushes) or in large reads (a backlog after a stall).
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.bench_ndjson --tokens 20000
+"""
+import argparse
+import json
+import time
+from typing import Callable, Iterator, List
+
+import requests
+
+from backend import ollama_stream
+from backend.ollama_stream import OllamaStream
+
+WORDS = "the policy requires every institution to publish an annual report on teacher training".split()
+
+
+def make_lines(tokens: int) -> List[bytes]:
+    lines = []
+    for i in range(tokens):
+        lines.append(json.dumps({"model": "llama3", "created_at": "2024-01-01T00:00:00.000000Z",
+                                 "response": " " + WORDS[i % len(WORDS)], "done": False}).encode() + b"\n")
+    lines.append(json.dumps({"model": "llama3", "created_at": "2024-01-01T00:00:00.000000Z", "response": "",
+                             "done": True, "done_reason": "stop", "total_duration": 10 ** 9,
+                             "prompt_eval_count": 100, "prompt_eval_duration": 10 ** 8,
+                             "eval_count": tokens, "eval_duration": 9 * 10 ** 8}).encode() + b"\n")
+    return lines
+
+
+def fake_response(chunks: List[bytes]) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.encoding = "utf-8"
+
+    def iter_content(chunk_size=1, decode_unicode=False) -> Iterator:
+        for chunk in chunks:
+            yield chunk.decode("utf-8") if decode_unicode else chunk
+
+    response.iter_content = iter_content
+    return response
+
+
+def legacy_parse(response: requests.Response) -> str:
+    """The loop the chatbots used before: iter_lines, strip, json.loads, key probing."""
+    full = ""
+    for raw_line in response.iter_lines(decode_unicode=True):
+        if not raw_line:
+            continue
+        try:
+            json_line = json.loads(raw_line.strip())
+            if "response" in json_line:
+                full += json_line["response"]
+            if "error" in json_line:
+                break
+        except Exception:
+            continue
+    return full
+
+
+def stream_parse(response: requests.Response) -> str:
+    stream = OllamaStream(response)
+    for _ in stream:
+        pass
+    return stream.text
+
+
+def bench(parse: Callable[[requests.Response], str], chunks: List[bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        response = fake_response(chunks)
+        start = time.perf_counter()
+        parse(response)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lines = make_lines(args.tokens)
+    blob = b"".join(lines)
+    layouts = {
+        "token per chunk": lines,
+        "64 KiB reads": [blob[i:i + 65536] for i in range(0, len(blob), 65536)],
+    }
+    assert legacy_parse(fake_response(lines)) == stream_parse(fake_response(layouts["64 KiB reads"]))
+
+    orjson = ollama_stream.orjson
+    for layout, chunks in layouts.items():
+        print(f"{layout} ({args.tokens} tokens):")
+        legacy = bench(legacy_parse, chunks, args.repeat)
+        print(f"  {'iter_lines + json':>22}: {legacy / args.tokens * 1e6:6.2f} us/token")
+        ollama_stream.loads = ollama_stream.json_loads
+        stdlib = bench(stream_parse, chunks, args.repeat)
+        print(f"  {'OllamaStream + json':>22}: {stdlib / args.tokens * 1e6:6.2f} us/token "
+              f"({legacy / stdlib:.1f}x)")
+        if orjson is not None:
+            ollama_stream.loads = orjson.loads
+            fast = bench(stream_parse, chunks, args.repeat)
+            print(f"  {'OllamaStream + orjson':>22}: {fast / args.tokens * 1e6:6.2f} us/token "
+                  f"({legacy / fast:.1f}x)")
+        else:
+            print(f"  {'OllamaStream + orjson':>22}: skipped (pip install orjson)")
+    ollama_stream.loads = orjson.loads if orjson is not None else ollama_stream.json_loads
+
+
+if __name__ == "__main__":
+    main()
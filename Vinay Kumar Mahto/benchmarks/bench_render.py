@@ -0,0 +1,58 @@
+"""
+Compare page rendering for OCR: PyMuPDF pixmaps vs pdf2image (pdftoppm).
+
+Both paths stop at a grayscale ndarray ready for OpenCV preprocessing, so the
+numbers isolate rendering, subprocess and decode overhead from OCR itself.
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.bench_render temp_files/NEP_Final_English_01.pdf --pages 10 --dpi 300
+"""
+import argparse
+import time
+
+import cv2
+import fitz
+import numpy as np
+from pdf2image import convert_from_path
+
+from backend.ocr import pixmap_to_array
+
+
+def bench_pdf2image(pdf_path: str, pages: int, dpi: int) -> float:
+    start = time.perf_counter()
+    for page_num in range(1, pages + 1):
+        img = convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num)[0]
+        cv2.cvtColor(np.array(img), cv2.COLOR_RGB2GRAY)
+    return time.perf_counter() - start
+
+
+def bench_pymupdf(pdf_path: str, pages: int, dpi: int) -> float:
+    start = time.perf_counter()
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(pages):
+            pix = doc.load_page(page_num).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            pixmap_to_array(pix)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pdf_path")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+
+    with fitz.open(args.pdf_path) as doc:
+        pages = min(args.pages, len(doc))
+
+    results = {
+        "pdf2image": bench_pdf2image(args.pdf_path, pages, args.dpi),
+        "pymupdf": bench_pymupdf(args.pdf_path, pages, args.dpi),
+    }
+    for name, elapsed in results.items():
+        print(f"{name:>10}: {elapsed:8.2f}s total, {elapsed / pages * 1000:8.1f} ms/page ({pages} pages @ {args.dpi} DPI)")
+    print(f"speedup: {results['pdf2image'] / results['pymupdf']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compare answer latency with every question on the large model vs routed by backend.model_router.
+
+A mixed set of lookup and synthesis questions is asked through
+OllamaPDFChatbot.stream_response against an in-process fake Ollama in which
+the small model is --speedup times faster. The routed run reports how many
+synthesis questions still reached the large model, and the tokens/s the
+router learned per model.
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.bench_router --speedup 4 --tokens 120
+"""
+import argparse
+import os
+import time
+from typing import Dict, List
+
+from benchmarks.load_test import percentile
+
+SECTIONS = [
+    "Section 1. Every school must appoint a designated safeguarding lead by 1 September.",
+    "Section 2. Teacher training budgets rise by 4 percent a year until 2027, funded by the ministry.",
+    "Section 3. Class sizes in primary schools are capped at 30 pupils per teacher.",
+    "Section 4. Annual reports on student outcomes are published on the school website each July.",
+    "Section 5. Curriculum reform introduces coding from year 3 and financial literacy from year 7.",
+    "Section 6. Inspections happen every four years, or sooner after a complaint to the regulator.",
+    "Section 7. Funding for rural schools is weighted by distance to the nearest town.",
+    "Section 8. Parents may appeal admission decisions within 20 school days.",
+]
+
+# (question, is synthesis)
+QUESTIONS = [
+    ("When must the safeguarding lead be appointed?", False),
+    ("What is the class size cap?", False),
+    ("How many days do parents have to appeal?", False),
+    ("Where are annual reports published?", False),
+    ("Which year does coding start?", False),
+    ("How often are inspections?", False),
+    ("Explain how the funding changes for teacher training and rural schools interact, and compare "
+     "their likely effect on student outcomes in detail.", True),
+    ("Summarize the overall approach of the policy to accountability, covering inspections, reports "
+     "and appeals, and discuss the implications for school leaders.", True),
+    ("Why might the curriculum reform and the class size cap be in tension? Analyze the trade-offs "
+     "for primary schools step by step.", True),
+]
+
+
+def run(chatbot, questions, route: bool, large: str) -> List[Dict]:
+    from backend.text_search import TextSearcher
+    from backend.context_packer import estimate_tokens
+
+    searcher = TextSearcher(SECTIONS)
+    context = "\n\n".join(SECTIONS)
+    results = []
+    for question, hard in questions:
+        model = large
+        if route:
+            decision = chatbot.router.route(question, scores=[s for s, _, _ in searcher.score_chunks(question)],
+                                            prompt_tokens=estimate_tokens(context + question))
+            model = decision.model if decision else large
+        start = time.perf_counter()
+        for _ in chatbot.stream_response(question, context=context, model=model):
+            pass
+        results.append({"hard": hard, "model": model, "latency": time.perf_counter() - start})
+    return results
+
+
+def report(name: str, results: List[Dict], large: str):
+    latencies = [r["latency"] for r in results]
+    hard = [r for r in results if r["hard"]]
+    easy = [r for r in results if not r["hard"]]
+    print(f"{name:>12}: mean {sum(latencies) / len(latencies):6.2f}s  p95 {percentile(latencies, 95):6.2f}s  "
+          f"synthesis on {large}: {sum(r['model'] == large for r in hard)}/{len(hard)}  "
+          f"lookups on {large}: {sum(r['model'] == large for r in easy)}/{len(easy)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--small", default="gemma3:1b")
+    parser.add_argument("--large", default="llama3.1:8b")
+    parser.add_argument("--speedup", type=float, default=4.0, help="How much faster the small model is")
+    parser.add_argument("--tokens-per-s", type=float, default=30.0, help="Large model speed")
+    parser.add_argument("--tokens", type=int, default=120, help="Answer length")
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over the question set")
+    parser.add_argument("--slo", type=float, default=30.0, help="Latency SLO in seconds for both models")
+    args = parser.parse_args()
+
+    from benchmarks.fake_ollama import FakeOllama, FakeOllamaConfig
+    fake = FakeOllama(FakeOllamaConfig(models=[args.small, args.large], ttft=0.1,
+                                       tokens_per_s=args.tokens_per_s, tokens=args.tokens,
+                                       model_speed={args.small: args.speedup}, seed=0)).start()
+    # Read by backend.ollama_client at import time
+    os.environ["OLLAMA_HOST"] = fake.url
+
+    import streamlit as st
+    from backend.ollama_chatbot import OllamaPDFChatbot, RateLimiter
+    from backend.session_manager import SessionManager
+    from backend.model_router import ModelRouter
+
+    SessionManager.initialize_session_state()
+    st.session_state.rate_limiter = RateLimiter(max_requests=10 ** 9)
+    chatbot = OllamaPDFChatbot()
+    chatbot.router = ModelRouter(models=[args.small, args.large],
+                                 slos={args.small: args.slo, args.large: args.slo}, base_url=chatbot.base_url)
+    questions = QUESTIONS * args.rounds
+    try:
+        report("large only", run(chatbot, questions, False, args.large), args.large)
+        report("routed", run(chatbot, questions, True, args.large), args.large)
+    finally:
+        fake.stop()
+    for model in (args.small, args.large):
+        speed = chatbot.router.speeds(model)
+        print(f"  learned {model}: {speed['tokens_per_s']:.1f} tok/s over {speed['samples']} answers")
+
+
+if __name__ == "__main__":
+    main()
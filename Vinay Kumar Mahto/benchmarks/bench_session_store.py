@@ -0,0 +1,124 @@
+"""
+Measure persistent chat sessions: memory and reload time against the number of historical sessions.
+
+For each --sessions count, one browser accumulates that many sessions of
+--messages messages on a shared --pages page document. The in-memory layout
+(every session's messages and document in session_state, as before the
+session store) is compared with backend.session_store: the memory a
+reloaded browser holds, the time to restore it after a refresh, and the
+time to render the sidebar. The store is a fresh SQLite file per run.
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.bench_session_store --sessions 10 100 1000 --messages 40
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import streamlit as st
+
+WORDS = ("the policy requires every institution to publish an annual report covering "
+         "curriculum reform teacher training funding and student outcomes").split()
+
+
+def make_pages(pages: int, words: int = 300) -> dict:
+    return {f"Page {p + 1}": " ".join(WORDS[(p + i) % len(WORDS)] for i in range(words)) for p in range(pages)}
+
+
+def make_messages(n: int) -> list:
+    return [{"role": "user" if i % 2 == 0 else "assistant",
+             "content": f"message {i} " + " ".join(WORDS[(i + j) % len(WORDS)] for j in range(60))}
+            for i in range(n)]
+
+
+def reset():
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+
+
+def sidebar(sessions: dict) -> list:
+    """The 3rd milestone's sidebar labels."""
+    labels = []
+    for name in list(sessions)[-5:]:
+        meta = sessions[name]
+        count = meta["message_count"] if "message_count" in meta else len(meta["messages"])
+        labels.append(f"{name} ({count} messages)")
+    return labels
+
+
+def in_memory(sessions: int, messages: int, pages: dict):
+    """Every session held in session_state, each with its own copy of the messages and document."""
+    reset()
+    tracemalloc.start()
+    st.session_state.chat_sessions = {
+        f"session_{i}": {"messages": make_messages(messages), "pdf_name": "policy.pdf",
+                         "pdf_text": {key: "".join(text) for key, text in pages.items()}}
+        for i in range(sessions)
+    }
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    sidebar(st.session_state.chat_sessions)
+    # A refresh loses every session
+    return held, None, time.perf_counter() - start
+
+
+def persisted(sessions: int, messages: int, pages: dict, SessionManager, owner: str):
+    reset()
+    st.query_params["sid"] = owner
+    SessionManager.initialize_session_state()
+    st.session_state.pdf_text = dict(pages)
+    st.session_state.pdf_name = "policy.pdf"
+    for i in range(sessions):
+        SessionManager.create_chat_session(f"session_{i}")
+        st.session_state.messages = make_messages(messages)
+        SessionManager.save_current_session()
+
+    # Refresh: a new Streamlit session for the same browser
+    reset()
+    st.query_params["sid"] = owner
+    tracemalloc.start()
+    start = time.perf_counter()
+    SessionManager.initialize_session_state()
+    reload = time.perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    sidebar(st.session_state.chat_sessions)
+    return held, reload, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--messages", type=int, default=40, help="Messages per session")
+    parser.add_argument("--pages", type=int, default=50)
+    args = parser.parse_args()
+    # Bare-mode session_state access logs a warning per call, which would swamp the timings
+    logging.disable(logging.WARNING)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_session_store_")
+    # Read by backend.session_store at import time
+    os.environ["POLICYNAV_SESSION_DB"] = os.path.join(work_dir, "sessions.sqlite3")
+    from backend.session_manager import SessionManager
+
+    pages = make_pages(args.pages)
+    print(f"{args.messages} messages per session, {args.pages}-page document")
+    try:
+        for n in args.sessions:
+            for name, run in (("in memory", lambda: in_memory(n, args.messages, pages)),
+                              ("sqlite", lambda: persisted(n, args.messages, pages, SessionManager, f"bench{n}"))):
+                held, reload, render = run()
+                reload = "lost" if reload is None else f"{reload * 1000:.2f} ms"
+                print(f"  {n:5d} sessions {name:>9}: {held / 1e6:8.2f} MB held, "
+                      f"reload {reload:>9}, sidebar {render * 1000:6.3f} ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Measure chat-session bookkeeping: the old deepcopy of pdf_text and messages vs shared documents.
+
+Simulates the 3rd milestone's pattern of calling save_current_session after
+every message, on a synthetic document of --pages pages. Then the same PDF
+is uploaded again into --sessions new sessions (fresh extraction, equal
+content) and the memory the sessions hold is reported.
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.bench_sessions --pages 500 --turns 50 --sessions 5
+"""
+import argparse
+import copy
+import logging
+import time
+import tracemalloc
+
+import streamlit as st
+
+from backend.session_manager import SessionManager
+
+WORDS = ("the policy requires every institution to publish an annual report covering "
+         "curriculum reform teacher training funding and student outcomes").split()
+
+
+def make_pages(pages: int, words: int) -> dict:
+    return {f"Page {p + 1}": " ".join(WORDS[(p + i) % len(WORDS)] for i in range(words)) for p in range(pages)}
+
+
+def legacy_save():
+    """save_current_session as it was: deep copies of messages and the whole document."""
+    st.session_state.chat_sessions[st.session_state.current_session].update({
+        "messages": copy.deepcopy(st.session_state.messages),
+        "pdf_name": st.session_state.pdf_name,
+        "pdf_text": copy.deepcopy(st.session_state.pdf_text)
+    })
+
+
+def legacy_create(name: str):
+    st.session_state.chat_sessions[name] = {"messages": [], "pdf_name": st.session_state.pdf_name,
+                                            "pdf_text": copy.deepcopy(st.session_state.pdf_text)}
+
+
+def reset(pages: dict):
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    SessionManager.initialize_session_state()
+    st.session_state.pdf_text = dict(pages)
+    st.session_state.pdf_name = "policy.pdf"
+
+
+def run(save, create, pages: dict, turns: int, sessions: int):
+    reset(pages)
+    start = time.perf_counter()
+    for turn in range(turns):
+        st.session_state.messages.append({"role": "user", "content": f"question {turn}"})
+        save()
+        st.session_state.messages.append({"role": "assistant", "content": f"answer {turn} " * 50})
+        save()
+    per_save = (time.perf_counter() - start) / (2 * turns)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(sessions):
+        create(f"extra_{i}")
+        # A re-upload extracts new string objects with the same content
+        st.session_state.pdf_text = {key: "".join(text) for key, text in pages.items()}
+        save()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return per_save, held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--words", type=int, default=400, help="Words per page")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=5)
+    args = parser.parse_args()
+    # Bare-mode session_state access logs a warning per call, which would swamp the timings
+    logging.disable(logging.WARNING)
+
+    pages = make_pages(args.pages, args.words)
+    size_mb = sum(len(t) for t in pages.values()) / 1e6
+    print(f"document: {args.pages} pages, {size_mb:.1f} MB of text; {args.turns} turns, {args.sessions} sessions")
+    for name, save, create in (
+        ("deepcopy", legacy_save, legacy_create),
+        ("shared", SessionManager.save_current_session, SessionManager.create_chat_session),
+    ):
+        per_save, held = run(save, create, pages, args.turns, args.sessions)
+        print(f"  {name:>9}: {per_save * 1000:8.3f} ms per save, {held / 1e6:7.2f} MB for {args.sessions} re-uploads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare per-token re-rendering of a streamed answer with throttled rendering.
+
+Each render builds and serializes the same ForwardMsg that ``placeholder.markdown``
+sends to the browser, with the chat-bubble HTML around the whole answer so far,
+so the numbers reflect the O(n^2) bytes a long answer pushes over the websocket.
+Tokens arrive on a fixed schedule like a real generation; time-to-last-token is
+measured from the first token until the final render returns.
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.bench_stream_render --tokens 2000 --tokens-per-s 60
+    python -m benchmarks.bench_stream_render --tokens 4000 --tokens-per-s 0   # as fast as possible
+"""
+import argparse
+import time
+from typing import Callable, Dict, Iterator, List
+
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from backend.stream_render import FLUSH_INTERVAL, FLUSH_TOKENS, render_stream
+
+WORDS = ("the policy requires every institution to publish its annual report on "
+         "curriculum reform, teacher training and funding by section 4.2 ").split()
+
+
+def make_tokens(count: int) -> List[str]:
+    return [(" " if i else "") + WORDS[i % len(WORDS)] for i in range(count)]
+
+
+def token_stream(tokens: List[str], tokens_per_s: float) -> Iterator[str]:
+    """Yield tokens no earlier than a generation at ``tokens_per_s`` would produce them."""
+    start = time.perf_counter()
+    for i, token in enumerate(tokens):
+        if tokens_per_s > 0:
+            due = start + i / tokens_per_s
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield token
+
+
+def make_render(stats: Dict) -> Callable[[str], None]:
+    def render(text: str):
+        msg = ForwardMsg()
+        markdown = msg.delta.new_element.markdown
+        markdown.body = f'<div class="chat-message assistant-message"><strong>🤖 Assistant:</strong><br>{text}▌</div>'
+        markdown.allow_html = True
+        stats["bytes"] += len(msg.SerializeToString())
+        stats["renders"] += 1
+    return render
+
+
+def bench_per_token(tokens: List[str], tokens_per_s: float) -> Dict:
+    stats = {"renders": 0, "bytes": 0}
+    render = make_render(stats)
+    cpu, wall = time.process_time(), time.perf_counter()
+    text = ""
+    for token in token_stream(tokens, tokens_per_s):
+        text += token
+        render(text)
+    render(text)
+    return {**stats, "cpu_s": time.process_time() - cpu, "ttlt_s": time.perf_counter() - wall}
+
+
+def bench_throttled(tokens: List[str], tokens_per_s: float, interval: float, max_tokens: int) -> Dict:
+    stats = {"renders": 0, "bytes": 0}
+    render = make_render(stats)
+    cpu, wall = time.process_time(), time.perf_counter()
+    render_stream(token_stream(tokens, tokens_per_s), render, interval=interval, max_tokens=max_tokens)
+    return {**stats, "cpu_s": time.process_time() - cpu, "ttlt_s": time.perf_counter() - wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--tokens-per-s", type=float, default=60.0, help="0 = no pacing")
+    parser.add_argument("--interval", type=float, default=FLUSH_INTERVAL)
+    parser.add_argument("--max-tokens", type=int, default=FLUSH_TOKENS)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    generation_s = args.tokens / args.tokens_per_s if args.tokens_per_s > 0 else 0.0
+    results = {
+        "per-token": bench_per_token(tokens, args.tokens_per_s),
+        "throttled": bench_throttled(tokens, args.tokens_per_s, args.interval, args.max_tokens),
+    }
+    print(f"{args.tokens} tokens, generation takes {generation_s:.2f}s")
+    for name, r in results.items():
+        print(f"{name:>10}: {r['renders']:6d} renders, {r['bytes'] / 1e6:8.1f} MB sent, "
+              f"{r['cpu_s']:7.3f}s CPU, time-to-last-token {r['ttlt_s']:7.3f}s")
+    print(f"CPU: {results['per-token']['cpu_s'] / max(results['throttled']['cpu_s'], 1e-9):.1f}x less, "
+          f"bytes: {results['per-token']['bytes'] / max(results['throttled']['bytes'], 1):.1f}x less")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Stand-in Ollama server for performance work without a real model.
+
+Implements /api/tags, /api/ps, /api/version, /api/generate and /api/chat
+(streaming NDJSON and blocking) and /api/embed (plus the legacy
+/api/embeddings). Time to first token, generation speed, answer length,
+injected errors and the server's own parallelism and queue limits are all
+configurable, and the final ``done`` chunk carries Ollama-style timing stats.
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.fake_ollama --port 11435 --ttft 0.3 --tokens-per-s 40 --num-parallel 2
+    OLLAMA_HOST=http://localhost:11435 streamlit run app.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List
+
+WORDS = ("the policy requires every institution to publish an annual report covering "
+         "curriculum reform teacher training funding and student outcomes as set out in section").split()
+
+
+class FakeOllamaConfig:
+    def __init__(self, models: List[str] = None, ttft: float = 0.2, prompt_tokens_per_s: float = 0.0,
+                 tokens_per_s: float = 50.0, tokens: int = 200, jitter: float = 0.0, error_rate: float = 0.0,
+                 num_parallel: int = 1, max_queue: int = 512, load_time: float = 0.0,
+                 embed_dim: int = 384, embed_ms: float = 5.0, model_speed: Dict[str, float] = None,
+                 seed: int = None):
+        """
+        :param ttft: Seconds before the first token (model already loaded)
+        :param prompt_tokens_per_s: Extra prompt-eval time per prompt token (0 = ignore prompt length)
+        :param tokens_per_s: Generation speed of one request
+        :param tokens: Answer length, capped by the request's num_predict
+        :param jitter: Relative random variation of ttft and token interval
+        :param error_rate: Fraction of generations that fail with HTTP 500
+        :param num_parallel: Requests processed at once, like OLLAMA_NUM_PARALLEL
+        :param max_queue: Waiting requests beyond this get HTTP 503, like OLLAMA_MAX_QUEUE
+        :param load_time: Added once per model to the first request, like a cold load
+        :param embed_ms: Milliseconds per embedded input
+        :param model_speed: Per-model speed factor for ttft, prompt eval and generation,
+            e.g. {"gemma3:1b": 4.0} makes that model four times faster than the rest
+        """
+        self.models = models or ["llama3", "gemma3:1b", "nomic-embed-text"]
+        self.ttft = ttft
+        self.prompt_tokens_per_s = prompt_tokens_per_s
+        self.tokens_per_s = tokens_per_s
+        self.tokens = tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.num_parallel = max(1, num_parallel)
+        self.max_queue = max_queue
+        self.load_time = load_time
+        self.embed_dim = embed_dim
+        self.embed_ms = embed_ms
+        self.model_speed = model_speed or {}
+        self.random = random.Random(seed)
+
+
+class FakeOllama:
+    """A fake Ollama server on a background thread; ``port=0`` picks a free port."""
+
+    def __init__(self, config: FakeOllamaConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeOllamaConfig()
+        self._slots = threading.Semaphore(self.config.num_parallel)
+        self._lock = threading.Lock()
+        self._loaded = set()
+        self.stats = {"requests": 0, "generations": 0, "errors": 0, "rejected": 0,
+                      "tokens": 0, "waiting": 0, "running": 0, "peak_running": 0, "peak_waiting": 0}
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key: str, delta: int = 1):
+        with self._lock:
+            self.stats[key] += delta
+            if key in ("running", "waiting"):
+                peak = f"peak_{key}"
+                self.stats[peak] = max(self.stats[peak], self.stats[key])
+
+    def _vary(self, value: float) -> float:
+        jitter = self.config.jitter
+        return value * (1 + self.config.random.uniform(-jitter, jitter)) if jitter else value
+
+    def embed(self, text: str) -> List[float]:
+        """Deterministic unit vector for ``text``, so identical inputs embed identically."""
+        dim = self.config.embed_dim
+        values, counter = [], 0
+        while len(values) < dim:
+            digest = hashlib.sha256(f"{counter}\0{text}".encode("utf-8")).digest()
+            values.extend(b / 127.5 - 1.0 for b in digest)
+            counter += 1
+        values = values[:dim]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    def load(self, model: str) -> float:
+        """Sleep for the cold-load time the first time ``model`` is used; returns the seconds slept."""
+        with self._lock:
+            cold = model not in self._loaded
+            self._loaded.add(model)
+        if cold and self.config.load_time:
+            time.sleep(self.config.load_time)
+            return self.config.load_time
+        return 0.0
+
+    def generate_tokens(self, model: str, prompt_tokens: int, num_predict: int) -> Iterator[str]:
+        """Sleep like a model would and yield the answer token by token."""
+        config = self.config
+        self.load(model)
+        speed = config.model_speed.get(model, 1.0)
+        delay = self._vary(config.ttft)
+        if config.prompt_tokens_per_s > 0:
+            delay += prompt_tokens / config.prompt_tokens_per_s
+        time.sleep(delay / speed)
+        count = config.tokens if num_predict is None or num_predict < 0 else min(config.tokens, num_predict)
+        interval = 1.0 / (config.tokens_per_s * speed) if config.tokens_per_s > 0 else 0.0
+        for i in range(count):
+            if i and interval:
+                time.sleep(self._vary(interval))
+            yield ("" if i == 0 else " ") + WORDS[i % len(WORDS)]
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Like Go's net/http; otherwise headers and body in separate writes hit delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, body: Dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _read_body(self) -> Dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                return json.loads(raw or b"{}")
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                fake._count("requests")
+                if self.path == "/api/tags":
+                    self._json(200, {"models": [{"name": m, "model": m, "size": 0} for m in fake.config.models]})
+                elif self.path == "/api/ps":
+                    self._json(200, {"models": [{"name": m, "model": m} for m in sorted(fake._loaded)]})
+                elif self.path == "/api/version":
+                    self._json(200, {"version": "0.0.0-fake"})
+                elif self.path == "/":
+                    self._json(200, {"status": "Ollama is running"})
+                else:
+                    self._json(404, {"error": "not found"})
+
+            def do_POST(self):
+                fake._count("requests")
+                try:
+                    body = self._read_body()
+                except ValueError as e:
+                    self._json(400, {"error": f"invalid JSON: {e}"})
+                    return
+                if self.path in ("/api/generate", "/api/chat"):
+                    self._generate(body, chat=self.path == "/api/chat")
+                elif self.path in ("/api/embed", "/api/embeddings"):
+                    self._embed(body, legacy=self.path == "/api/embeddings")
+                else:
+                    self._json(404, {"error": "not found"})
+
+            def _embed(self, body: Dict, legacy: bool):
+                inputs = body.get("prompt", "") if legacy else body.get("input", "")
+                inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+                start = time.perf_counter()
+                time.sleep(fake.config.embed_ms / 1000 * len(inputs))
+                vectors = [fake.embed(text) for text in inputs]
+                if legacy:
+                    self._json(200, {"embedding": vectors[0] if vectors else []})
+                    return
+                self._json(200, {"model": body.get("model", ""), "embeddings": vectors,
+                                 "total_duration": int((time.perf_counter() - start) * 1e9),
+                                 "prompt_eval_count": sum(len(t.split()) for t in inputs)})
+
+            def _generate(self, body: Dict, chat: bool):
+                model = body.get("model", "")
+                if chat:
+                    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages") or [])
+                else:
+                    prompt = f"{body.get('system', '')} {body.get('prompt', '')}"
+                # An empty prompt only loads the model, as in Ollama
+                if not chat and not body.get("prompt") and not body.get("system"):
+                    load_s = fake.load(model)
+                    self._json(200, {"model": model, "response": "", "done": True, "done_reason": "load",
+                                     "load_duration": int(load_s * 1e9)})
+                    return
+
+                with fake._lock:
+                    if fake.stats["waiting"] >= fake.config.max_queue:
+                        fake.stats["rejected"] += 1
+                        reject = True
+                    else:
+                        reject = False
+                if reject:
+                    self._json(503, {"error": "server busy, please try again.  maximum pending requests exceeded"})
+                    return
+
+                fake._count("waiting")
+                fake._slots.acquire()
+                fake._count("waiting", -1)
+                fake._count("running")
+                try:
+                    if fake.config.error_rate and fake.config.random.random() < fake.config.error_rate:
+                        fake._count("errors")
+                        self._json(500, {"error": "injected failure"})
+                        return
+                    fake._count("generations")
+                    self._respond(body, model, prompt, chat)
+                finally:
+                    fake._count("running", -1)
+                    fake._slots.release()
+
+            def _respond(self, body: Dict, model: str, prompt: str, chat: bool):
+                prompt_tokens = max(1, len(prompt) // 4)
+                num_predict = (body.get("options") or {}).get("num_predict")
+                stream = body.get("stream", True)
+                start = time.perf_counter()
+                first = None
+                tokens = []
+
+                def chunk(token: str, done: bool) -> Dict:
+                    out = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+                    if chat:
+                        out["message"] = {"role": "assistant", "content": token}
+                    else:
+                        out["response"] = token
+                    return out
+
+                if stream:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+
+                def write(obj: Dict):
+                    data = json.dumps(obj).encode("utf-8") + b"\n"
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+
+                try:
+                    for token in fake.generate_tokens(model, prompt_tokens, num_predict):
+                        if first is None:
+                            first = time.perf_counter()
+                        tokens.append(token)
+                        fake._count("tokens")
+                        if stream:
+                            write(chunk(token, False))
+                    end = time.perf_counter()
+                    first = first or end
+                    final = chunk("" if stream else "".join(tokens), True)
+                    final.update({
+                        "done_reason": "stop" if num_predict is None or len(tokens) < num_predict else "length",
+                        "total_duration": int((end - start) * 1e9),
+                        "load_duration": 0,
+                        "prompt_eval_count": prompt_tokens,
+                        "prompt_eval_duration": int((first - start) * 1e9),
+                        "eval_count": len(tokens),
+                        "eval_duration": int((end - first) * 1e9),
+                    })
+                    if stream:
+                        write(final)
+                        self.wfile.write(b"0\r\n\r\n")
+                        self.wfile.flush()
+                    else:
+                        self._json(200, final)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client cancelled; stop generating like Ollama does
+                    self.close_connection = True
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", default="llama3,gemma3:1b,nomic-embed-text", help="Comma-separated")
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds to first token")
+    parser.add_argument("--prompt-tokens-per-s", type=float, default=0.0, help="0 = prompt length is free")
+    parser.add_argument("--tokens-per-s", type=float, default=50.0)
+    parser.add_argument("--tokens", type=int, default=200, help="Answer length")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Relative variation, e.g. 0.2")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--num-parallel", type=int, default=1)
+    parser.add_argument("--max-queue", type=int, default=512)
+    parser.add_argument("--load-time", type=float, default=0.0, help="Cold-load seconds per model")
+    parser.add_argument("--embed-dim", type=int, default=384)
+    parser.add_argument("--embed-ms", type=float, default=5.0)
+    parser.add_argument("--model-speed", default="", help='Per-model speed factors, e.g. "gemma3:1b=4"')
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        models=[m.strip() for m in args.models.split(",") if m.strip()],
+        ttft=args.ttft, prompt_tokens_per_s=args.prompt_tokens_per_s, tokens_per_s=args.tokens_per_s,
+        tokens=args.tokens, jitter=args.jitter, error_rate=args.error_rate, num_parallel=args.num_parallel,
+        max_queue=args.max_queue, load_time=args.load_time, embed_dim=args.embed_dim, embed_ms=args.embed_ms,
+        model_speed={m: float(f) for m, _, f in (i.partition("=") for i in args.model_speed.split(",")) if f},
+    )
+    fake = FakeOllama(config, args.host, args.port)
+    print(f"Fake Ollama listening on {fake.url} (Ctrl+C to stop)")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.server.server_close()
+        print(json.dumps(fake.stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Drive the Ollama call paths with N concurrent simulated users and report
+time-to-first-token percentiles and throughput.
+
+Targets:
+    chatbot   OllamaPDFChatbot.stream_response (main app, streaming)
+    query     query_ollama from "Priyanshu Ranjan/ollama_client.py" (blocking; TTFT = full answer)
+    m4        call_ollama_stream from "Sharmilla D/m4.py" (streaming; the script runs once in bare mode)
+
+Requests go through the real backend: pooled client, circuit breaker and the
+process-wide scheduler, so OLLAMA_NUM_PARALLEL queueing shows up in the numbers.
+With --fake an in-process fake Ollama (benchmarks.fake_ollama) is started and
+OLLAMA_HOST points at it; otherwise OLLAMA_HOST is used as is.
+
+Usage (from the "Vinay Kumar Mahto" folder):
+    python -m benchmarks.load_test --fake --users 8 --requests 5 --target chatbot
+    python -m benchmarks.load_test --fake --num-parallel 4 --fake-num-parallel 4 --target query
+    OLLAMA_HOST=http://localhost:11434 python -m benchmarks.load_test --users 2 --model gemma3:1b
+"""
+import argparse
+import importlib.util
+import math
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+ERROR_PREFIXES = ("❌", "⏳", "⚠️", "\n❌", "\n\n[Ollama", "[Ollama")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # pct * n / 100 rather than pct / 100 * n: the latter gives 7.000000000000001 for p7 of 100
+    rank = max(1, math.ceil(pct * len(ordered) / 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _load_script(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_target(target: str, model: str) -> Callable[[str], Iterator[str]]:
+    """A function prompt -> token iterator for the chosen call path."""
+    if target == "chatbot":
+        import streamlit as st
+        from backend.ollama_chatbot import OllamaPDFChatbot, RateLimiter
+        from backend.session_manager import SessionManager
+
+        SessionManager.initialize_session_state()
+        st.session_state.selected_model = model
+        # One shared bare-mode session_state serves every simulated user
+        st.session_state.rate_limiter = RateLimiter(max_requests=10 ** 9)
+        chatbot = OllamaPDFChatbot()
+        return lambda prompt: chatbot.stream_response(prompt, context="Section 1. The policy applies to all schools.")
+    if target == "query":
+        module = _load_script("priyanshu_ollama_client", REPO_ROOT / "Priyanshu Ranjan" / "ollama_client.py")
+        # Blocking: the first "token" arrives with the whole answer; words stand in for tokens
+        return lambda prompt: iter(re.findall(r"\S+\s*", module.query_ollama(prompt, model=model)) or [""])
+    if target == "m4":
+        module = _load_script("sharmilla_m4", REPO_ROOT / "Sharmilla D" / "m4.py")
+        return lambda prompt: module.call_ollama_stream(prompt, model=model, timeout=300)
+    raise ValueError(f"Unknown target: {target}")
+
+
+def run_user(user: int, requests_per_user: int, call: Callable[[str], Iterator[str]], results: List[Dict]):
+    for i in range(requests_per_user):
+        prompt = f"User {user} question {i}: what does the policy say about teacher training?"
+        start = time.perf_counter()
+        ttft, tokens, error = None, 0, None
+        try:
+            for token in call(prompt):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                    if str(token).startswith(ERROR_PREFIXES):
+                        error = str(token).strip()[:200]
+                tokens += 1
+        except Exception as e:
+            error = str(e)
+        results.append({"user": user, "ttft": ttft, "total": time.perf_counter() - start,
+                        "tokens": tokens, "error": error})
+
+
+def run_load(call: Callable[[str], Iterator[str]], users: int, requests_per_user: int) -> Dict:
+    results: List[Dict] = []
+    threads = [threading.Thread(target=run_user, args=(u, requests_per_user, call, results), name=f"load-user-{u}")
+               for u in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    ok = [r for r in results if r["error"] is None and r["ttft"] is not None]
+    ttfts = [r["ttft"] for r in ok]
+    totals = [r["total"] for r in ok]
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "sample_error": next((r["error"] for r in results if r["error"]), None),
+        "wall_s": wall,
+        "ttft": {p: percentile(ttfts, p) for p in (50, 95, 99)},
+        "latency": {p: percentile(totals, p) for p in (50, 95, 99)},
+        "req_per_s": len(ok) / wall if wall else 0.0,
+        "tokens_per_s": sum(r["tokens"] for r in ok) / wall if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", choices=["chatbot", "query", "m4"], default="chatbot")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=3, help="Requests per user")
+    parser.add_argument("--model", default="llama3")
+    parser.add_argument("--num-parallel", type=int, help="Client-side OLLAMA_NUM_PARALLEL for the scheduler")
+    parser.add_argument("--fake", action="store_true", help="Start an in-process fake Ollama")
+    parser.add_argument("--fake-ttft", type=float, default=0.2)
+    parser.add_argument("--fake-tokens-per-s", type=float, default=50.0)
+    parser.add_argument("--fake-tokens", type=int, default=100)
+    parser.add_argument("--fake-jitter", type=float, default=0.1)
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-num-parallel", type=int, default=1)
+    args = parser.parse_args()
+
+    fake = None
+    if args.fake:
+        from benchmarks.fake_ollama import FakeOllama, FakeOllamaConfig
+        fake = FakeOllama(FakeOllamaConfig(
+            models=[args.model], ttft=args.fake_ttft, tokens_per_s=args.fake_tokens_per_s,
+            tokens=args.fake_tokens, jitter=args.fake_jitter, error_rate=args.fake_error_rate,
+            num_parallel=args.fake_num_parallel, seed=0,
+        )).start()
+        os.environ["OLLAMA_HOST"] = fake.url
+    if args.num_parallel:
+        os.environ["OLLAMA_NUM_PARALLEL"] = str(args.num_parallel)
+    # The backend reads OLLAMA_HOST and OLLAMA_NUM_PARALLEL at import time
+    backend_root = str(Path(__file__).resolve().parents[1])
+    if backend_root not in sys.path:
+        sys.path.insert(0, backend_root)
+
+    try:
+        call = make_target(args.target, args.model)
+        report = run_load(call, args.users, args.requests)
+    finally:
+        if fake is not None:
+            fake.stop()
+
+    print(f"target={args.target} users={args.users} requests/user={args.requests} "
+          f"server={os.environ.get('OLLAMA_HOST', 'default')}")
+    print(f"  requests: {report['requests']}, errors: {report['errors']}, wall: {report['wall_s']:.2f}s")
+    if report["sample_error"]:
+        print(f"  first error: {report['sample_error']}")
+    for name in ("ttft", "latency"):
+        p = report[name]
+        print(f"  {name:>7}: p50 {p[50]:7.3f}s  p95 {p[95]:7.3f}s  p99 {p[99]:7.3f}s")
+    print(f"  throughput: {report['req_per_s']:.2f} req/s, {report['tokens_per_s']:.1f} tokens/s")
+    if fake is not None:
+        print(f"  fake server: {fake.stats}")
+
+
+if __name__ == "__main__":
+    main()